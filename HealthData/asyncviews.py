@@ -0,0 +1,78 @@
+from asgiref.sync import sync_to_async
+
+# these are django imports
+from django.http import JsonResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+# these are rest_framework imports
+from rest_framework import exceptions
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+"""
+Base class of the async views served by the ASGI application (HealthData/asgi.py).
+
+DRF's APIView runs its handlers synchronously, so under ASGI every request still holds a thread
+while it waits for the database or renders a PDF. AsyncAPIView is a plain Django view with async
+handlers that keeps the DRF conventions: the request is wrapped in a DRF Request (parsers,
+query_params), authenticated with the configured authentication classes, checked against the
+permission classes, and API errors are answered with the same JSON bodies and status codes.
+"""
+
+
+class AsyncAPIView(View):
+    """
+    Django view with async handlers, authenticated and permission-checked like a DRF APIView.
+
+    Handlers return a dict (rendered as JSON with status 200), or any HttpResponse.
+    """
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    parser_classes = api_settings.DEFAULT_PARSER_CLASSES
+    permission_classes = [IsAuthenticated]
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authenticated, like every APIView
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(
+            request,
+            parsers=[parser() for parser in self.parser_classes],
+            authenticators=[authenticator() for authenticator in self.authentication_classes],
+        )
+        self.request = request
+        try:
+            # Authentication may query the database, which the ORM only allows from sync code
+            await sync_to_async(self.check_permissions)(request)
+            response = await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.error_response(request, exc)
+        if isinstance(response, dict):
+            return self.json_response(response)
+        return response
+
+    def check_permissions(self, request):
+        for permission in [permission() for permission in self.permission_classes]:
+            if not permission.has_permission(request, self):
+                if request.successful_authenticator is None and not request.user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+    def json_response(self, data, status=200):
+        return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+    def error_response(self, request, exc):
+        detail = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+        response = self.json_response(detail, status=exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            authenticators = request.authenticators
+            if authenticators:
+                # Answered with 401 and a challenge, like DRF does
+                response['WWW-Authenticate'] = authenticators[0].authenticate_header(request)
+            else:
+                response.status_code = 403
+        return response
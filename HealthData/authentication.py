@@ -0,0 +1,154 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+# these are django imports
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+# these are rest_framework imports
+from rest_framework.authentication import TokenAuthentication
+
+# these are local imports
+from user.models import TokenRevocation
+
+
+class TokenCache:
+    """
+    LRU cache of token key -> (user, token) with a time to live.
+
+    Entries are dropped per user: revoke_user_tokens() adds a TokenRevocation row, and every
+    process reads the rows added since its last check, at most once every check_interval_seconds,
+    and drops the cached tokens of those users. forget_cached_user() drops them in this process only.
+    """
+
+    def __init__(self, max_entries=10000, ttl_seconds=60, check_interval_seconds=1.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self._entries = OrderedDict()  # key -> (stored_at, user, token)
+        self._keys_by_user = {}  # user id -> {key}
+        self._last_revocation = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _check_revocations(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval_seconds:
+            return
+        if self._last_revocation is None:
+            # Nothing was cached before, so only the position in the log matters
+            self._last_revocation = TokenRevocation.objects.aggregate(last=Max('id'))['last'] or 0
+        else:
+            for revocation_id, user_id in TokenRevocation.objects.filter(id__gt=self._last_revocation).values_list('id', 'user_id'):
+                self._drop_user(user_id)
+                self._last_revocation = max(self._last_revocation, revocation_id)
+        self._checked_at = now
+
+    def _drop_user(self, user_id):
+        for key in self._keys_by_user.pop(user_id, ()):
+            self._entries.pop(key, None)
+
+    def _drop_key(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._keys_by_user.get(entry[1].pk)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_user[entry[1].pk]
+
+    def get(self, key):
+        with self._lock:
+            self._check_revocations()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, user, token = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                self._drop_key(key)
+                return None
+            self._entries.move_to_end(key)
+            return user, token
+
+    def set(self, key, user, token):
+        with self._lock:
+            self._drop_key(key)
+            self._entries[key] = (time.monotonic(), user, token)
+            self._keys_by_user.setdefault(user.pk, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop_key(next(iter(self._entries)))
+
+    def drop_user(self, user_id):
+        with self._lock:
+            self._drop_user(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+
+def forget_cached_user(user_id):
+    """
+    Drop the cached tokens of a user in this process, e.g. after their details changed.
+    Other processes keep theirs for at most the time to live.
+    """
+    cache = get_token_cache()
+    cache.drop_user(user_id)
+    # Again once committed, in case a request cached the old state in between
+    transaction.on_commit(lambda: cache.drop_user(user_id))
+
+
+def revoke_user_tokens(user_id):
+    """
+    Drop the cached tokens of a user in every process, e.g. after they were deactivated or changed role.
+    """
+    cache = get_token_cache()
+    TokenRevocation.objects.create(user_id=user_id)
+    # Rows older than the cache entries can be are of no use to any process
+    TokenRevocation.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=2 * cache.ttl_seconds)).delete()
+    forget_cached_user(user_id)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that serves repeat requests with the same token from a TokenCache,
+    saving the Token + User query on every authenticated request.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        entry = cache.get(key)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(key, user, token)
+        else:
+            user, token = entry
+        # Each request gets its own copy, so a view changing request.user does not leak into the cache
+        return copy.copy(user), token
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache():
+    """
+    Return the process-wide TokenCache configured by settings.TOKEN_AUTH_CACHE.
+    """
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                options = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+                _token_cache = TokenCache(
+                    max_entries=options.get('MAX_ENTRIES', 10000),
+                    ttl_seconds=options.get('TTL_SECONDS', 60),
+                    check_interval_seconds=options.get('CHECK_INTERVAL_SECONDS', 1.0),
+                )
+    return _token_cache
@@ -0,0 +1,132 @@
+import base64
+import binascii
+import json
+
+# these are django imports
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# these are rest_framework imports
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a composite key, e.g. (date, id).
+
+    The cursor holds the key of the last row of the page, and the next page is fetched with
+    WHERE key > cursor ORDER BY key LIMIT n. With an index on the key every page costs the same,
+    however deep into the results it is. The total count is only computed when asked for
+    with ?count=true, since it needs a scan of all matching rows.
+
+    Subclasses set 'ordering' to the ascending fields that make up a unique key.
+    """
+    ordering = ('id',)
+    page_size = api_settings.PAGE_SIZE or 10
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = queryset.count() if self.wants_count(request) else None
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views, with the async ORM.
+        """
+        self.count = await queryset.acount() if self.wants_count(request) else None
+        return self.set_page([row async for row in self.page_queryset(queryset, request)])
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    def page_queryset(self, queryset, request):
+        """
+        Return the queryset of the requested page, with one extra row to tell whether there is a next page.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor is not None:
+            queryset = queryset.filter(self.after(cursor))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_key = self.row_key(rows[-1]) if self.has_next else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def row_key(self, row):
+        if isinstance(row, dict):
+            return [row[field] for field in self.ordering]
+        return [getattr(row, field) for field in self.ordering]
+
+    def after(self, key):
+        """
+        Build the filter for rows whose key sorts after the given key:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, key):
+            condition |= equal & Q(**{f'{field}__gt': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def encode_cursor(self, key):
+        data = json.dumps([str(value) for value in key]).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    def decode_cursor(self, request, model):
+        """
+        Return the key in the cursor parameter, each value converted by its model field, or None
+        without a cursor. Raises NotFound for a cursor that was not produced by encode_cursor().
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            key = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(key, list) or len(key) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            key = [model._meta.get_field(field).to_python(value) for field, value in zip(self.ordering, key)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if any(value is None for value in key):
+            raise NotFound(self.invalid_cursor_message)
+        return key
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_key))
+
+    def get_paginated_data(self, data):
+        payload = {'next': self.get_next_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return payload
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
@@ -0,0 +1,185 @@
+import hashlib
+import heapq
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+# these are django imports
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+# these are rest_framework imports
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+"""
+Opt-in SQL profiling of sampled requests.
+
+SQLProfilerMiddleware times every statement of a sampled request through a database execute
+wrapper, so it works with DEBUG off. Only the SQL text is kept, never the parameters (they are
+hashed to find duplicates), and only for a SAMPLE_RATE share of the requests, so it can stay on
+in production. Each sampled response gets an X-SQL-Profile header, and the per-endpoint rolling
+summaries are served to admins by SQLProfileView.
+"""
+
+MAX_SQL_LENGTH = 500
+
+
+class _RequestProfile:
+    """
+    Collects the statements of one request. Used as a connection execute wrapper.
+    """
+
+    def __init__(self):
+        self.statements = []  # (milliseconds, sql, parameter hash)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            digest = hashlib.sha1(repr(params).encode('utf-8')).hexdigest()
+            self.statements.append((elapsed, sql, digest))
+
+    def summary(self, slowest):
+        exact = Counter((sql, digest) for _, sql, digest in self.statements)
+        similar = Counter(sql for _, sql, _ in self.statements)
+        return {
+            'queries': len(self.statements),
+            'db_ms': round(sum(elapsed for elapsed, _, _ in self.statements), 3),
+            # Statements run again with the same parameters, e.g. re-fetching an object already loaded
+            'duplicates': sum(count - 1 for count in exact.values()),
+            # Statements run again with other parameters, the usual sign of an N+1 loop
+            'similar': sum(count - 1 for count in similar.values()),
+            'slowest': [
+                {'ms': round(elapsed, 3), 'sql': sql[:MAX_SQL_LENGTH]}
+                for elapsed, sql, _ in heapq.nlargest(slowest, self.statements, key=lambda statement: statement[0])
+            ],
+        }
+
+
+class ProfileStore:
+    """
+    Rolling window of the last 'window' sampled requests of every endpoint (method and URL route).
+    """
+
+    def __init__(self, window=200, slowest=5):
+        self.window = window
+        self.slowest = slowest
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def add(self, endpoint, profile):
+        with self._lock:
+            self._endpoints.setdefault(endpoint, deque(maxlen=self.window)).append(profile)
+
+    def summaries(self):
+        with self._lock:
+            endpoints = {endpoint: list(profiles) for endpoint, profiles in self._endpoints.items()}
+
+        summaries = []
+        for endpoint, profiles in endpoints.items():
+            queries = sorted(profile['queries'] for profile in profiles)
+            db_ms = sorted(profile['db_ms'] for profile in profiles)
+            statements = [statement for profile in profiles for statement in profile['slowest']]
+            summaries.append({
+                'endpoint': endpoint,
+                'samples': len(profiles),
+                'queries_mean': round(sum(queries) / len(queries), 2),
+                'queries_max': queries[-1],
+                'db_ms_mean': round(sum(db_ms) / len(db_ms), 3),
+                'db_ms_p95': db_ms[min(len(db_ms) - 1, int(len(db_ms) * 0.95))],
+                'duplicates_mean': round(sum(profile['duplicates'] for profile in profiles) / len(profiles), 2),
+                'similar_mean': round(sum(profile['similar'] for profile in profiles) / len(profiles), 2),
+                'slowest': heapq.nlargest(self.slowest, statements, key=lambda statement: statement['ms']),
+            })
+        return sorted(summaries, key=lambda summary: summary['db_ms_mean'], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+_profile_store = None
+_profile_store_lock = threading.Lock()
+
+
+def get_profile_store():
+    """
+    Return the process-wide ProfileStore configured by settings.SQL_PROFILER.
+    """
+    global _profile_store
+    if _profile_store is None:
+        with _profile_store_lock:
+            if _profile_store is None:
+                options = getattr(settings, 'SQL_PROFILER', {})
+                _profile_store = ProfileStore(window=options.get('WINDOW', 200), slowest=options.get('SLOWEST', 5))
+    return _profile_store
+
+
+class SQLProfilerMiddleware:
+    """
+    Profile the SQL of a SAMPLE_RATE share of the requests when settings.SQL_PROFILER['ENABLED'] is set.
+    """
+
+    def __init__(self, get_response):
+        options = getattr(settings, 'SQL_PROFILER', {})
+        if not options.get('ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = options.get('SAMPLE_RATE', 0.05)
+        self.header = options.get('HEADER', 'X-SQL-Profile')
+        self.slowest = options.get('SLOWEST', 5)
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = _RequestProfile()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+
+        summary = profile.summary(self.slowest)
+        match = getattr(request, 'resolver_match', None)
+        endpoint = f"{request.method} /{match.route}" if match is not None else f"{request.method} (unresolved)"
+        get_profile_store().add(endpoint, summary)
+        response[self.header] = (
+            f"queries={summary['queries']}; db_ms={summary['db_ms']}; "
+            f"duplicates={summary['duplicates']}; similar={summary['similar']}"
+        )
+        return response
+
+
+class SQLProfileView(APIView):
+    """
+    Admin view of the SQL profiles collected by SQLProfilerMiddleware in this process.
+
+    Accepts:
+    - GET request to fetch the per-endpoint summaries, the most DB-heavy endpoints first.
+    - DELETE request to reset them.
+
+    Returns:
+    - 200 OK with the sampling settings and the summaries.
+    - 204 NO CONTENT once the summaries are reset.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        options = getattr(settings, 'SQL_PROFILER', {})
+        return Response({
+            'enabled': options.get('ENABLED', False),
+            'sample_rate': options.get('SAMPLE_RATE', 0.05),
+            'endpoints': get_profile_store().summaries(),
+        })
+
+    def delete(self, request):
+        get_profile_store().clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,143 @@
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# these are django imports
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# these are rest_framework imports
+from rest_framework.permissions import SAFE_METHODS
+
+"""
+Read replica routing.
+
+Admin and analytics views that only read (search, the admin listings, the cohort export and
+analytics) inherit ReplicaReadMixin. Once such a request is authenticated, ReplicaRouter sends its
+reads to the 'replica' database alias, so they no longer compete with the daily-entry writes on
+'default'. Authentication itself and every other view keep reading the primary.
+
+Read-your-writes: the first write of a request pins its remaining reads to the primary, so a
+request never reads back data older than what it just wrote. Nothing carries over to the next
+request, which is why a user's own data (their records, summaries and report downloads) is always
+read from the primary: a report requested right after logging a day must include it. Admin and
+analytics reads may lag the primary by up to the refresh interval.
+
+The replica is a copy of the primary refreshed with SQLite's online backup API (refresh_replica(),
+or the refresh_replica management command). It is only used when settings.READ_REPLICA['ENABLED']
+is set, which adds the alias to settings.DATABASES.
+"""
+
+REPLICA_ALIAS = 'replica'
+
+# Version stamps and tokens decide what the caches may serve, so they are never read stale
+PRIMARY_ONLY_MODELS = {'tables.LookupVersion', 'authtoken.Token', 'user.TokenRevocation'}
+
+
+class _ReplicaReads:
+    """
+    Routing state of a request reading from the replica.
+    """
+
+    def __init__(self):
+        self.pinned = False
+
+
+_replica_reads = ContextVar('replica_reads', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+class ReplicaRouter:
+    """
+    Database router sending the reads of ReplicaReadMixin requests to the replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _replica_reads.get()
+        if state is None or state.pinned or model._meta.label in PRIMARY_ONLY_MODELS:
+            return None
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _replica_reads.get()
+        if state is not None:
+            state.pinned = True
+        # Also for instances loaded from the replica, which would otherwise be saved back to it
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows
+        if {obj1._state.db, obj2._state.db} <= {'default', REPLICA_ALIAS}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets the schema with the data, from the backup
+        if db == REPLICA_ALIAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    APIView mixin reading from the replica once a GET or HEAD request is authenticated.
+
+    Querysets evaluated after the view returns, e.g. by a streamed response, are routed when they
+    run and so read the primary; bind them with queryset.using(queryset.db) to keep the replica.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _replica_reads.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and replica_configured():
+            _replica_reads.set(_ReplicaReads())
+
+
+@contextmanager
+def replica_reads():
+    """
+    Send the reads of the enclosed block to the replica, if one is configured, like ReplicaReadMixin.
+
+    Also works in async views: the async ORM runs its queries in a copy of the caller's context.
+    """
+    token = _replica_reads.set(_ReplicaReads() if replica_configured() else None)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def refresh_replica(pages=-1):
+    """
+    Copy the primary database onto the replica with SQLite's online backup API and return the
+    number of seconds it took.
+
+    Writers on the primary are not blocked while it is copied (with WAL), and readers of the
+    replica see either the old or the new copy, never a mix.
+    """
+    if not replica_configured():
+        raise ImproperlyConfigured("No replica database, set READ_REPLICA['ENABLED'] in the settings.")
+    primary = settings.DATABASES['default']
+    replica = settings.DATABASES[REPLICA_ALIAS]
+    if primary['ENGINE'] != 'django.db.backends.sqlite3' or replica['ENGINE'] != 'django.db.backends.sqlite3':
+        raise ImproperlyConfigured("refresh_replica() copies SQLite databases only.")
+
+    started = time.perf_counter()
+    source = sqlite3.connect(primary['NAME'], timeout=primary['OPTIONS'].get('timeout', 5))
+    target = sqlite3.connect(replica['NAME'], timeout=replica['OPTIONS'].get('timeout', 5))
+    try:
+        source.backup(target, pages=pages)
+    finally:
+        source.close()
+        target.close()
+    return time.perf_counter() - started
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .sqlite import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -55,6 +58,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Removes itself unless SQL_PROFILER['ENABLED'] is set
+    'HealthData.profiling.SQLProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'HealthData.urls'
@@ -81,13 +86,32 @@ WSGI_APPLICATION = 'HealthData.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Connection tuning of the SQLite database, one of HealthData.sqlite.SQLITE_PROFILES
+# ('production': WAL, synchronous=NORMAL, busy timeout, mmap, larger cache, persistent connections;
+# 'development': the same without WAL, which would persist in the database file;
+# 'baseline': stock SQLite behaviour). Deployments set SQLITE_PROFILE=production in the environment.
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'development')
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_settings(BASE_DIR / 'db.sqlite3', SQLITE_PROFILE),
 }
 
+# Read replica for the read-only endpoints (see HealthData/replica.py). Create and refresh the copy
+# with `manage.py refresh_replica` before enabling it.
+READ_REPLICA = {
+    'ENABLED': False,
+    'NAME': BASE_DIR / 'db.replica.sqlite3',
+}
+
+if READ_REPLICA['ENABLED']:
+    DATABASES['replica'] = {
+        **database_settings(READ_REPLICA['NAME'], SQLITE_PROFILE, read_only=True),
+        # Tests read the replica through the test copy of the default database
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['HealthData.replica.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -139,11 +163,84 @@ AUTH_USER_MODEL = 'user.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'HealthData.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
-}
\ No newline at end of file
+}
+
+# Rendered PDF report cache (see user_daily_track/report_cache.py)
+REPORT_CACHE = {
+    'MEMORY_MAX_BYTES': 32 * 1024 * 1024,
+    'DISK_MAX_BYTES': 512 * 1024 * 1024,
+    'DIRECTORY': BASE_DIR / 'report_cache',
+}
+
+# Reports larger than this are spooled to a temporary file on disk while they are rendered
+REPORT_SPOOL_MAX_BYTES = 1024 * 1024
+
+# Asynchronous report rendering (see user_daily_track/jobs.py)
+REPORT_JOBS = {
+    'MAX_WORKERS': 2,
+    'OUTPUT_DIRECTORY': BASE_DIR / 'report_jobs',
+    # A rendering worker refreshes its job's heartbeat this often; a running job whose worker process
+    # is gone, or that had no heartbeat for STALE_AFTER_SECONDS, is put back in the queue
+    'HEARTBEAT_SECONDS': 30,
+    'STALE_AFTER_SECONDS': 120,
+    # Resubmit the jobs left queued by a previous run when the server starts, from the first web
+    # worker to start only
+    'RESUME_ON_STARTUP': True,
+    # Finished jobs and their files are deleted this long after they finished, on every resume and
+    # process_report_jobs run (run it periodically, e.g. from cron)
+    'RETENTION_SECONDS': 24 * 60 * 60,
+    # A user with this many queued or running jobs gets 429 for a new one
+    'MAX_ACTIVE_JOBS_PER_USER': 3,
+    # Render jobs on the committing thread instead of the process pool (handy for development)
+    'RUN_INLINE': False,
+}
+
+# In-memory autocomplete of KA registration numbers and names (see user/autocomplete.py)
+USER_AUTOCOMPLETE = {
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    # Rebuild the index (in the background) after this long to pick up writes made by other processes
+    'MAX_AGE_SECONDS': 300,
+    # Build the index in the background when the WSGI/ASGI application starts
+    'BUILD_ON_STARTUP': True,
+}
+
+# Bulk patient registration (see user/registration.py)
+BULK_REGISTRATION = {
+    # Rows accepted per request of the bulk endpoint; the CSV command registers its file in batches of this size
+    'MAX_ROWS': 1000,
+    # Processes hashing the passwords, one per CPU when unset
+    'HASH_WORKERS': None,
+}
+
+# Role/Gender/Heamophilia lookup cache (see tables/lookups.py)
+LOOKUP_CACHE = {
+    # How often a process re-reads the version stamps to notice changes made by other processes
+    'CHECK_INTERVAL_SECONDS': 1.0,
+}
+
+# Token -> user cache of CachedTokenAuthentication (see HealthData/authentication.py)
+TOKEN_AUTH_CACHE = {
+    'MAX_ENTRIES': 10000,
+    'TTL_SECONDS': 60,
+    # How often a process reads the token revocations made by other processes
+    'CHECK_INTERVAL_SECONDS': 1.0,
+}
+
+# Sampled per-request SQL profiling (see HealthData/profiling.py)
+SQL_PROFILER = {
+    'ENABLED': False,
+    # Share of the requests that are profiled
+    'SAMPLE_RATE': 0.05,
+    # Sampled requests kept per endpoint, and slowest statements reported
+    'WINDOW': 200,
+    'SLOWEST': 5,
+    'HEADER': 'X-SQL-Profile',
+}
@@ -0,0 +1,79 @@
+"""
+SQLite connection profiles.
+
+A profile is applied to every new connection through the backend's 'init_command' option (one
+PRAGMA per setting), plus the sqlite3 busy timeout, the transaction mode, the mode of the
+write_atomic() blocks (see HealthData/transactions.py) and the connection lifetime.
+settings.DATABASES is built with database_settings(); the bench_sqlite_concurrency command
+compares the profiles under a mixed read/write load.
+
+This module is imported by the settings, so it must not import anything from Django that needs
+configured settings.
+"""
+
+SQLITE_PROFILES = {
+    # Stock SQLite and Django behaviour: rollback journal, fsync on every commit, 5 s busy timeout,
+    # deferred transactions and a new connection per request.
+    'baseline': {
+        'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+        'timeout': 5,
+        'transaction_mode': None,
+        'write_transaction_mode': None,
+        'conn_max_age': 0,
+    },
+    # The production tuning without WAL: the journal mode is stored in the database file, so WAL
+    # would rewrite the header of the db.sqlite3 checked into the repository on every run.
+    'development': {
+        'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'NORMAL', 'temp_store': 'MEMORY'},
+        'timeout': 20,
+        'transaction_mode': None,
+        'write_transaction_mode': 'IMMEDIATE',
+        'conn_max_age': 600,
+    },
+    'production': {
+        'pragmas': {
+            # Readers no longer block the writer, and the writer no longer blocks readers
+            'journal_mode': 'WAL',
+            # Safe with WAL: a power loss may drop the last commits but cannot corrupt the database
+            'synchronous': 'NORMAL',
+            'mmap_size': 256 * 1024 * 1024,
+            # Negative values are in KiB: a 64 MiB page cache per connection
+            'cache_size': -64 * 1024,
+            'temp_store': 'MEMORY',
+        },
+        # Seconds a writer waits for the lock before "database is locked"
+        'timeout': 20,
+        # Transactions stay DEFERRED, so read-only atomic blocks run concurrently...
+        'transaction_mode': None,
+        # ...but the write paths take the write lock at BEGIN, so they never fail half way when
+        # upgrading their lock (see HealthData/transactions.py)
+        'write_transaction_mode': 'IMMEDIATE',
+        'conn_max_age': 600,
+    },
+}
+
+
+def init_command(profile):
+    return ';'.join(f"PRAGMA {name}={value}" for name, value in profile['pragmas'].items())
+
+
+def database_settings(name, profile_name, read_only=False):
+    """
+    Build a DATABASES entry for the SQLite file 'name' using one of SQLITE_PROFILES.
+
+    With read_only every connection is set to PRAGMA query_only, e.g. for a read replica.
+    """
+    profile = SQLITE_PROFILES[profile_name]
+    command = init_command(profile)
+    if read_only:
+        command += ';PRAGMA query_only=ON'
+    options = {'init_command': command, 'timeout': profile['timeout']}
+    if profile['transaction_mode']:
+        options['transaction_mode'] = profile['transaction_mode']
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': options,
+        'CONN_MAX_AGE': profile['conn_max_age'],
+        'CONN_HEALTH_CHECKS': profile['conn_max_age'] > 0,
+    }
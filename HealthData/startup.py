@@ -0,0 +1,38 @@
+import logging
+import threading
+
+# these are django imports
+from django.conf import settings
+from django.db import connection
+
+"""
+Work done when the WSGI or ASGI application starts (see wsgi.py and asgi.py), in the background
+so that the first requests are not held up. Management commands do not run it.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def _resume_report_jobs():
+    from user_daily_track.jobs import resume_pending_jobs
+
+    try:
+        resumed = resume_pending_jobs()
+        if resumed:
+            logger.info("Resubmitted %s report jobs left over from a previous run.", resumed)
+    except Exception:
+        logger.exception("Could not resubmit the pending report jobs.")
+    finally:
+        # The thread's own connection
+        connection.close()
+
+
+def warm_up():
+    """
+    Start building the autocomplete index and resubmit the report jobs left over from a previous run.
+    """
+    from user.autocomplete import warm_up as warm_up_autocomplete
+
+    warm_up_autocomplete()
+    if settings.REPORT_JOBS.get('RESUME_ON_STARTUP', True) and not settings.REPORT_JOBS.get('RUN_INLINE', False):
+        threading.Thread(target=_resume_report_jobs, name='resume-report-jobs', daemon=True).start()
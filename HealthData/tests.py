@@ -0,0 +1,278 @@
+import os
+import sqlite3
+import tempfile
+from datetime import date
+from types import SimpleNamespace
+from unittest import mock
+
+# these are django imports
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+# these are local imports
+from . import profiling, replica
+from .profiling import ProfileStore, SQLProfilerMiddleware, _RequestProfile
+from .replica import REPLICA_ALIAS, ReplicaRouter, refresh_replica, replica_reads
+from .sqlite import SQLITE_PROFILES, database_settings
+from .transactions import write_atomic
+from tables.models import Gender, LookupVersion, Role
+from user.tests import FAST_PASSWORD_HASHERS, UserTestCase, create_user
+from user.models import User
+from user_daily_track.models import DailyTrack
+
+PROFILE_EVERY_REQUEST = {'ENABLED': True, 'SAMPLE_RATE': 1.0, 'WINDOW': 3, 'SLOWEST': 2, 'HEADER': 'X-SQL-Profile'}
+
+
+class RequestProfileTests(SimpleTestCase):
+
+    def test_summary(self):
+        profile = _RequestProfile()
+        execute = mock.Mock(return_value='rows')
+        for sql, params in (('SELECT a WHERE id = %s', (1,)), ('SELECT a WHERE id = %s', (1,)),
+                            ('SELECT a WHERE id = %s', (2,)), ('SELECT b', ())):
+            self.assertEqual(profile(execute, sql, params, False, {}), 'rows')
+        summary = profile.summary(slowest=2)
+        self.assertEqual((summary['queries'], summary['duplicates'], summary['similar']), (4, 1, 2))
+        self.assertEqual(len(summary['slowest']), 2)
+
+    def test_failed_statements_are_recorded(self):
+        profile = _RequestProfile()
+        with self.assertRaises(ValueError):
+            profile(mock.Mock(side_effect=ValueError), 'SELECT 1', None, False, {})
+        self.assertEqual(profile.summary(slowest=1)['queries'], 1)
+
+    def test_store_keeps_a_window_per_endpoint(self):
+        store = ProfileStore(window=2, slowest=1)
+        for queries, db_ms in ((9, 9.0), (1, 1.0), (3, 3.0)):
+            store.add('GET /a', {'queries': queries, 'db_ms': db_ms, 'duplicates': 0, 'similar': 1,
+                                 'slowest': [{'ms': db_ms, 'sql': f'SELECT {queries}'}]})
+        store.add('GET /b', {'queries': 1, 'db_ms': 5.0, 'duplicates': 1, 'similar': 0, 'slowest': []})
+        first, second = store.summaries()
+        self.assertEqual((first['endpoint'], first['samples'], first['queries_max'], first['db_ms_mean']), ('GET /b', 1, 1, 5.0))
+        self.assertEqual((second['endpoint'], second['samples'], second['queries_max']), ('GET /a', 2, 3))
+        self.assertEqual(second['slowest'], [{'ms': 3.0, 'sql': 'SELECT 3'}])
+        store.clear()
+        self.assertEqual(store.summaries(), [])
+
+    def test_off_by_default(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            SQLProfilerMiddleware(lambda request: None)
+
+
+@override_settings(SQL_PROFILER=PROFILE_EVERY_REQUEST)
+class SQLProfilerMiddlewareTests(UserTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(profiling, '_profile_store', ProfileStore(window=3, slowest=2))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sampled_requests_are_profiled(self):
+        response = self.client.get('/user/user')
+        self.assertRegex(response['X-SQL-Profile'], r'^queries=\d+; db_ms=[\d.]+; duplicates=\d+; similar=\d+$')
+        for _ in range(4):
+            self.client.get('/user/user')
+        summary, = profiling.get_profile_store().summaries()
+        self.assertEqual((summary['endpoint'], summary['samples']), ('GET /user/user', 3))
+
+    def test_parameters_are_not_kept(self):
+        self.client.get('/user/user')
+        self.admin_client.get('/user/search/', {'q': 'sharma'})
+        stored = repr(profiling.get_profile_store().summaries())
+        self.assertNotIn(self.client._credentials['HTTP_AUTHORIZATION'].split()[1], stored)
+        self.assertNotIn('sharma', stored)
+
+    @override_settings(SQL_PROFILER={**PROFILE_EVERY_REQUEST, 'SAMPLE_RATE': 0.0})
+    def test_unsampled_requests(self):
+        self.assertNotIn('X-SQL-Profile', self.client.get('/user/user'))
+        self.assertEqual(profiling.get_profile_store().summaries(), [])
+
+    def test_view(self):
+        self.client.get('/user/user')
+        response = self.admin_client.get('/profiling/sql')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['enabled'], response.json()['sample_rate']), (True, 1.0))
+        self.assertIn('GET /user/user', [summary['endpoint'] for summary in response.json()['endpoints']])
+
+        self.assertEqual(self.client.get('/profiling/sql').status_code, 403)
+        self.assertEqual(self.admin_client.delete('/profiling/sql').status_code, 204)
+        # Only the DELETE itself, profiled once the store was cleared
+        self.assertEqual([summary['endpoint'] for summary in profiling.get_profile_store().summaries()], ['DELETE /profiling/sql'])
+
+
+class SQLiteProfileTests(SimpleTestCase):
+
+    def test_database_settings(self):
+        production = database_settings('db.sqlite3', 'production')
+        self.assertEqual(production['OPTIONS']['timeout'], 20)
+        self.assertIn('PRAGMA journal_mode=WAL', production['OPTIONS']['init_command'])
+        # Only the write_atomic() blocks begin IMMEDIATE
+        self.assertNotIn('transaction_mode', production['OPTIONS'])
+        self.assertEqual((production['CONN_MAX_AGE'], production['CONN_HEALTH_CHECKS']), (600, True))
+
+        baseline = database_settings('db.sqlite3', 'baseline')
+        self.assertEqual(baseline['OPTIONS']['init_command'], 'PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL')
+        self.assertEqual(baseline['CONN_MAX_AGE'], 0)
+
+        development = database_settings('db.sqlite3', 'development')
+        self.assertIn('PRAGMA journal_mode=DELETE', development['OPTIONS']['init_command'])
+        self.assertEqual(SQLITE_PROFILES['development']['write_transaction_mode'], 'IMMEDIATE')
+
+        replica = database_settings('db.replica.sqlite3', 'production', read_only=True)
+        self.assertTrue(replica['OPTIONS']['init_command'].endswith(';PRAGMA query_only=ON'))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class WriteAtomicTests(TransactionTestCase):
+    """
+    Outside of the transaction TestCase wraps every test in, so the BEGIN statements can be seen.
+    """
+
+    def begins(self, block):
+        with CaptureQueriesContext(connection) as queries:
+            block()
+        return [query['sql'] for query in queries if query['sql'].startswith('BEGIN')]
+
+    def in_write_atomic(self):
+        with write_atomic():
+            Role.objects.create(name='Admin')
+
+    def test_write_blocks_begin_immediate(self):
+        self.assertEqual(SQLITE_PROFILES[settings.SQLITE_PROFILE]['write_transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(self.begins(self.in_write_atomic), ['BEGIN IMMEDIATE'])
+        # Back to the default mode once the block has begun
+        self.assertIsNone(connection.transaction_mode)
+
+        def in_atomic():
+            with transaction.atomic():
+                Role.objects.exists()
+        self.assertEqual(self.begins(in_atomic), ['BEGIN'])
+
+    def test_nested_blocks_use_the_outer_transaction(self):
+        def nested():
+            with transaction.atomic():
+                with write_atomic():
+                    Role.objects.create(name='Admin')
+        self.assertEqual(self.begins(nested), ['BEGIN'])
+
+    def test_decorator(self):
+        @write_atomic
+        def create():
+            Role.objects.create(name='Admin')
+        self.assertEqual(self.begins(create), ['BEGIN IMMEDIATE'])
+        self.assertEqual(Role.objects.count(), 1)
+
+    @override_settings(SQLITE_PROFILE='baseline')
+    def test_baseline_profile(self):
+        self.assertEqual(self.begins(self.in_write_atomic), ['BEGIN'])
+
+    def test_write_paths(self):
+        role = Role.objects.create(name='User')
+        user = create_user('alice', 1, role, Gender.objects.create(name='Male'))
+        self.assertEqual(self.begins(lambda: DailyTrack.objects.create(
+            user=user, date=date(2025, 3, 1), break_through_bleed='No', inj_hemilibra='Yes', physiotherapy='No'
+        )), ['BEGIN IMMEDIATE'])
+        self.assertEqual(self.begins(lambda: DailyTrack.objects.upsert(user, date(2025, 3, 1), break_through_bleed='Yes',
+                                                                       inj_hemilibra='Yes', physiotherapy='No')),
+                         ['BEGIN IMMEDIATE'])
+
+
+class ReplicaRouterTests(UserTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # The alias exists only when READ_REPLICA is enabled, the routing decisions are checked without it
+        self.enterContext(mock.patch.object(replica, 'replica_configured', return_value=True))
+        self.router = ReplicaRouter()
+
+    def test_reads_of_replica_blocks(self):
+        self.assertIsNone(self.router.db_for_read(User))
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(User), REPLICA_ALIAS)
+            # Never stale: what the caches may serve depends on these
+            self.assertIsNone(self.router.db_for_read(LookupVersion))
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_first_write_pins_the_reads_to_the_primary(self):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_write(User), 'default')
+            self.assertIsNone(self.router.db_for_read(User))
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(User), REPLICA_ALIAS)
+
+    def test_without_a_replica(self):
+        with mock.patch.object(replica, 'replica_configured', return_value=False), replica_reads():
+            self.assertIsNone(self.router.db_for_read(User))
+
+    def test_schema_comes_from_the_backup(self):
+        self.assertIs(self.router.allow_migrate(REPLICA_ALIAS, 'user'), False)
+        self.assertIsNone(self.router.allow_migrate('default', 'user'))
+
+    def routed_reads(self, client, path, params=None):
+        """
+        Make a request and return the (model, alias) of every read routing decision, all run on 'default'.
+        """
+        routed = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            routed.append((model._meta.label, db_for_read(router, model, **hints)))
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', spy):
+            self.assertEqual(client.get(path, params).status_code, 200)
+        return set(routed)
+
+    def test_read_only_views_read_the_replica_once_authenticated(self):
+        routed = self.routed_reads(self.admin_client, '/user/admin/user/')
+        self.assertIn(('user.User', REPLICA_ALIAS), routed)
+        self.assertNotIn(('user.User', None), routed)
+        self.assertIn(('authtoken.Token', None), routed)
+
+    def test_other_views_read_the_primary(self):
+        routed = self.routed_reads(self.client, '/data/')
+        self.assertEqual({alias for _, alias in routed}, {None})
+
+    def test_reports_read_the_records_just_logged_from_the_primary(self):
+        response = self.client.post('/data/', {
+            'date': '2025-03-03', 'break_through_bleed': 'No', 'inj_hemilibra': 'Yes', 'physiotherapy': 'No',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        for path in ('/data/download/2025/3', '/data/download/2025'):
+            with self.subTest(path=path):
+                routed = self.routed_reads(self.client, path)
+                self.assertEqual({alias for _, alias in routed}, {None})
+
+
+class RefreshReplicaTests(SimpleTestCase):
+
+    def databases_in(self, directory):
+        return {
+            'default': database_settings(os.path.join(directory, 'primary.sqlite3'), 'production'),
+            REPLICA_ALIAS: database_settings(os.path.join(directory, 'replica.sqlite3'), 'production', read_only=True),
+        }
+
+    def test_copies_the_primary(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        databases = self.databases_in(directory)
+        with sqlite3.connect(databases['default']['NAME']) as primary:
+            primary.execute("CREATE TABLE t (n INTEGER)")
+            primary.execute("INSERT INTO t VALUES (1), (2)")
+        primary.close()
+
+        with mock.patch.object(replica, 'settings', SimpleNamespace(DATABASES=databases)):
+            self.assertGreaterEqual(refresh_replica(), 0)
+        copy = sqlite3.connect(databases[REPLICA_ALIAS]['NAME'])
+        self.addCleanup(copy.close)
+        self.assertEqual(copy.execute("SELECT count(*) FROM t").fetchone(), (2,))
+        # Connections to the replica are read only
+        copy.executescript(databases[REPLICA_ALIAS]['OPTIONS']['init_command'])
+        with self.assertRaisesMessage(sqlite3.OperationalError, 'readonly'):
+            copy.execute("INSERT INTO t VALUES (3)")
+
+    def test_needs_a_replica(self):
+        with self.assertRaises(ImproperlyConfigured):
+            refresh_replica()
@@ -0,0 +1,50 @@
+# these are django imports
+from django.conf import settings
+from django.db.transaction import Atomic, get_connection
+
+# these are local imports
+from .sqlite import SQLITE_PROFILES
+
+"""
+Write transactions.
+
+SQLite starts a transaction DEFERRED: it reads from a snapshot and only asks for the write lock at
+its first write. If another connection committed in between, the upgrade fails at once with
+"database is locked", whatever the busy timeout. Beginning with BEGIN IMMEDIATE takes the write
+lock up front (waiting up to the busy timeout) instead, but also makes the transaction exclusive of
+every other writer, so only the blocks that write use it: write_atomic() is transaction.atomic()
+for those, and plain atomic() blocks (and reads outside any transaction) stay DEFERRED and keep
+running concurrently.
+
+The mode comes from the 'write_transaction_mode' of the SQLITE_PROFILE in use.
+"""
+
+
+class WriteAtomic(Atomic):
+    """
+    Atomic beginning the outermost transaction with the profile's write transaction mode.
+    """
+
+    def __enter__(self):
+        connection = get_connection(self.using)
+        mode = SQLITE_PROFILES[settings.SQLITE_PROFILE].get('write_transaction_mode')
+        if mode is None or connection.vendor != 'sqlite' or connection.in_atomic_block:
+            return super().__enter__()
+        # Connecting resets transaction_mode from the settings, so connect before overriding it
+        connection.ensure_connection()
+        default_mode = connection.transaction_mode
+        connection.transaction_mode = mode
+        try:
+            return super().__enter__()
+        finally:
+            connection.transaction_mode = default_mode
+
+
+def write_atomic(using=None, savepoint=True, durable=False):
+    """
+    transaction.atomic() for a block that writes, usable as a context manager or a decorator.
+    """
+    # Bare @write_atomic
+    if callable(using):
+        return WriteAtomic(None, savepoint, durable)(using)
+    return WriteAtomic(using, savepoint, durable)
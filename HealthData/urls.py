@@ -17,11 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from .profiling import SQLProfileView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('user/', include('user.urls')),
     path('tables/', include('tables.urls')),
     path('profile/', include('user_profile.urls')),
-    path('data/', include('user_daily_track.urls'))
+    path('data/', include('user_daily_track.urls')),
+    path('profiling/sql', SQLProfileView.as_view(), name='sql_profile'),
                 
 ]
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HealthData.settings')
 
 application = get_wsgi_application()
+
+# Build the in-memory indexes and resume the report jobs of a previous run (see startup.py)
+from HealthData.startup import warm_up  # noqa: E402
+warm_up()
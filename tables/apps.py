@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TablesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tables'
+
+    def ready(self):
+        # Keep the lookup cache stamps in step with Role, Gender and Heamophilia writes
+        from . import signals  # noqa: F401
@@ -0,0 +1,97 @@
+import threading
+import time
+import uuid
+
+# these are django imports
+from django.conf import settings
+
+# these are local imports
+from .models import Gender, Heamophilia, LookupVersion, Role
+
+"""
+Process-wide cache of the Role, Gender and Heamophilia reference tables.
+
+Each table is held as {id: name} and reloaded only when its stamp in LookupVersion changes. The
+stamps are written by the signals in tables/signals.py on every save and delete, so a change made by
+any process is seen by all of them; a process re-reads the stamps (one small query for all tables)
+at most once every CHECK_INTERVAL_SECONDS, and immediately after its own writes commit.
+
+Other process-wide caches can stamp their own tables the same way with bump_version() and
+LookupCache.version().
+"""
+
+LOOKUP_MODELS = (Role, Gender, Heamophilia)
+
+
+def bump_version(model):
+    """
+    Give the model's table a new version stamp, in the current transaction.
+    """
+    LookupVersion.objects.update_or_create(table=model._meta.db_table, defaults={'version': uuid.uuid4().hex})
+
+
+class LookupCache:
+
+    def __init__(self, check_interval_seconds=1.0):
+        self.check_interval_seconds = check_interval_seconds
+        self._tables = {}  # db_table -> (version, {id: name})
+        self._versions = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _current_versions(self):
+        now = time.monotonic()
+        if self._versions is None or now - self._checked_at >= self.check_interval_seconds:
+            self._versions = dict(LookupVersion.objects.values_list('table', 'version'))
+            self._checked_at = now
+        return self._versions
+
+    def names(self, model):
+        """
+        Return the {id: name} dict of a reference table.
+        """
+        table = model._meta.db_table
+        with self._lock:
+            version = self._current_versions().get(table)
+            cached = self._tables.get(table)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            # Read after the version, so a concurrent change is picked up at the next check
+            names = dict(model.objects.values_list('pk', 'name'))
+            self._tables[table] = (version, names)
+            return names
+
+    def version(self, model):
+        """
+        Return the current version stamp of any model's table (None until it is first bumped).
+        """
+        with self._lock:
+            return self._current_versions().get(model._meta.db_table)
+
+    def name(self, model, pk):
+        return self.names(model).get(pk)
+
+    def invalidate(self, model=None):
+        with self._lock:
+            if model is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(model._meta.db_table, None)
+            self._versions = None
+
+
+_lookup_cache = None
+_lookup_cache_lock = threading.Lock()
+
+
+def get_lookup_cache():
+    """
+    Return the process-wide LookupCache configured by settings.LOOKUP_CACHE.
+    """
+    global _lookup_cache
+    if _lookup_cache is None:
+        with _lookup_cache_lock:
+            if _lookup_cache is None:
+                options = getattr(settings, 'LOOKUP_CACHE', {})
+                _lookup_cache = LookupCache(check_interval_seconds=options.get('CHECK_INTERVAL_SECONDS', 1.0))
+    return _lookup_cache
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    """
+    Start every lookup table's counter at its highest existing number (R99 -> 99, R100 -> 100).
+    """
+    IdCounter = apps.get_model('tables', 'IdCounter')
+    for model_name in ('Role', 'Gender', 'Heamophilia'):
+        model = apps.get_model('tables', model_name)
+        numbers = [int(pk[1:]) for pk in model.objects.values_list('pk', flat=True) if pk[1:].isdigit()]
+        IdCounter.objects.create(name=model._meta.db_table, value=max(numbers, default=0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tables', '0004_lookupversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='gender',
+            name='gender_id',
+            field=models.CharField(editable=False, max_length=10, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='heamophilia',
+            name='heamophilia_id',
+            field=models.CharField(editable=False, max_length=10, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='role',
+            name='role_id',
+            field=models.CharField(editable=False, max_length=10, primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
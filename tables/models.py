@@ -1,10 +1,66 @@
 # these are django imports
-from django.db import models
+from django.db import connections, models, router
+from django.db.models import F
+
+# these are local imports
+from HealthData.transactions import write_atomic
 
 # Create your models here.
 
+class IdCounterQuerySet(models.QuerySet):
+
+    def allocate(self, name, count=1):
+        """
+        Reserve the next 'count' numbers of the named counter and return them as a range.
+
+        The counter is created (from 0) or advanced in a single INSERT ... ON CONFLICT DO UPDATE ...
+        RETURNING statement, so concurrent allocations always get disjoint blocks. Allocate in the
+        same write_atomic() block as the insert that uses the numbers, so a failed insert rolls the
+        counter back too instead of leaving a gap.
+        """
+        using = router.db_for_write(self.model)
+        connection = connections[using]
+        if connection.features.supports_update_conflicts_with_target and connection.features.can_return_columns_from_insert:
+            table = connection.ops.quote_name(self.model._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {table} (name, value) VALUES (%s, %s) "
+                    f"ON CONFLICT (name) DO UPDATE SET value = {table}.value + excluded.value RETURNING value",
+                    [name, count],
+                )
+                last = cursor.fetchone()[0]
+        else:
+            with write_atomic(using=using):
+                counter, _ = self.using(using).select_for_update().get_or_create(name=name)
+                self.using(using).filter(name=name).update(value=F('value') + count)
+                last = counter.value + count
+        return range(last - count + 1, last + 1)
+
+
+class IdCounter(models.Model):
+    """
+    Last number handed out for the primary keys of a table, see IdCounterQuerySet.allocate().
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    objects = IdCounterQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.name} {self.value}"
+
+
+def next_lookup_ids(model, count=1):
+    """
+    Allocate 'count' new primary keys of a lookup model, e.g. ['R03', 'R04'] for Role, with one statement.
+    """
+    return [f"{model.ID_PREFIX}{number:02}" for number in IdCounter.objects.allocate(model._meta.db_table, count)]
+
+
 class Role(models.Model):
-    role_id = models.CharField(max_length=3, primary_key=True,editable=False)
+    ID_PREFIX = 'R'
+
+    role_id = models.CharField(max_length=10, primary_key=True,editable=False)
     name = models.CharField(max_length=50, unique=True)
 
     is_active = models.BooleanField(default=True)
@@ -13,9 +69,12 @@ class Role(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.role_id:  # Only generate role_id for new objects
-            last_role = Role.objects.order_by('-role_id').first()
-            next_number = 1 if not last_role else int(last_role.role_id[1:]) + 1
-            self.role_id = f"R{next_number:02}"  # Format as Rxx with zero-padding
+            # In the insert's transaction, so a failed insert hands the number back
+            with write_atomic():
+                self.role_id = next_lookup_ids(Role)[0]  # R01, R02, ... R100, from the counter
+                # The row is new, so the UPDATE Django tries first for an instance with a key is skipped
+                kwargs['force_insert'] = True
+                return super().save(*args, **kwargs)
         super().save(*args, **kwargs)
         
 
@@ -25,7 +84,9 @@ class Role(models.Model):
     
 
 class Gender(models.Model):
-    gender_id = models.CharField(max_length=3, primary_key=True, editable=False)
+    ID_PREFIX = 'G'
+
+    gender_id = models.CharField(max_length=10, primary_key=True, editable=False)
     name = models.CharField(max_length=50, unique=True)
 
     is_active = models.BooleanField(default=True)
@@ -34,9 +95,12 @@ class Gender(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.gender_id:  # Only generate gender_id for new objects
-            last_gender = Gender.objects.order_by('-gender_id').first()
-            next_number = 1 if not last_gender else int(last_gender.gender_id[1:]) + 1
-            self.gender_id = f"G{next_number:02}"  # Format as Gxx with zero-padding
+            # In the insert's transaction, so a failed insert hands the number back
+            with write_atomic():
+                self.gender_id = next_lookup_ids(Gender)[0]  # G01, G02, ... G100, from the counter
+                # The row is new, so the UPDATE Django tries first for an instance with a key is skipped
+                kwargs['force_insert'] = True
+                return super().save(*args, **kwargs)
         super().save(*args, **kwargs)
 
 
@@ -45,7 +109,9 @@ class Gender(models.Model):
     
 
 class Heamophilia(models.Model):
-    heamophilia_id = models.CharField(max_length=3, primary_key=True, editable=False)
+    ID_PREFIX = 'H'
+
+    heamophilia_id = models.CharField(max_length=10, primary_key=True, editable=False)
     name = models.CharField(max_length=50, unique=True)
 
     is_active = models.BooleanField(default=True)
@@ -54,11 +120,28 @@ class Heamophilia(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.heamophilia_id:  # Only generate heamophilia_id for new objects
-            last_heamophilia = Heamophilia.objects.order_by('-heamophilia_id').first()
-            next_number = 1 if not last_heamophilia else int(last_heamophilia.heamophilia_id[1:]) + 1
-            self.heamophilia_id = f"H{next_number:02}"  # Format as Hxx with zero-padding
+            # In the insert's transaction, so a failed insert hands the number back
+            with write_atomic():
+                self.heamophilia_id = next_lookup_ids(Heamophilia)[0]  # H01, H02, ... H100, from the counter
+                # The row is new, so the UPDATE Django tries first for an instance with a key is skipped
+                kwargs['force_insert'] = True
+                return super().save(*args, **kwargs)
         super().save(*args, **kwargs)
 
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class LookupVersion(models.Model):
+    """
+    Version stamp of a cached table (Role, Gender, Heamophilia).
+
+    A new stamp is written whenever a row of the table is saved or deleted, and every process
+    compares it with the stamp its lookup cache was loaded with (see tables/lookups.py).
+    """
+    table = models.CharField(max_length=50, primary_key=True)
+    version = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.table} {self.version}"
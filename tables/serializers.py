@@ -1,8 +1,14 @@
+# these are django imports
+from django.db import IntegrityError
+
 # these are rest_framework imports
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 
 # these are the local imports
-from .models import Role, Gender, Heamophilia
+from HealthData.transactions import write_atomic
+from .models import Role, Gender, Heamophilia, next_lookup_ids
+from .signals import invalidate_lookup_cache
 
 """
 These serializers are used to serialize the data from Role, Gender and Heamophilia models.
@@ -11,17 +17,60 @@ The Meta class specifies the model and the fields to be included in the serializ
 The serializers are used in the views to convert the model instances to JSON data and vice versa.
 """
 
+
+class LookupListSerializer(serializers.ListSerializer):
+    """
+    Creates a list of lookup rows in bulk: the names are checked for uniqueness with one query for
+    the whole list, the ids are allocated with one statement and the rows are inserted with bulk_create,
+    in one transaction.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Checked once for the whole list in validate() instead of once per row
+        name = self.child.fields['name']
+        name.validators = [validator for validator in name.validators if not isinstance(validator, UniqueValidator)]
+
+    def validate(self, attrs):
+        model = self.child.Meta.model
+        names = [item['name'] for item in attrs]
+        repeated = sorted({name for name in names if names.count(name) > 1})
+        if repeated:
+            raise serializers.ValidationError(f"Names given more than once: {', '.join(repeated)}.")
+        existing = sorted(model.objects.filter(name__in=names).values_list('name', flat=True))
+        if existing:
+            raise serializers.ValidationError(f"{model._meta.verbose_name.capitalize()} with these names already exist: {', '.join(existing)}.")
+        return attrs
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        try:
+            # The ids are allocated in the insert's transaction, so a failed insert hands them back
+            with write_atomic():
+                ids = next_lookup_ids(model, len(validated_data))
+                objects = [model(pk=pk, **item) for pk, item in zip(ids, validated_data)]
+                model.objects.bulk_create(objects)
+                # bulk_create sends no post_save signals
+                invalidate_lookup_cache(model)
+        except IntegrityError:
+            raise serializers.ValidationError("A name was created concurrently, please retry.")
+        return objects
+
+
 class RoleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Role
         fields = '__all__'
+        list_serializer_class = LookupListSerializer
 
 class GenderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Gender
         fields = '__all__'
+        list_serializer_class = LookupListSerializer
 
 class HeamophiliaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Heamophilia
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        list_serializer_class = LookupListSerializer
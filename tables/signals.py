@@ -0,0 +1,19 @@
+# these are django imports
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+# these are local imports
+from .lookups import LOOKUP_MODELS, bump_version, get_lookup_cache
+
+
+def invalidate_lookup_cache(sender, raw=False, **kwargs):
+    if raw:
+        return
+    bump_version(sender)
+    # This process drops its copy as soon as the change is committed; other processes notice the new stamp
+    transaction.on_commit(lambda: get_lookup_cache().invalidate(sender))
+
+
+for model in LOOKUP_MODELS:
+    post_save.connect(invalidate_lookup_cache, sender=model, dispatch_uid=f'invalidate_lookup_cache_{model.__name__}_save')
+    post_delete.connect(invalidate_lookup_cache, sender=model, dispatch_uid=f'invalidate_lookup_cache_{model.__name__}_delete')
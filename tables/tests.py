@@ -1,3 +1,216 @@
-from django.test import TestCase
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+# these are django imports
+from django.apps import apps
+from django.db import IntegrityError, connection, models
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+# these are rest_framework imports
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+# these are local imports
+from . import lookups
+from .lookups import LookupCache, get_lookup_cache
+from .models import Gender, Heamophilia, IdCounter, LookupVersion, Role, next_lookup_ids
+from .serializers import LookupListSerializer
+from user.tests import FAST_PASSWORD_HASHERS, create_user
+
+
+class LookupCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_role = Role.objects.create(name='Admin')
+        cls.user_role = Role.objects.create(name='User')
+        Gender.objects.create(name='Male')
+
+    def use_cache(self, check_interval_seconds):
+        cache = LookupCache(check_interval_seconds=check_interval_seconds)
+        patcher = mock.patch.object(lookups, '_lookup_cache', cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return cache
+
+    def test_tables_are_read_once(self):
+        cache = self.use_cache(3600)
+        with self.assertNumQueries(2):
+            self.assertEqual(cache.names(Role), {self.admin_role.pk: 'Admin', self.user_role.pk: 'User'})
+        with self.assertNumQueries(1):
+            self.assertEqual(cache.name(Gender, 'G01'), 'Male')
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.name(Role, self.user_role.pk), 'User')
+            self.assertIsNone(cache.name(Role, 'R99'))
+
+    def test_writes_bump_the_table_version(self):
+        cache = self.use_cache(3600)
+        role_version = cache.version(Role)
+        gender_version = cache.version(Gender)
+        self.assertIsNotNone(role_version)
+
+        Role.objects.create(name='Doctor')
+        stamps = dict(LookupVersion.objects.values_list('table', 'version'))
+        self.assertNotEqual(stamps[Role._meta.db_table], role_version)
+        self.assertEqual(stamps[Gender._meta.db_table], gender_version)
+
+        version = stamps[Role._meta.db_table]
+        self.user_role.delete()
+        self.assertNotEqual(LookupVersion.objects.get(table=Role._meta.db_table).version, version)
+
+    def test_own_writes_are_seen_once_committed(self):
+        cache = self.use_cache(3600)
+        self.assertEqual(cache.names(Heamophilia), {})
+        with self.captureOnCommitCallbacks(execute=True):
+            heamophilia = Heamophilia.objects.create(name='A')
+        self.assertEqual(cache.names(Heamophilia), {heamophilia.pk: 'A'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            heamophilia.name = 'B'
+            heamophilia.save()
+        self.assertEqual(cache.names(Heamophilia), {heamophilia.pk: 'B'})
+
+    def test_other_processes_writes_are_seen_at_the_next_check(self):
+        cache = self.use_cache(0)
+        cache.names(Role)
+        # Committed by another process: only the stamp changes, nothing invalidates this copy
+        Role.objects.filter(pk=self.user_role.pk).update(name='Patient')
+        lookups.bump_version(Role)
+        self.assertEqual(cache.name(Role, self.user_role.pk), 'Patient')
+        # An unchanged stamp does not reload the table
+        with self.assertNumQueries(1):
+            cache.names(Role)
+
+    def test_process_wide_cache(self):
+        with mock.patch.object(lookups, '_lookup_cache', None), self.settings(LOOKUP_CACHE={'CHECK_INTERVAL_SECONDS': 30}):
+            cache = get_lookup_cache()
+            self.assertIs(get_lookup_cache(), cache)
+            self.assertEqual(cache.check_interval_seconds, 30)
+
+
+def allocate_in_child(path, count, results):
+    # A forked child must not use the parent's sqlite3 handle, it opens the database file instead
+    connection.connection = None
+    connection.settings_dict['NAME'] = path
+    results.put([number for _ in range(count) for number in IdCounter.objects.allocate('t')])
+
+
+class IdCounterTests(TestCase):
+
+    def test_allocations_are_disjoint_blocks(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(IdCounter.objects.allocate('t'), range(1, 2))
+        self.assertEqual(IdCounter.objects.allocate('t', 3), range(2, 5))
+        self.assertEqual(IdCounter.objects.allocate('other', 2), range(1, 3))
+        self.assertEqual(IdCounter.objects.allocate('t'), range(5, 6))
+
+    def test_fallback_without_upserts(self):
+        IdCounter.objects.allocate('t', 2)
+        features = connection.features
+        with mock.patch.object(features, 'supports_update_conflicts_with_target', False):
+            self.assertEqual(IdCounter.objects.allocate('t', 3), range(3, 6))
+            self.assertEqual(IdCounter.objects.allocate('new'), range(1, 2))
+        self.assertEqual(IdCounter.objects.allocate('t'), range(6, 7))
+
+    def test_lookup_ids(self):
+        # The migration has created the counters of the lookup tables
+        IdCounter.objects.filter(name=Role._meta.db_table).update(value=98)
+        self.assertEqual(next_lookup_ids(Role, 2), ['R99', 'R100'])
+        self.assertEqual(next_lookup_ids(Gender), ['G01'])
+
+    def test_save_inserts_with_the_next_id(self):
+        Role.objects.create(name='Admin')
+        with CaptureQueriesContext(connection) as queries:
+            role = Role.objects.create(name='User')
+        self.assertEqual(role.pk, 'R02')
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "tables_role"')])
+        role.name = 'Patient'
+        role.save()
+        self.assertEqual(Role.objects.get(pk='R02').name, 'Patient')
+        self.assertEqual(IdCounter.objects.get(name=Role._meta.db_table).value, 2)
+
+    def test_failed_inserts_hand_the_ids_back(self):
+        Role.objects.create(name='Admin')
+        with mock.patch.object(models.Model, 'save_base', side_effect=IntegrityError), self.assertRaises(IntegrityError):
+            Role.objects.create(name='Admin')
+        self.assertEqual(Role.objects.create(name='User').pk, 'R02')
+
+    def test_migration_starts_after_the_existing_ids(self):
+        IdCounter.objects.all().delete()
+        Role.objects.bulk_create([Role(pk='R07', name='a'), Role(pk='R100', name='b'), Role(pk='RX', name='c')])
+        import_module('tables.migrations.0005_id_counters').seed_counters(apps, None)
+        self.assertEqual(IdCounter.objects.get(name=Role._meta.db_table).value, 100)
+        self.assertEqual(IdCounter.objects.get(name=Gender._meta.db_table).value, 0)
+        self.assertEqual(Role.objects.create(name='d').pk, 'R101')
+
+
+
+class ConcurrentAllocationTests(TransactionTestCase):
+
+    def test_processes_get_disjoint_blocks(self):
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'counters.sqlite3')
+        database = sqlite3.connect(path)
+        database.execute("CREATE TABLE tables_idcounter (name varchar(50) NOT NULL PRIMARY KEY, value bigint NOT NULL)")
+        database.close()
+
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        processes = [context.Process(target=allocate_in_child, args=(path, 100, results)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        numbers = [number for _ in processes for number in results.get(timeout=60)]
+        for process in processes:
+            process.join()
+        # No number handed out twice, and none skipped
+        self.assertEqual(sorted(numbers), list(range(1, 401)))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class BulkLookupCreationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # The first role, R01, is the admin role
+        admin_role = Role.objects.create(name='Admin')
+        cls.admin = create_user('admin', 1, admin_role, Gender.objects.create(name='Male'))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.admin).key}")
+
+    def post(self, path, data):
+        return self.client.post(path, data, format='json')
+
+    def test_list_is_created_in_bulk(self):
+        version = LookupVersion.objects.filter(table=Heamophilia._meta.db_table).values_list('version', flat=True).first()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post('/tables/heamophilia/', [{'name': 'A'}, {'name': 'B'}, {'name': 'C'}])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([row['heamophilia_id'] for row in response.json()], ['H01', 'H02', 'H03'])
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT INTO "tables_heamophilia"')]), 1)
+        # bulk_create sends no signals, the table is stamped anyway
+        self.assertNotEqual(LookupVersion.objects.get(table=Heamophilia._meta.db_table).version, version)
+
+        self.assertEqual(self.post('/tables/heamophilia/', {'name': 'D'}).json()['heamophilia_id'], 'H04')
+
+    def test_names_are_checked_for_the_whole_list(self):
+        response = self.post('/tables/role/', [{'name': 'Doctor'}, {'name': 'Doctor'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Names given more than once: Doctor.', str(response.json()))
+        response = self.post('/tables/role/', [{'name': 'Nurse'}, {'name': 'Admin'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already exist: Admin.', str(response.json()))
+        self.assertEqual(Role.objects.count(), 1)
+
+    def test_failed_inserts_hand_the_ids_back(self):
+        # Created concurrently, after the names were checked
+        with mock.patch.object(LookupListSerializer, 'validate', lambda serializer, attrs: attrs):
+            response = self.post('/tables/role/', [{'name': 'Nurse'}, {'name': 'Admin'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('created concurrently', str(response.json()))
+        self.assertEqual([row['role_id'] for row in self.post('/tables/role/', [{'name': 'Nurse'}]).json()], ['R02'])
@@ -18,6 +18,7 @@ These views  are used to handle the CRUD opertions for the Role, Gender and Heam
 They user RoleSerializer, GenderSerializer and HeamophiliaSerializer to serialize  and deserialize the data.
 The views are accessed using the APIView class and the appropriate HTTP methods (GET, POST, PUT, PATCH, DELETE).
 The views are protected by the IsAuthenticated permission class, which ensures that only authenticated users can access the views.
+A POST with a list of objects creates all of them at once, with one id allocation and one bulk insert.
 """
 class RoleCRUDView(APIView):
     permission_classes = [IsAdminUser]
@@ -36,7 +37,8 @@ class RoleCRUDView(APIView):
         return Response(serializer.data)
 
     def post(self, request):
-        serializer = RoleSerializer(data=request.data)
+        # A list is created in bulk, see LookupListSerializer
+        serializer = RoleSerializer(data=request.data, many=isinstance(request.data, list))
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -94,7 +96,8 @@ class GenderCRUDView(APIView):
         return Response(serializer.data)
 
     def post(self, request):
-        serializer = GenderSerializer(data=request.data)
+        # A list is created in bulk, see LookupListSerializer
+        serializer = GenderSerializer(data=request.data, many=isinstance(request.data, list))
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -151,7 +154,8 @@ class HeamophiliaCRUDView(APIView):
         return Response(serializer.data)
     
     def post(self, request):
-        serializer = HeamophiliaSerializer(data=request.data)
+        # A list is created in bulk, see LookupListSerializer
+        serializer = HeamophiliaSerializer(data=request.data, many=isinstance(request.data, list))
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
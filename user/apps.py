@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        # Keep the search and autocomplete indexes in step with User and Profile writes
+        from . import signals  # noqa: F401
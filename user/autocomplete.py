@@ -0,0 +1,189 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+# these are django imports
+from django.conf import settings
+from django.db import connection
+
+# these are local imports
+from .models import User
+
+"""
+In-memory prefix index for the admin autocomplete.
+
+Every user contributes one lowercased key per indexed field (KA registration number, last name
+and first name) to a sorted list, so the suggestions for a prefix are a bisect followed by a short
+walk over the keys that start with it, without touching the database.
+"""
+
+# Fields whose prefixes are suggested, in the order of the stored user tuple after id and username
+AUTOCOMPLETE_FIELDS = ('ka_regd_no', 'last_name', 'first_name')
+
+
+class AutocompleteIndex:
+    """
+    Sorted (key, field, user_id) entries plus the display values of every user.
+
+    The index is built in a background thread when the server starts (see start_rebuild()), or on
+    first use if no build has finished yet. Writes made through this process refresh single users as
+    soon as they commit; once the index is older than max_age_seconds it is rebuilt in a background
+    thread so that writes made by other processes show up eventually, and the old index keeps
+    answering until the new one is swapped in.
+    """
+
+    def __init__(self, max_age_seconds=300):
+        self.max_age_seconds = max_age_seconds
+        self._entries = []
+        self._users = {}  # user_id -> (username, ka_regd_no, last_name, first_name)
+        self._built_at = None
+        self._building = False
+        # Users refreshed while a build reads the database, re-applied once it is swapped in
+        self._refreshed_during_build = None
+        self._lock = threading.Lock()
+        self._first_build_lock = threading.Lock()
+
+    @property
+    def is_built(self):
+        return self._built_at is not None
+
+    def build(self):
+        """
+        Read every user and swap the new index in, on the calling thread.
+        """
+        with self._lock:
+            if self._refreshed_during_build is None:
+                self._refreshed_during_build = set()
+        rows = User.objects.values_list(
+            'id', 'username', 'profile__ka_regd_no', 'last_name', 'first_name'
+        ).order_by()
+        users = {row[0]: row[1:] for row in rows.iterator(chunk_size=5000)}
+        entries = sorted(entry for user_id, values in users.items() for entry in self._user_entries(user_id, values))
+        with self._lock:
+            self._users = users
+            self._entries = entries
+            self._built_at = time.monotonic()
+            refreshed, self._refreshed_during_build = self._refreshed_during_build, None
+        if refreshed:
+            # They may have been read before their write committed
+            self.refresh_users(list(refreshed))
+
+    def start_rebuild(self):
+        """
+        Rebuild the index in a background thread, unless a rebuild is already running.
+        """
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._rebuild, name='autocomplete-rebuild', daemon=True).start()
+
+    def _rebuild(self):
+        try:
+            # Requests arriving before the first build finishes wait for this one instead of building too
+            with self._first_build_lock:
+                self.build()
+        finally:
+            with self._lock:
+                self._building = False
+            # The thread's own connection
+            connection.close()
+
+    def refresh_user(self, user_id):
+        """
+        Re-read one user (and their profile) and replace their entries. Removes users that no longer exist.
+        """
+        self.refresh_users([user_id])
+
+    def refresh_users(self, user_ids):
+        """
+        refresh_user() for many users at once, with one query.
+        """
+        with self._lock:
+            if self._refreshed_during_build is not None:
+                self._refreshed_during_build.update(user_ids)
+        if not self.is_built:
+            return
+        rows = User.objects.filter(id__in=user_ids).values_list(
+            'id', 'username', 'profile__ka_regd_no', 'last_name', 'first_name'
+        )
+        rows = {row[0]: row[1:] for row in rows}
+        with self._lock:
+            for user_id in user_ids:
+                previous = self._users.pop(user_id, None)
+                if previous is not None:
+                    for entry in self._user_entries(user_id, previous):
+                        index = bisect_left(self._entries, entry)
+                        if index < len(self._entries) and self._entries[index] == entry:
+                            del self._entries[index]
+                row = rows.get(user_id)
+                if row is not None:
+                    self._users[user_id] = row
+                    for entry in self._user_entries(user_id, row):
+                        insort(self._entries, entry)
+
+    def suggest(self, prefix, limit=10):
+        """
+        Return up to 'limit' users with a KA registration number, last name or first name starting with
+        the prefix (case-insensitive), in key order, each user once.
+        """
+        if not self.is_built:
+            # Nothing to answer from yet: one request builds, concurrent ones wait for it
+            with self._first_build_lock:
+                if not self.is_built:
+                    self.build()
+        elif time.monotonic() - self._built_at > self.max_age_seconds:
+            self.start_rebuild()
+        with self._lock:
+            prefix = prefix.lower()
+            suggestions = []
+            seen = set()
+            index = bisect_left(self._entries, (prefix,))
+            while index < len(self._entries) and len(suggestions) < limit:
+                key, field, user_id = self._entries[index]
+                if not key.startswith(prefix):
+                    break
+                index += 1
+                if user_id in seen:
+                    continue
+                seen.add(user_id)
+                username, ka_regd_no, last_name, first_name = self._users[user_id]
+                suggestions.append({
+                    'username': username,
+                    'ka_regd_no': ka_regd_no,
+                    'first_name': first_name,
+                    'last_name': last_name,
+                    'matched': field,
+                })
+            return suggestions
+
+    @staticmethod
+    def _user_entries(user_id, values):
+        for field, value in zip(AUTOCOMPLETE_FIELDS, values[1:]):
+            if value:
+                yield (value.lower(), field, user_id)
+
+
+_autocomplete_index = None
+_autocomplete_index_lock = threading.Lock()
+
+
+def get_autocomplete_index():
+    """
+    Return the process-wide AutocompleteIndex configured by settings.USER_AUTOCOMPLETE.
+    """
+    global _autocomplete_index
+    if _autocomplete_index is None:
+        with _autocomplete_index_lock:
+            if _autocomplete_index is None:
+                options = getattr(settings, 'USER_AUTOCOMPLETE', {})
+                _autocomplete_index = AutocompleteIndex(max_age_seconds=options.get('MAX_AGE_SECONDS', 300))
+    return _autocomplete_index
+
+
+def warm_up():
+    """
+    Start building the process-wide index in the background, called when the server starts.
+    """
+    if getattr(settings, 'USER_AUTOCOMPLETE', {}).get('BUILD_ON_STARTUP', True):
+        get_autocomplete_index().start_rebuild()
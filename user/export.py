@@ -0,0 +1,49 @@
+import csv
+import io
+
+# these are django imports
+from django.core.serializers.json import DjangoJSONEncoder
+
+"""
+Streamed CSV and NDJSON exports of the user roster.
+
+The rows are read from the database in chunks (QuerySet.iterator) and written out a chunk at a
+time, so memory stays flat however many users are exported.
+"""
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _chunks(rows, size=EXPORT_CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_csv(rows, columns):
+    """
+    Yield a CSV document, header first, of the dict rows restricted to the given columns.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for chunk in _chunks(rows):
+        writer.writerows([row[column] for column in columns] for row in chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(entries):
+    """
+    Yield one JSON document per line for every entry.
+    """
+    encoder = DjangoJSONEncoder()
+    for chunk in _chunks(entries):
+        yield ''.join(encoder.encode(entry) + '\n' for entry in chunk)
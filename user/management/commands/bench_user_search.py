@@ -0,0 +1,96 @@
+import os
+import random
+import tempfile
+import time
+
+# these are django imports
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+
+# these are local imports
+from user.models import User
+from user.search import is_supported, rebuild_index, search_user_ids
+from user_profile.models import Profile
+
+FIRST_NAMES = ('Aarav', 'Vivaan', 'Aditya', 'Ananya', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Rohan', 'Saanvi')
+LAST_NAMES = ('Sharma', 'Patel', 'Reddy', 'Nair', 'Iyer', 'Gowda', 'Rao', 'Singh', 'Khan', 'Das')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the admin search through the full-text index with the icontains filters on a synthetic "
+        "population (100k users by default). It runs on a scratch database, created like the test "
+        "database in a temporary file and deleted afterwards, never on the configured one."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            raise CommandError("The search index is only available on SQLite.")
+
+        # Loading 100k users into the real database would grow its file and hold the write lock for the whole run
+        with tempfile.TemporaryDirectory() as directory:
+            test_settings = connection.settings_dict.setdefault('TEST', {})
+            test_name = test_settings.get('NAME')
+            test_settings['NAME'] = os.path.join(directory, 'bench_user_search.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                test_settings['NAME'] = test_name
+
+    def run(self, options):
+        self.populate(options['users'], options['seed'])
+        queries = ['patel', 'ananya.r', 'KA0042', 'user12345', 'nobody-matches']
+        for query in queries:
+            legacy = self.time(self.legacy_search, query, options['repeat'])
+            indexed = self.time(self.indexed_search, query, options['repeat'])
+            self.stdout.write(
+                f"{query!r:<18} icontains: {legacy[0]:8.2f} ms ({legacy[1]} hits)   "
+                f"fts5: {indexed[0]:8.2f} ms ({indexed[1]} hits)   {legacy[0] / indexed[0]:.0f}x"
+            )
+
+    def populate(self, count, seed):
+        rng = random.Random(seed)
+        started = time.perf_counter()
+        first_id = (User.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        users = []
+        for n in range(count):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            users.append(User(
+                id=first_id + n, username=f"user{n}", first_name=first, last_name=last,
+                email=f"{first.lower()}.{last[0].lower()}{n}@example.com", password='!', role=None,
+            ))
+        User.objects.bulk_create(users, batch_size=2000)
+        Profile.objects.bulk_create(
+            [Profile(user_id=first_id + n, ka_regd_no=f"KA{n:06}") for n in range(count)], batch_size=2000
+        )
+        indexed = rebuild_index()
+        self.stdout.write(f"Loaded and indexed {indexed} users in {time.perf_counter() - started:.1f} s")
+
+    def legacy_search(self, query):
+        users = User.objects.select_related('profile').filter(
+            Q(username__icontains=query) | Q(first_name__icontains=query) | Q(last_name__icontains=query) |
+            Q(email__icontains=query) | Q(profile__ka_regd_no__icontains=query)
+        )
+        count = users.count()
+        list(users[:10])
+        return count
+
+    def indexed_search(self, query):
+        ids = search_user_ids(query)
+        list(User.objects.select_related('profile').in_bulk(ids[:10]).values())
+        return len(ids)
+
+    def time(self, search, query, repeat):
+        hits = search(query)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            search(query)
+        return (time.perf_counter() - started) * 1000 / repeat, hits
@@ -0,0 +1,15 @@
+# these are django imports
+from django.core.management.base import BaseCommand, CommandError
+
+# these are local imports
+from user.search import is_supported, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Repopulate the admin search index from the User and Profile tables, e.g. after rows were bulk loaded."
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            raise CommandError("The search index is only available on SQLite.")
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} users."))
@@ -0,0 +1,26 @@
+from datetime import date
+
+# these are django imports
+from django.core.management.base import BaseCommand, CommandError
+
+# these are local imports
+from user.models import AgeRefresh
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the stored User.age up to date, updating only the users with a birthday since the previous "
+        "run in a single UPDATE. Meant to be scheduled daily; the first run, and a run for a date before the "
+        "previous one, update every user."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--on', help="Compute the ages as of this date (YYYY-MM-DD) instead of today.")
+
+    def handle(self, *args, **options):
+        try:
+            on = date.fromisoformat(options['on']) if options['on'] else None
+        except ValueError:
+            raise CommandError("'--on' must be a date in YYYY-MM-DD format.")
+        refresh = AgeRefresh.objects.run(on=on)
+        self.stdout.write(self.style.SUCCESS(f"Updated the age of {refresh.users_updated} users as of {refresh.run_on}."))
@@ -0,0 +1,53 @@
+import csv
+import time
+from itertools import islice
+
+# these are django imports
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# these are local imports
+from user.registration import register_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Register the patients of a CSV file (a header row of user and profile field names, then one row "
+        "per patient), in batches of BULK_REGISTRATION['MAX_ROWS']. Rows with errors are skipped and "
+        "reported with their line number; the other rows are registered."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to register.")
+        parser.add_argument('--batch-size', type=int, help="Rows registered at once (default BULK_REGISTRATION['MAX_ROWS']).")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size'] or settings.BULK_REGISTRATION.get('MAX_ROWS', 1000)
+        created = failed = 0
+        started = time.perf_counter()
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as file:
+                reader = csv.DictReader(file)
+                # The header is line 1
+                line = 1
+                while True:
+                    # Empty cells are left out, like fields missing from a JSON row
+                    batch = [{key: value for key, value in row.items() if value not in ('', None)} for row in islice(reader, batch_size)]
+                    if not batch:
+                        break
+                    for result in register_rows(batch):
+                        if result['status'] == 'created':
+                            created += 1
+                            self.stdout.write(f"line {line + result['row']}: created {result['username']} (id {result['id']})")
+                        else:
+                            failed += 1
+                            errors = '; '.join(f"{field}: {' '.join(str(message) for message in messages)}"
+                                               for field, messages in result['errors'].items())
+                            self.stderr.write(f"line {line + result['row']}: {errors}")
+                    line += len(batch)
+        except OSError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Registered {created} users, {failed} rows failed, in {time.perf_counter() - started:.2f} s."
+        ))
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:10
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Create the FTS5 table behind the admin search and fill it from the existing users (SQLite only).
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE user_search USING fts5("
+        "username, first_name, last_name, email, ka_regd_no, tokenize='trigram')"
+    )
+    schema_editor.execute(
+        "INSERT INTO user_search(rowid, username, first_name, last_name, email, ka_regd_no) "
+        "SELECT u.id, COALESCE(u.username, ''), COALESCE(u.first_name, ''), COALESCE(u.last_name, ''), "
+        "COALESCE(u.email, ''), COALESCE(p.ka_regd_no, '') "
+        "FROM user_user u LEFT JOIN user_profile_profile p ON p.user_id = u.id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS user_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0008_alter_user_gender'),
+        ('user_profile', '0002_profile_is_active'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
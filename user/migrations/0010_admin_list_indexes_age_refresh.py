@@ -0,0 +1,53 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:10
+
+import user.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # The age index of the admin list was replaced by the date_of_birth index before either was released
+    replaces = [
+        ('user', '0010_admin_list_indexes'),
+        ('user', '0011_date_of_birth_index_age_refresh'),
+    ]
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('tables', '0005_id_counters'),
+        ('user', '0009_user_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['city'], name='user_city_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['state'], name='user_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_active'], name='user_is_active_idx'),
+        ),
+        migrations.CreateModel(
+            name='AgeRefresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_on', models.DateField()),
+                ('users_updated', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', user.models.UserManager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['date_of_birth'], name='user_date_of_birth_idx'),
+        ),
+    ]
@@ -1,9 +1,119 @@
 # these are django imports
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import ExtractYear
+from django.contrib.auth.models import AbstractUser, UserManager as AuthUserManager
 from django.core.validators import RegexValidator
 from datetime import date
 
+# these are local imports
+from HealthData.transactions import write_atomic
+
+# (label, youngest age, oldest age or None) of the age-band cohorts
+AGE_BANDS = (
+    ('0-5', 0, 5),
+    ('6-12', 6, 12),
+    ('13-17', 13, 17),
+    ('18-29', 18, 29),
+    ('30-44', 30, 44),
+    ('45-59', 45, 59),
+    ('60+', 60, None),
+)
+AGE_BAND_LABELS = tuple(label for label, _, _ in AGE_BANDS)
+# Oldest age accepted by the age filters
+MAX_AGE = 150
+
+
+def birth_date_cutoff(on, age):
+    """
+    Return the latest date of birth of someone who is at least 'age' years old on the date 'on'.
+
+    Ages match User.set_derived_fields(): someone born on 29 February turns a year older on
+    1 March in other years.
+    """
+    try:
+        return on.replace(year=on.year - age)
+    except ValueError:
+        # 'on' is 29 February and the year is not a leap year
+        return on.replace(year=on.year - age, day=28)
+
+
+def age_expression(on=None):
+    """
+    Expression computing the age on the date 'on' (today by default) from date_of_birth, in the
+    database, like User.set_derived_fields(). NULL for users without a date of birth.
+    """
+    on = on or date.today()
+    birthday_ahead = Q(date_of_birth__month__gt=on.month) | Q(date_of_birth__month=on.month, date_of_birth__day__gt=on.day)
+    return Value(on.year) - ExtractYear('date_of_birth') - Case(
+        When(birthday_ahead, then=Value(1)), default=Value(0), output_field=IntegerField()
+    )
+
+
+class UserQuerySet(models.QuerySet):
+    """
+    Age queries derived from date_of_birth when they run, instead of the stored age, which is only
+    as recent as the last save() or refresh (see AgeRefresh). Filters are translated to
+    date_of_birth ranges, so they are served by the date_of_birth index.
+    """
+
+    def with_age(self, on=None):
+        """
+        Annotate each user with 'current_age', their age on the date 'on' (today by default).
+        """
+        return self.annotate(current_age=age_expression(on))
+
+    def with_age_band(self, on=None):
+        """
+        Annotate each user with 'age_band', the label of their AGE_BANDS band on the date 'on'.
+        """
+        on = on or date.today()
+        bands = [
+            When(date_of_birth__gt=birth_date_cutoff(on, oldest + 1), then=Value(label))
+            for label, _, oldest in AGE_BANDS if oldest is not None
+        ]
+        bands.append(When(date_of_birth__isnull=False, then=Value(AGE_BANDS[-1][0])))
+        return self.annotate(age_band=Case(*bands, default=None, output_field=models.CharField()))
+
+    def age_between(self, youngest=None, oldest=None, on=None):
+        """
+        Filter the users aged 'youngest' to 'oldest' (inclusive, either may be None) on the date 'on'.
+        """
+        on = on or date.today()
+        queryset = self
+        if youngest is not None:
+            queryset = queryset.filter(date_of_birth__lte=birth_date_cutoff(on, youngest))
+        if oldest is not None:
+            queryset = queryset.filter(date_of_birth__gt=birth_date_cutoff(on, oldest + 1))
+        return queryset
+
+    def in_age_band(self, label, on=None):
+        """
+        Filter the users in the AGE_BANDS band 'label' on the date 'on'. Raises KeyError for an unknown label.
+        """
+        youngest, oldest = {band: (youngest, oldest) for band, youngest, oldest in AGE_BANDS}[label]
+        return self.age_between(youngest, oldest, on=on)
+
+    def birthday_passed(self, after, on):
+        """
+        Filter the users with a birthday after the date 'after' and up to the date 'on', i.e. whose
+        age changed in between, as one date_of_birth range per age.
+        """
+        if birth_date_cutoff(on, 1) >= after:
+            # A year or more: everyone had a birthday
+            return self.filter(date_of_birth__isnull=False)
+        oldest = self.aggregate(oldest=models.Min('date_of_birth'))['oldest']
+        if oldest is None:
+            return self.none()
+        ranges = Q()
+        for age in range(on.year - oldest.year + 2):
+            ranges |= Q(date_of_birth__gt=birth_date_cutoff(after, age), date_of_birth__lte=birth_date_cutoff(on, age))
+        return self.filter(ranges)
+
+
+class UserManager(AuthUserManager.from_queryset(UserQuerySet)):
+    pass
+
 
 # Create your models here.
 class User(AbstractUser):
@@ -31,21 +141,113 @@ class User(AbstractUser):
  
     is_active = models.BooleanField(default=True)
 
+    # Age when the user was last saved or refreshed (see AgeRefresh); UserQuerySet derives it when queried
     age = models.IntegerField(null=True, blank=True, editable=False)
 
+    objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        # Admin listing filters; the FK filters (gender, role) use the foreign key indexes.
+        # On SQLite every index also carries the id, so a filtered page is read in id order.
+        indexes = [
+            models.Index(fields=['city'], name='user_city_idx'),
+            models.Index(fields=['state'], name='user_state_idx'),
+            models.Index(fields=['is_active'], name='user_is_active_idx'),
+            # Age and age-band filters are date_of_birth ranges (see UserQuerySet)
+            models.Index(fields=['date_of_birth'], name='user_date_of_birth_idx'),
+        ]
+
+    # Fields whose change must drop the user's cached token authentications in every process (see user/signals.py)
+    AUTH_FIELDS = ('is_active', 'role_id', 'password')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_auth_values = instance.auth_values()
+        return instance
+
+    def auth_values(self):
+        return tuple(self.__dict__.get(field) for field in self.AUTH_FIELDS)
+
+    def auth_values_changed(self):
+        """
+        Whether is_active, the role or the password differ from the values loaded from the database.
+        Instances not loaded from the database count as changed.
+        """
+        loaded = getattr(self, '_loaded_auth_values', None)
+        return loaded is None or loaded != self.auth_values()
+
     def save(self, *args, **kwargs):
+        self.set_derived_fields()
+        super().save(*args, **kwargs)
+
+    def set_derived_fields(self):
+        """
+        Set the age and the admin flags from the date of birth and the role, as saved with the user.
+        Also called for users inserted with bulk_create, which skips save().
+        """
         if self.date_of_birth:
             today = date.today()
             self.age = today.year - self.date_of_birth.year - ((today.month, today.day) < (self.date_of_birth.month, self.date_of_birth.day))
 
-        if self.role and self.role.role_id == "R01":
+        if self.role_id == "R01":
             self.is_staff = True
             self.is_superuser = True
 
         else:
             self.is_staff = False
             self.is_superuser = False
-        super().save(*args, **kwargs)
 
     def __str__(self):
-        return self.username
\ No newline at end of file
+        return self.username
+
+
+class AgeRefreshQuerySet(models.QuerySet):
+
+    def run(self, on=None):
+        """
+        Bring the stored User.age up to date for the date 'on' (today by default) and record the run.
+
+        Only the users with a birthday since the latest run are updated, with a single UPDATE that
+        computes the age in the database. The first run, and a run for a date before the one of the
+        latest run (e.g. after a run with a future date), update every user with a date of birth.
+        Returns the AgeRefresh of this run.
+        """
+        on = on or date.today()
+        with write_atomic():
+            # The latest run, not the latest date: the stored ages are the ones it computed
+            previous = self.select_for_update().order_by('-created_at', '-id').first()
+            users = User.objects.all()
+            if previous is not None and previous.run_on <= on:
+                users = users.birthday_passed(previous.run_on, on)
+            else:
+                users = users.filter(date_of_birth__isnull=False)
+            updated = users.update(age=age_expression(on))
+            return self.create(run_on=on, users_updated=updated)
+
+
+class AgeRefresh(models.Model):
+    """
+    A run of the stored age refresh, see AgeRefreshQuerySet.run().
+    """
+    run_on = models.DateField()
+    users_updated = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = AgeRefreshQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.run_on} ({self.users_updated} users)"
+
+
+class TokenRevocation(models.Model):
+    """
+    A user whose cached token authentications must be dropped, e.g. after a deactivation, a role
+    or password change or a deleted token. Every process reads the rows added since its last check
+    (see HealthData/authentication.py). No foreign key, the user may be deleted.
+    """
+    user_id = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user_id} {self.created_at}"
@@ -0,0 +1,38 @@
+"""
+Compact {user, profile} rows for list and search responses.
+
+Instead of loading whole User and Profile instances and running them through UserSerializer and
+ProfileSerializer one by one, the compact mode selects just the columns below with values() in a
+single query (the profile through a LEFT JOIN) and builds the nested dicts directly.
+"""
+
+COMPACT_USER_FIELDS = ('id', 'username', 'first_name', 'last_name', 'email', 'phone_number', 'city', 'state', 'is_active')
+COMPACT_PROFILE_FIELDS = ('ka_regd_no', 'heamophilia_type', 'factor', 'inhibitor')
+# The roster export also carries the columns the admin list can be filtered on. The age is the
+# current one, annotated by UserQuerySet.with_age(), not the stored User.age, which lags until refresh_ages runs
+EXPORT_USER_FIELDS = COMPACT_USER_FIELDS + ('current_age', 'gender', 'role')
+
+_PROFILE_COLUMNS = tuple(f'profile__{field}' for field in ('id',) + COMPACT_PROFILE_FIELDS)
+# Flat column names of an exported compact_values() row
+EXPORT_COLUMNS = EXPORT_USER_FIELDS + _PROFILE_COLUMNS[1:]
+
+
+def is_compact(request):
+    return request.GET.get('compact', '').lower() in ('1', 'true', 'yes')
+
+
+def compact_values(users, user_fields=COMPACT_USER_FIELDS):
+    """
+    Turn a User queryset into a values() queryset of the compact columns, so it can still be paginated.
+    """
+    return users.values(*user_fields, *_PROFILE_COLUMNS)
+
+
+def compact_entry(row, user_fields=COMPACT_USER_FIELDS):
+    """
+    Build the {user, profile} dict of one compact_values() row. Users without a profile get {}.
+    """
+    user = {field: row[field] for field in user_fields}
+    if row['profile__id'] is None:
+        return {'user': user, 'profile': {}}
+    return {'user': user, 'profile': {field: row[f'profile__{field}'] for field in COMPACT_PROFILE_FIELDS}}
@@ -0,0 +1,256 @@
+import os
+import threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# these are django imports
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+# these are rest_framework imports
+from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+
+# these are local imports
+from HealthData.transactions import write_atomic
+from .models import User
+from .serializers import UserSerializer
+from .search import index_users
+from .autocomplete import get_autocomplete_index
+from user_profile.models import Profile
+from user_profile.serializers import ProfileSerializer
+from tables.lookups import get_lookup_cache
+from tables.models import Gender
+
+"""
+Bulk registration of patients, for onboarding a clinic in one go (AdminBulkRegisterView and the
+register_users_csv command).
+
+Registering users one at a time costs a PBKDF2 hash and a uniqueness query per unique field for
+every user. Here a batch of rows is registered at once:
+- every row is validated like UserSerializer/ProfileSerializer, except the uniqueness checks,
+  which are done for the whole batch with one query per unique field (and chunk)
+- the passwords are hashed in a process pool, since hashing is CPU-bound
+- the users and the profiles are inserted with one bulk_create each, and the search indexes are
+  refreshed once for the batch (bulk_create sends no post_save signals)
+
+A row is a flat dict of UserSerializer fields and, when 'ka_regd_no' is given, the profile fields.
+Rows with errors are skipped, the others are registered, and the outcome is reported per row.
+"""
+
+PROFILE_FIELDS = ('ka_regd_no', 'heamophilia_type', 'percentage', 'factor', 'inhibitor', 'inhibitor_percentage', 'target_joints')
+UNIQUE_FIELDS = (
+    (User, 'username'),
+    (User, 'email'),
+    (User, 'phone_number'),
+    (User, 'parent_phone_number'),
+    (Profile, 'ka_regd_no'),
+)
+# Values per IN (...) query of the uniqueness checks
+UNIQUE_CHECK_CHUNK_SIZE = 500
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _options():
+    return getattr(settings, 'BULK_REGISTRATION', {})
+
+
+def _without_unique_validators(fields):
+    # Checked once for the whole batch instead of with a query per row
+    for field in fields.values():
+        field.validators = [validator for validator in field.validators if not isinstance(validator, UniqueValidator)]
+
+
+class RegistrationUserSerializer(UserSerializer):
+    """
+    UserSerializer for the user fields of a registration row. Registered users get the default role.
+    """
+    # Checked against the cached genders instead of a query per row
+    gender = serializers.CharField(required=False, allow_null=True)
+
+    class Meta(UserSerializer.Meta):
+        fields = tuple(field for field in UserSerializer.Meta.fields if field not in ('id', 'role', 'country'))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _without_unique_validators(self.fields)
+
+    def validate_gender(self, value):
+        if value is not None:
+            names = get_lookup_cache().names(Gender)
+            if value not in names:
+                raise serializers.ValidationError(
+                    f"Invalid gender. Valid genders are: {', '.join(f'{key} ({names[key]})' for key in sorted(names))}."
+                )
+        return value
+
+
+class RegistrationProfileSerializer(ProfileSerializer):
+    """
+    ProfileSerializer for the profile fields of a registration row.
+    """
+
+    class Meta(ProfileSerializer.Meta):
+        fields = PROFILE_FIELDS
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _without_unique_validators(self.fields)
+
+
+def get_hashing_executor():
+    """
+    Return the process-wide pool hashing the passwords of bulk registrations, creating it on first
+    use. It has BULK_REGISTRATION['HASH_WORKERS'] processes, one per CPU by default.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=_options().get('HASH_WORKERS') or os.cpu_count(),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    # Spawned workers set Django up before hashing; the initializer is referenced by
+                    # name, so it must not be a function of this module, which imports the models
+                    initializer=django.setup,
+                )
+    return _executor
+
+
+def hash_passwords(passwords):
+    """
+    Return the hashes of the given passwords, in order, computed across the hashing pool.
+
+    With a single worker (or a single password) there is nothing to parallelise and the passwords
+    are hashed in this process.
+    """
+    passwords = list(passwords)
+    workers = _options().get('HASH_WORKERS') or os.cpu_count()
+    if workers <= 1 or len(passwords) <= 1:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    return list(get_hashing_executor().map(make_password, passwords, chunksize=chunksize))
+
+
+def _validate_row(row):
+    """
+    Return (user data, profile data or None, errors) of a registration row.
+    """
+    if not isinstance(row, dict):
+        return None, None, {'non_field_errors': ["Expected an object of user fields."]}
+    user_serializer = RegistrationUserSerializer(data=row)
+    errors = {} if user_serializer.is_valid() else dict(user_serializer.errors)
+    profile_data = None
+    if row.get('ka_regd_no'):
+        profile_serializer = RegistrationProfileSerializer(data={field: row[field] for field in PROFILE_FIELDS if field in row})
+        if profile_serializer.is_valid():
+            profile_data = profile_serializer.validated_data
+        else:
+            errors.update(profile_serializer.errors)
+    return user_serializer.validated_data if not errors else None, profile_data, errors
+
+
+def _check_unique(entries):
+    """
+    Add an error to the entries whose unique values are repeated in the batch or already registered,
+    with one query per unique field (and chunk of values).
+    """
+    for model, field in UNIQUE_FIELDS:
+        values = {}
+        for entry in entries:
+            if entry['errors']:
+                continue
+            data = entry['user'] if model is User else entry['profile']
+            if data and data.get(field) not in (None, ''):
+                values[entry['row']] = data[field]
+
+        repeated = {value for value, count in Counter(values.values()).items() if count > 1}
+        distinct = list(set(values.values()) - repeated)
+        existing = set()
+        for start in range(0, len(distinct), UNIQUE_CHECK_CHUNK_SIZE):
+            chunk = distinct[start:start + UNIQUE_CHECK_CHUNK_SIZE]
+            existing.update(model.objects.filter(**{f'{field}__in': chunk}).values_list(field, flat=True))
+
+        for entry in entries:
+            value = values.get(entry['row'])
+            if value in repeated:
+                entry['errors'].setdefault(field, []).append(f"'{value}' is given more than once in this batch.")
+            elif value in existing:
+                entry['errors'].setdefault(field, []).append(f"A {model._meta.verbose_name} with this {field} already exists.")
+
+
+def _build(entry, password_hash):
+    data = dict(entry['user'])
+    data.pop('password')
+    gender = data.pop('gender', None)
+    user = User(**data, gender_id=gender, password=password_hash)
+    user.set_derived_fields()
+    profile = Profile(user=user, **entry['profile']) if entry['profile'] else None
+    return user, profile
+
+
+def _insert(users, profiles):
+    User.objects.bulk_create(users)
+    for profile in profiles:
+        # bulk_create sets the ids on the users, but not on the profiles that point to them
+        profile.user_id = profile.user.pk
+    Profile.objects.bulk_create(profiles)
+
+
+def register_rows(rows):
+    """
+    Register a batch of rows and return the outcome of each one, in order:
+    {'row': <1-based position>, 'status': 'created', 'id': ..., 'username': ...} or
+    {'row': <1-based position>, 'status': 'error', 'errors': {field: [messages]}}.
+    """
+    entries = []
+    for number, row in enumerate(rows, start=1):
+        user, profile, errors = _validate_row(row)
+        entries.append({'row': number, 'user': user, 'profile': profile, 'errors': errors})
+    _check_unique(entries)
+
+    valid = [entry for entry in entries if not entry['errors']]
+    hashes = hash_passwords(entry['user']['password'] for entry in valid)
+    built = [_build(entry, password_hash) for entry, password_hash in zip(valid, hashes)]
+
+    created = []
+    try:
+        with write_atomic():
+            _insert([user for user, _ in built], [profile for _, profile in built if profile is not None])
+            created = list(zip(valid, built))
+    except IntegrityError:
+        # A value was registered concurrently since the uniqueness checks, find the rows it affects
+        for entry, (user, profile) in zip(valid, built):
+            for instance in (user, profile):
+                if instance is not None:
+                    # Reset from the rolled back insert
+                    instance.pk = None
+                    instance._state.adding = True
+            try:
+                with write_atomic():
+                    _insert([user], [profile] if profile is not None else [])
+            except IntegrityError:
+                entry['errors']['non_field_errors'] = ["A user with these details was registered concurrently."]
+            else:
+                created.append((entry, (user, profile)))
+
+    user_ids = [user.pk for _, (user, _) in created]
+    if user_ids:
+        # bulk_create sends no post_save signals, so the indexes are refreshed here for the batch
+        index_users(user_ids)
+        transaction.on_commit(lambda: get_autocomplete_index().refresh_users(user_ids))
+
+    users = {entry['row']: user for entry, (user, _) in created}
+    results = []
+    for entry in entries:
+        if entry['row'] in users:
+            user = users[entry['row']]
+            results.append({'row': entry['row'], 'status': 'created', 'id': user.pk, 'username': user.username})
+        else:
+            results.append({'row': entry['row'], 'status': 'error', 'errors': entry['errors']})
+    return results
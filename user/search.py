@@ -0,0 +1,147 @@
+# these are django imports
+from django.db import connection, connections, router
+
+# these are local imports
+from HealthData.transactions import write_atomic
+from .models import User
+from user_profile.models import Profile
+
+"""
+Full-text index for the admin patient search.
+
+On SQLite the searchable User and Profile fields are mirrored in an FTS5 table ('user_search',
+rowid = user id) with the trigram tokenizer, so a MATCH finds the same case-insensitive substrings
+as icontains but through the index instead of a LIKE '%q%' scan. Rows are refreshed by the signals
+in user/signals.py and can be rebuilt with the rebuild_search_index command. On other databases,
+and for queries shorter than a trigram, search_user_ids() returns None and callers fall back to
+the icontains filters.
+"""
+
+SEARCH_TABLE = 'user_search'
+# Indexed column -> (model, field)
+SEARCH_COLUMNS = {
+    'username': (User, 'username'),
+    'first_name': (User, 'first_name'),
+    'last_name': (User, 'last_name'),
+    'email': (User, 'email'),
+    'ka_regd_no': (Profile, 'ka_regd_no'),
+}
+SEARCH_USER_FIELDS = {field for model, field in SEARCH_COLUMNS.values() if model is User}
+# bm25 weight of each column, in SEARCH_COLUMNS order: identifiers rank above names and emails
+COLUMN_WEIGHTS = (10.0, 5.0, 5.0, 2.0, 10.0)
+MIN_QUERY_LENGTH = 3
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def _source_select():
+    """
+    SELECT producing (rowid, <SEARCH_COLUMNS>) rows from the User and Profile tables.
+    """
+    quote = connection.ops.quote_name
+    tables = {User: 'u', Profile: 'p'}
+    columns = ', '.join(
+        f"COALESCE({tables[model]}.{quote(model._meta.get_field(field).column)}, '')"
+        for model, field in SEARCH_COLUMNS.values()
+    )
+    return (
+        f"SELECT u.{quote(User._meta.pk.column)}, {columns} "
+        f"FROM {quote(User._meta.db_table)} u "
+        f"LEFT JOIN {quote(Profile._meta.db_table)} p ON p.{quote(Profile._meta.get_field('user').column)} = u.{quote(User._meta.pk.column)}"
+    )
+
+
+def _insert_prefix():
+    return f"INSERT INTO {SEARCH_TABLE}(rowid, {', '.join(SEARCH_COLUMNS)}) "
+
+
+def index_users(user_ids):
+    """
+    Refresh the search rows of the given users from their current User and Profile rows.
+    """
+    user_ids = list(user_ids)
+    if not is_supported() or not user_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    with write_atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", user_ids)
+        cursor.execute(
+            _insert_prefix() + _source_select() + f" WHERE u.{connection.ops.quote_name(User._meta.pk.column)} IN ({placeholders})",
+            user_ids,
+        )
+
+
+def remove_users(user_ids):
+    user_ids = list(user_ids)
+    if not is_supported() or not user_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(user_ids))})", user_ids)
+
+
+def rebuild_index():
+    """
+    Repopulate the whole index from the User and Profile tables. Returns the number of indexed users.
+    """
+    if not is_supported():
+        return 0
+    with write_atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(_insert_prefix() + _source_select())
+        cursor.execute(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
+
+
+class RankedUserIds:
+    """
+    The ids of the users matching a search query, best match first, read lazily: len() and count()
+    run a COUNT(*) of the matches, and a slice runs the ranked SELECT with LIMIT/OFFSET, so a page
+    never loads the ids of every match. Works with Django's Paginator like a queryset.
+    """
+
+    def __init__(self, query):
+        self.phrase = '"' + query.replace('"', '""') + '"'
+        # The users are read from the same database as the index, the read replica in SearchView
+        self.using = router.db_for_read(User)
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            with connections[self.using].cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [self.phrase])
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice) or item.step is not None:
+            raise TypeError("RankedUserIds only supports slices without a step.")
+        start = item.start or 0
+        if start < 0 or (item.stop is not None and item.stop < 0):
+            raise ValueError("Negative indexing is not supported.")
+        limit = -1 if item.stop is None else max(0, item.stop - start)
+        weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+                f"ORDER BY bm25({SEARCH_TABLE}, {weights}), rowid LIMIT %s OFFSET %s",
+                [self.phrase, limit, start],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def search_user_ids(query):
+    """
+    Return the RankedUserIds of the users matching the query, or None if the index cannot answer it
+    (not SQLite, or a query shorter than MIN_QUERY_LENGTH characters).
+
+    The query matches as one substring of any indexed column, like the icontains filters.
+    """
+    if not is_supported() or len(query) < MIN_QUERY_LENGTH:
+        return None
+    return RankedUserIds(query)
@@ -0,0 +1,69 @@
+# these are django imports
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+# these are rest_framework imports
+from rest_framework.authtoken.models import Token
+
+# these are local imports
+from .models import User
+from .autocomplete import get_autocomplete_index
+from .search import SEARCH_USER_FIELDS, index_users, remove_users
+from user_profile.models import Profile
+from HealthData.authentication import forget_cached_user, revoke_user_tokens
+
+
+def _refresh_autocomplete(user_id):
+    # Only once the write is committed, so a rolled back change never shows up in suggestions
+    transaction.on_commit(lambda: get_autocomplete_index().refresh_user(user_id))
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_auth_change(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or created:
+        return
+    # Any change reaches the requests of this process at once, e.g. the names on a monthly report
+    forget_cached_user(instance.pk)
+    # Only deactivation, role and password changes must not outlive the cached authentication in other processes
+    if update_fields is not None and not {'is_active', 'role', 'role_id', 'password'}.intersection(update_fields):
+        return
+    if instance.auth_values_changed():
+        revoke_user_tokens(instance.pk)
+    instance._loaded_auth_values = instance.auth_values()
+
+
+@receiver(post_delete, sender=User)
+def revoke_tokens_on_delete(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def revoke_deleted_token(sender, instance, **kwargs):
+    revoke_user_tokens(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def index_user_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # e.g. the last_login update on every login does not touch the indexes
+    if update_fields is not None and not SEARCH_USER_FIELDS.intersection(update_fields):
+        return
+    index_users([instance.pk])
+    _refresh_autocomplete(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_on_delete(sender, instance, **kwargs):
+    remove_users([instance.pk])
+    _refresh_autocomplete(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def index_user_on_profile_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_users([instance.user_id])
+    _refresh_autocomplete(instance.user_id)
@@ -1,3 +1,659 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import date
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+# these are django imports
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+# these are rest_framework imports
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+# these are local imports
+from HealthData import authentication
+from HealthData.authentication import TokenCache
+from . import autocomplete
+from .autocomplete import AutocompleteIndex
+from .models import AGE_BAND_LABELS, AgeRefresh, TokenRevocation, User
+from .projections import EXPORT_COLUMNS
+from . import registration
+from .registration import hash_passwords, register_rows
+from .search import RankedUserIds, rebuild_index, search_user_ids
+from .views import filter_users
+from tables.models import Gender, Heamophilia, Role
+from user_profile.models import Profile
+
+# Hashing with the default PBKDF2 iterations dominates the run time of the tests
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def create_user(username, number, role, gender, ka_regd_no=None, **fields):
+    """
+    Create a user, with a profile when 'ka_regd_no' is given; 'number' keeps the unique fields distinct.
+    """
+    fields = {
+        'email': f"{username}@example.com",
+        'first_name': username.title(),
+        'last_name': 'Patient',
+        'phone_number': f"98765{number:05d}",
+        'date_of_birth': date(1990, 5, 17),
+        'city': 'Bengaluru',
+        **fields,
+    }
+    user = User(username=username, role=role, gender=gender, **fields)
+    user.set_password('password-123')
+    user.save()
+    if ka_regd_no:
+        Profile.objects.create(user=user, ka_regd_no=ka_regd_no, heamophilia_type='A', factor='viii', inhibitor='no')
+    return user
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class UserTestCase(TestCase):
+    """
+    An admin (the first role, R01, is the admin role) and a patient, with token clients for both.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_role = Role.objects.create(name='Admin')
+        cls.user_role = Role.objects.create(name='User')
+        cls.gender = Gender.objects.create(name='Male')
+        Heamophilia.objects.create(name='A')
+        cls.admin = create_user('admin', 1, cls.admin_role, cls.gender)
+        cls.user = create_user('alice', 2, cls.user_role, cls.gender, ka_regd_no='KA0002', last_name='Sharma')
+
+    def setUp(self):
+        self.admin_client = self.client_for(self.admin)
+        self.client = self.client_for(self.user)
+
+    def client_for(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client
+
+
+class SearchIndexTests(UserTestCase):
+
+    def usernames(self, query):
+        ids = search_user_ids(query)
+        return [User.objects.get(pk=user_id).username for user_id in ids[:]]
+
+    def test_index_follows_user_and_profile_changes(self):
+        bob = create_user('bob', 3, self.user_role, self.gender, ka_regd_no='KA7781', last_name='Kulkarni')
+        self.assertEqual(self.usernames('kulk'), ['bob'])
+        self.assertEqual(self.usernames('7781'), ['bob'])
+
+        bob.last_name = 'Hegde'
+        bob.save()
+        self.assertEqual(self.usernames('kulk'), [])
+        self.assertEqual(self.usernames('HEGDE'), ['bob'])
+
+        Profile.objects.filter(user=bob).first().delete()
+        self.assertEqual(self.usernames('7781'), [])
+        bob.delete()
+        self.assertEqual(self.usernames('hegde'), [])
+
+    def test_identifiers_rank_above_emails(self):
+        # 'KA0002' is alice's registration number and part of carol's email
+        create_user('carol', 3, self.user_role, self.gender, email='carol.ka0002@example.com')
+        self.assertEqual(self.usernames('ka0002'), ['alice', 'carol'])
+
+    def test_pages_are_read_with_limit_and_offset(self):
+        for number in range(3, 8):
+            create_user(f'sharma{number}', number, self.user_role, self.gender)
+        ids = RankedUserIds('sharma')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(ids), 6)
+            page = ids[2:4]
+        self.assertEqual(len(page), 2)
+        self.assertIn('COUNT(*)', queries[0]['sql'])
+        self.assertIn('LIMIT 2 OFFSET 2', queries[1]['sql'])
+
+    def test_short_queries_are_not_indexed(self):
+        self.assertIsNone(search_user_ids('ka'))
+
+    def test_rebuild_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM user_search")
+        self.assertEqual(self.usernames('sharma'), [])
+        self.assertEqual(rebuild_index(), 2)
+        self.assertEqual(self.usernames('sharma'), ['alice'])
+
+
+class SearchViewTests(UserTestCase):
+
+    def test_search(self):
+        response = self.admin_client.get('/user/search/', {'q': 'shar'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        entry = response.json()['results'][0]
+        self.assertEqual((entry['user']['username'], entry['profile']['ka_regd_no']), ('alice', 'KA0002'))
+
+        # Shorter than a trigram, answered by the icontains filters
+        response = self.admin_client.get('/user/search/', {'q': 'al'})
+        self.assertEqual([entry['user']['username'] for entry in response.json()['results']], ['alice'])
+
+    def test_search_is_for_admins(self):
+        self.assertEqual(self.client.get('/user/search/', {'q': 'shar'}).status_code, 403)
+        self.assertEqual(self.admin_client.get('/user/search/').status_code, 400)
+
+
+class AutocompleteTests(UserTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.index = AutocompleteIndex(max_age_seconds=300)
+        patcher = mock.patch.object(autocomplete, '_autocomplete_index', self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def usernames(self, prefix, limit=10):
+        return [suggestion['username'] for suggestion in self.index.suggest(prefix, limit)]
+
+    def test_prefixes_of_registration_numbers_and_names(self):
+        create_user('bob', 3, self.user_role, self.gender, ka_regd_no='KA0310', first_name='Shankar', last_name='Rao')
+        self.assertFalse(self.index.is_built)
+        self.assertEqual(self.usernames('ka0'), ['alice', 'bob'])
+        self.assertTrue(self.index.is_built)
+        # In key order: bob's 'shankar' before alice's 'sharma'
+        self.assertEqual(self.usernames('SH'), ['bob', 'alice'])
+        self.assertEqual([s['matched'] for s in self.index.suggest('sha')], ['first_name', 'last_name'])
+        self.assertEqual(self.usernames('sha', limit=1), ['bob'])
+        self.assertEqual(self.usernames('rao'), ['bob'])
+        self.assertEqual(self.usernames('x'), [])
+
+    def test_committed_writes_refresh_the_index(self):
+        self.index.build()
+        with self.captureOnCommitCallbacks(execute=True):
+            bob = create_user('bob', 3, self.user_role, self.gender, ka_regd_no='KA0310')
+        self.assertEqual(self.usernames('ka03'), ['bob'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.filter(user=bob).update(ka_regd_no='KA0999')
+            bob.profile.refresh_from_db()
+            bob.profile.save()
+        self.assertEqual(self.usernames('ka03'), [])
+        self.assertEqual(self.usernames('ka09'), ['bob'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bob.delete()
+        self.assertEqual(self.usernames('ka09'), [])
+
+    def test_stale_index_answers_while_it_is_rebuilt(self):
+        self.index.build()
+        self.index._built_at = time.monotonic() - 301
+        with mock.patch.object(self.index, 'start_rebuild') as start_rebuild, self.assertNumQueries(0):
+            self.assertEqual(self.usernames('alice'), ['alice'])
+        start_rebuild.assert_called_once_with()
+
+    def test_one_rebuild_at_a_time(self):
+        with mock.patch.object(autocomplete.threading, 'Thread') as thread:
+            self.index.start_rebuild()
+            self.index.start_rebuild()
+        thread.assert_called_once()
+
+    def test_view(self):
+        response = self.admin_client.get('/user/autocomplete/', {'q': 'ka', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{
+            'username': 'alice', 'ka_regd_no': 'KA0002', 'first_name': 'Alice', 'last_name': 'Sharma', 'matched': 'ka_regd_no',
+        }])
+        self.assertEqual(self.admin_client.get('/user/autocomplete/').status_code, 400)
+        self.assertEqual(self.admin_client.get('/user/autocomplete/', {'q': 'ka', 'limit': 'all'}).status_code, 400)
+        self.assertEqual(self.client.get('/user/autocomplete/', {'q': 'ka'}).status_code, 403)
+
+
+class CompactProjectionTests(UserTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for number in range(3, 9):
+            create_user(f'sharma{number}', number, cls.user_role, cls.gender, ka_regd_no=f'KA00{number:02d}', last_name='Sharma')
+
+    def count_queries(self, path, params):
+        # The first request also looks the token up, later ones find it in the token cache
+        self.admin_client.get(path, params)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.admin_client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_compact_entries_match_the_serializers(self):
+        full = self.admin_client.get('/user/search/', {'q': 'sharma'}).json()['results']
+        compact = self.admin_client.get('/user/search/', {'q': 'sharma', 'compact': 'true'}).json()['results']
+        self.assertEqual(len(compact), 7)
+        for full_entry, compact_entry in zip(full, compact):
+            shared = compact_entry['user'].keys() & full_entry['user'].keys()
+            self.assertEqual({field: compact_entry['user'][field] for field in shared}, {field: full_entry['user'][field] for field in shared})
+            self.assertEqual(compact_entry['profile'], {field: full_entry['profile'][field] for field in compact_entry['profile']})
+        self.assertEqual(set(compact[0]['profile']), {'ka_regd_no', 'heamophilia_type', 'factor', 'inhibitor'})
+
+    def test_users_without_a_profile(self):
+        results = self.admin_client.get('/user/admin/user/', {'compact': 'true', 'page_size': 1}).json()['results']
+        self.assertEqual(results, [{'user': mock.ANY, 'profile': {}}])
+        self.assertEqual(results[0]['user']['username'], 'admin')
+
+    def test_compact_pages_cost_the_same_queries_at_any_size(self):
+        # One match against seven, from the full-text index and from the icontains fallback
+        for one, seven in (('sharma3', 'sharma'), ('a3', 'sh')):
+            with self.subTest(q=seven):
+                self.assertEqual(
+                    self.count_queries('/user/search/', {'q': one, 'compact': 'true'}),
+                    self.count_queries('/user/search/', {'q': seven, 'compact': 'true'}),
+                )
+        self.assertEqual(
+            self.count_queries('/user/admin/user/', {'compact': 'true', 'page_size': 1}),
+            self.count_queries('/user/admin/user/', {'compact': 'true', 'page_size': 8}),
+        )
+
+
+class AdminUserListTests(UserTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.female = Gender.objects.create(name='Female')
+        create_user('bob', 3, cls.user_role, cls.gender, ka_regd_no='KA0003', city='Mysuru', state='Karnataka')
+        create_user('carol', 4, cls.user_role, cls.female, city='Mysuru', state='Karnataka')
+        create_user('dave', 5, cls.user_role, cls.gender, city='Chennai', state='Tamil Nadu', is_active=False)
+
+    def usernames(self, params):
+        response = self.admin_client.get('/user/admin/user/', params)
+        self.assertEqual(response.status_code, 200)
+        return [user['username'] for user in response.json()['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.usernames({'city': 'Mysuru'}), ['bob', 'carol'])
+        self.assertEqual(self.usernames({'state': 'Tamil Nadu'}), ['dave'])
+        self.assertEqual(self.usernames({'gender': self.female.gender_id}), ['carol'])
+        self.assertEqual(self.usernames({'role': self.admin_role.role_id}), ['admin'])
+        self.assertEqual(self.usernames({'is_active': 'false'}), ['dave'])
+        self.assertEqual(self.usernames({'city': 'Mysuru', 'gender': self.gender.gender_id}), ['bob'])
+
+        response = self.admin_client.get('/user/admin/user/', {'is_active': 'maybe'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'message': "'is_active' must be 'true' or 'false'."})
+
+    def test_filters_are_served_by_indexes(self):
+        for params, index in (
+            ({'city': 'Mysuru'}, 'user_city_idx'), ({'state': 'Karnataka'}, 'user_state_idx'),
+            ({'is_active': 'false'}, 'user_is_active_idx'), ({'is_active': 'true'}, 'user_is_active_idx'),
+        ):
+            with self.subTest(**params):
+                self.assertIn(index, filter_users(User.objects.all(), params).explain())
+
+    def test_keyset_pages(self):
+        response = self.admin_client.get('/user/admin/user/', {'page_size': 2, 'count': 'true'})
+        page = response.json()
+        self.assertEqual(page['count'], 5)
+        self.assertEqual([user['username'] for user in page['results']], ['admin', 'alice'])
+        usernames = []
+        while page['next']:
+            page = self.admin_client.get(page['next']).json()
+            usernames += [user['username'] for user in page['results']]
+        self.assertEqual(usernames, ['bob', 'carol', 'dave'])
+
+        self.assertEqual(self.admin_client.get('/user/admin/user/', {'cursor': 'garbage'}).status_code, 404)
+        self.assertEqual(self.client.get('/user/admin/user/').status_code, 403)
+
+    def test_csv_export(self):
+        response = self.admin_client.get('/user/admin/user/', {'export': 'csv', 'city': 'Mysuru'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="users.csv"')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(tuple(rows[0]), EXPORT_COLUMNS)
+        rows = [dict(zip(rows[0], row)) for row in rows[1:]]
+        self.assertEqual([row['username'] for row in rows], ['bob', 'carol'])
+        self.assertEqual((rows[0]['profile__ka_regd_no'], rows[1]['profile__ka_regd_no']), ('KA0003', ''))
+
+    def test_ndjson_export(self):
+        response = self.admin_client.get('/user/admin/user/', {'export': 'ndjson', 'is_active': 'false'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        entries = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(entries), 1)
+        self.assertEqual((entries[0]['user']['username'], entries[0]['user']['is_active']), ('dave', False))
+        self.assertEqual(entries[0]['profile'], {})
+
+        self.assertEqual(self.admin_client.get('/user/admin/user/', {'export': 'xml'}).status_code, 400)
+
+
+class TokenCacheTests(UserTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = TokenCache(check_interval_seconds=3600)
+        patcher = mock.patch.object(authentication, '_token_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.key = Token.objects.get(user=self.user).key
+
+    def get_profile(self, client=None):
+        return (client or self.client).get('/user/user')
+
+    def test_repeat_requests_skip_the_token_query(self):
+        self.assertEqual(self.get_profile().status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_profile().json()['username'], 'alice')
+        self.assertFalse([query for query in queries if 'authtoken_token' in query['sql']])
+
+    def test_auth_changes_drop_the_cached_tokens(self):
+        # Deactivation last, an inactive user's token is not cached again
+        changes = {
+            'role': lambda user: setattr(user, 'role', self.admin_role),
+            'password': lambda user: user.set_password('another-password'),
+            'is_active': lambda user: setattr(user, 'is_active', False),
+        }
+        for field, change in changes.items():
+            with self.subTest(field=field):
+                self.get_profile()
+                self.assertIsNotNone(self.cache.get(self.key))
+                user = User.objects.get(pk=self.user.pk)
+                change(user)
+                user.save(update_fields=[field])
+                self.assertIsNone(self.cache.get(self.key))
+
+    def test_deactivated_users_are_refused_at_once(self):
+        self.get_profile()
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.get_profile().status_code, 401)
+
+    def test_deleted_tokens_are_refused_at_once(self):
+        self.get_profile()
+        Token.objects.filter(user=self.user).delete()
+        self.assertEqual(self.get_profile().status_code, 401)
+
+    def test_other_changes_drop_the_cached_tokens_of_this_process(self):
+        for save in (lambda user: user.save(), lambda user: user.save(update_fields=['last_login'])):
+            self.get_profile()
+            self.assertIsNotNone(self.cache.get(self.key))
+            user = User.objects.get(pk=self.user.pk)
+            user.city = 'Mysuru'
+            save(user)
+            self.assertIsNone(self.cache.get(self.key))
+        # Only auth changes reach the other processes
+        self.assertFalse(TokenRevocation.objects.exists())
+
+    def test_revocations_reach_other_processes(self):
+        other = TokenCache(check_interval_seconds=0)
+        token = Token.objects.get(user=self.user)
+        other.get(self.key)
+        other.set(self.key, self.user, token)
+        # Revoked by this process, read by the other one at its next check
+        Token.objects.filter(user=self.user).delete()
+        self.assertIsNone(other.get(self.key))
+
+    def test_lru_and_ttl(self):
+        cache = TokenCache(max_entries=2, ttl_seconds=60, check_interval_seconds=3600)
+        token = Token.objects.get(user=self.user)
+        for key in ('a', 'b'):
+            cache.set(key, self.user, token)
+        cache.get('a')
+        cache.set('c', self.admin, token)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), (self.user, token))
+
+        with mock.patch.object(authentication.time, 'monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(cache.get('a'))
+
+    def test_updates_do_not_write_back_the_cached_user(self):
+        self.get_profile()
+        # Changed by another process, before this one reads the revocation
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.patch('/user/user', {'city': 'Mysuru'}, format='json').status_code, 200)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual((user.city, user.is_active), ('Mysuru', False))
+
+
+    def test_profile_reads_follow_an_edit(self):
+        self.get_profile()
+        self.assertEqual(self.client.patch('/user/user', {'first_name': 'Renamed'}, format='json').status_code, 200)
+        self.assertEqual(self.get_profile().json()['first_name'], 'Renamed')
+
+
+def registration_row(number, **fields):
+    return {
+        'username': f'patient{number}',
+        'email': f'patient{number}@example.com',
+        'password': f'password-{number}',
+        'first_name': 'Ravi',
+        'last_name': f'Gowda{number}',
+        'date_of_birth': '2010-01-15',
+        'phone_number': f'90000{number:05d}',
+        'parent_name': 'Suresh Gowda',
+        'parent_phone_number': f'80000{number:05d}',
+        'address': '12, 4th Cross',
+        'city': 'Mysuru',
+        'state': 'Karnataka',
+        'zip_code': '570001',
+        'gender': 'G01',
+        'ka_regd_no': f'KA9{number:04d}',
+        'heamophilia_type': 'A',
+        'percentage': '1-10%',
+        'factor': 'viii',
+        'inhibitor': 'no',
+        'target_joints': 'Left knee',
+        **fields,
+    }
+
+
+@override_settings(BULK_REGISTRATION={'MAX_ROWS': 5, 'HASH_WORKERS': 1})
+class BulkRegistrationTests(UserTestCase):
+
+    def test_rows_are_registered(self):
+        index = AutocompleteIndex()
+        index.build()
+        self.enterContext(mock.patch.object(autocomplete, '_autocomplete_index', index))
+        with self.captureOnCommitCallbacks(execute=True):
+            results = register_rows([registration_row(1), registration_row(2, ka_regd_no=None)])
+        self.assertEqual([(result['status'], result['username']) for result in results],
+                         [('created', 'patient1'), ('created', 'patient2')])
+        first = User.objects.get(pk=results[0]['id'])
+        self.assertTrue(first.check_password('password-1'))
+        self.assertEqual((first.role, first.is_staff, first.gender_id), (self.user_role, False, 'G01'))
+        # Derived like User.save() does, bulk_create does not call it
+        self.assertEqual(first.age, User.objects.with_age().get(pk=first.pk).current_age)
+        self.assertEqual(first.profile.ka_regd_no, 'KA90001')
+        self.assertFalse(Profile.objects.filter(user_id=results[1]['id']).exists())
+        # bulk_create sends no signals, the indexes are refreshed for the batch
+        self.assertEqual(list(search_user_ids('gowda1')[:]), [first.pk])
+        self.assertEqual(index.suggest('ka90001')[0]['username'], 'patient1')
+
+    def test_errors_are_reported_per_row(self):
+        results = register_rows([
+            registration_row(1),
+            registration_row(2, username='alice'),
+            registration_row(3, email='patient1@example.com'),
+            registration_row(4, ka_regd_no='KA0002'),
+            registration_row(5, gender='G99', factor='x'),
+            'not a row',
+        ])
+        self.assertEqual([result['status'] for result in results], ['error', 'error', 'error', 'error', 'error', 'error'])
+        self.assertEqual(results[0]['errors'], {'email': ["'patient1@example.com' is given more than once in this batch."]})
+        self.assertEqual(results[1]['errors'], {'username': ['A user with this username already exists.']})
+        self.assertEqual(results[3]['errors'], {'ka_regd_no': ['A profile with this ka_regd_no already exists.']})
+        self.assertEqual(set(results[4]['errors']), {'gender', 'factor'})
+        self.assertIn('non_field_errors', results[5]['errors'])
+        self.assertFalse(User.objects.filter(username__startswith='patient').exists())
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        with CaptureQueriesContext(connection) as small:
+            register_rows([registration_row(number) for number in range(1, 3)])
+        with CaptureQueriesContext(connection) as large:
+            register_rows([registration_row(number) for number in range(3, 13)])
+        self.assertEqual(len(small), len(large))
+
+    def test_rows_registered_concurrently(self):
+        # As if 'alice' was registered between the uniqueness checks and the insert
+        with mock.patch.object(registration, '_check_unique'):
+            results = register_rows([registration_row(1), registration_row(2, username='alice'), registration_row(3)])
+        self.assertEqual([result['status'] for result in results], ['created', 'error', 'created'])
+        self.assertEqual(results[1]['errors'], {'non_field_errors': ['A user with these details was registered concurrently.']})
+        self.assertEqual(Profile.objects.filter(user__username__in=['patient1', 'patient3']).count(), 2)
+
+    def test_hashing_pool(self):
+        self.assertTrue(hash_passwords(['a', 'b'])[0].startswith('md5$'))
+        executor = mock.Mock()
+        executor.map.return_value = iter(['hash-a', 'hash-b'])
+        with self.settings(BULK_REGISTRATION={'HASH_WORKERS': 4}), \
+                mock.patch.object(registration, 'get_hashing_executor', return_value=executor):
+            self.assertEqual(hash_passwords(['a', 'b']), ['hash-a', 'hash-b'])
+
+    def test_view(self):
+        response = self.admin_client.post('/user/admin/register/bulk', [registration_row(1), registration_row(2, email='bad')], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.json()['created'], response.json()['failed']), (1, 1))
+
+        response = self.admin_client.post('/user/admin/register/bulk', [registration_row(1)], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.admin_client.post('/user/admin/register/bulk', {'username': 'x'}, format='json').status_code, 400)
+        rows = [registration_row(number) for number in range(10, 16)]
+        self.assertEqual(self.admin_client.post('/user/admin/register/bulk', rows, format='json').json(),
+                         {'error': 'At most 5 users can be registered at once.'})
+        self.assertEqual(self.client.post('/user/admin/register/bulk', [registration_row(3)], format='json').status_code, 403)
+
+    def test_csv_command(self):
+        rows = [registration_row(number) for number in range(1, 4)] + [registration_row(4, username='alice')]
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'patients.csv')
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('register_users_csv', path, '--batch-size=2', stdout=stdout, stderr=stderr)
+        self.assertIn('line 4: created patient3', stdout.getvalue())
+        self.assertIn('Registered 3 users, 1 rows failed', stdout.getvalue())
+        self.assertEqual(stderr.getvalue().strip(), 'line 5: username: A user with this username already exists.')
+
+
+def age_on(date_of_birth, on):
+    return on.year - date_of_birth.year - ((on.month, on.day) < (date_of_birth.month, date_of_birth.day))
+
+
+class AgeTests(UserTestCase):
+
+    BIRTH_DATES = (date(2000, 2, 29), date(2001, 3, 1), date(2010, 6, 15), date(2010, 6, 16), date(2019, 12, 31), date(1950, 1, 1))
+    DATES = (date(2025, 2, 28), date(2025, 3, 1), date(2025, 6, 15), date(2024, 2, 29), date(2025, 12, 31))
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for number, date_of_birth in enumerate(cls.BIRTH_DATES, start=3):
+            create_user(f'born{number}', number, cls.user_role, cls.gender, date_of_birth=date_of_birth)
+        create_user('unknown', 20, cls.user_role, cls.gender, date_of_birth=None)
+
+    def ages(self, on):
+        return {user.pk: age_on(user.date_of_birth, on) for user in User.objects.exclude(date_of_birth=None)}
+
+    def test_current_age(self):
+        for on in self.DATES:
+            with self.subTest(on=on):
+                computed = dict(User.objects.with_age(on).exclude(date_of_birth=None).values_list('pk', 'current_age'))
+                self.assertEqual(computed, self.ages(on))
+        self.assertIsNone(User.objects.with_age().get(username='unknown').current_age)
+        # Born on 29 February: a year older on 1 March of other years
+        leap = User.objects.with_age(date(2025, 2, 28)).get(date_of_birth=date(2000, 2, 29))
+        self.assertEqual(leap.current_age, 24)
+        self.assertEqual(User.objects.with_age(date(2025, 3, 1)).get(pk=leap.pk).current_age, 25)
+
+    def test_age_between_matches_the_current_age(self):
+        for on in self.DATES:
+            ages = self.ages(on)
+            for youngest, oldest in ((None, None), (5, None), (None, 14), (14, 15), (25, 25), (0, 150)):
+                with self.subTest(on=on, youngest=youngest, oldest=oldest):
+                    expected = {pk for pk, age in ages.items()
+                                if (youngest is None or age >= youngest) and (oldest is None or age <= oldest)}
+                    found = set(User.objects.exclude(date_of_birth=None).age_between(youngest, oldest, on=on).values_list('pk', flat=True))
+                    self.assertEqual(found, expected)
+
+    def test_age_bands(self):
+        on = date(2025, 6, 15)
+        bands = dict(User.objects.with_age_band(on).values_list('username', 'age_band'))
+        self.assertEqual((bands['born5'], bands['born6'], bands['born7'], bands['born8'], bands['unknown']), ('13-17', '13-17', '0-5', '60+', None))
+        for label in AGE_BAND_LABELS:
+            with self.subTest(label=label):
+                expected = {username for username, band in bands.items() if band == label}
+                self.assertEqual(set(User.objects.in_age_band(label, on=on).values_list('username', flat=True)), expected)
+        with self.assertRaises(KeyError):
+            User.objects.in_age_band('18-30')
+
+    def test_birthday_passed(self):
+        for after, on in ((date(2025, 2, 27), date(2025, 3, 1)), (date(2025, 6, 14), date(2025, 6, 15)),
+                          (date(2024, 12, 30), date(2025, 1, 2)), (date(2024, 6, 15), date(2025, 6, 15)),
+                          (date(2025, 6, 15), date(2025, 6, 15))):
+            with self.subTest(after=after, on=on):
+                before, now = self.ages(after), self.ages(on)
+                expected = {pk for pk in now if now[pk] != before[pk]}
+                self.assertEqual(set(User.objects.birthday_passed(after, on).values_list('pk', flat=True)), expected)
+
+    def test_refresh(self):
+        User.objects.update(age=None)
+        first = AgeRefresh.objects.run(on=date(2025, 6, 14))
+        self.assertEqual(first.users_updated, 8)
+        self.assertEqual(dict(User.objects.exclude(date_of_birth=None).values_list('pk', 'age')), self.ages(date(2025, 6, 14)))
+
+        with CaptureQueriesContext(connection) as queries:
+            second = AgeRefresh.objects.run(on=date(2025, 6, 16))
+        # The two born on 15 and 16 June, in a single UPDATE
+        self.assertEqual(second.users_updated, 2)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(dict(User.objects.exclude(date_of_birth=None).values_list('pk', 'age')), self.ages(date(2025, 6, 16)))
+
+    def test_refresh_back_from_a_future_date(self):
+        AgeRefresh.objects.run(on=date(2030, 1, 1))
+        refresh = AgeRefresh.objects.run(on=date(2025, 6, 16))
+        self.assertEqual(refresh.users_updated, 8)
+        self.assertEqual(dict(User.objects.exclude(date_of_birth=None).values_list('pk', 'age')), self.ages(date(2025, 6, 16)))
+
+    def test_refresh_command(self):
+        output = StringIO()
+        call_command('refresh_ages', '--on=2025-06-16', stdout=output)
+        self.assertIn('Updated the age of 8 users as of 2025-06-16.', output.getvalue())
+        with self.assertRaisesMessage(CommandError, "'--on' must be a date"):
+            call_command('refresh_ages', '--on=16/06/2025')
+
+    def usernames(self, params):
+        response = self.admin_client.get('/user/admin/user/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {user['username'] for user in response.json()['results']}
+
+    def test_admin_list_filters(self):
+        today = date.today()
+        ages = {user.username: age_on(user.date_of_birth, today) for user in User.objects.exclude(date_of_birth=None)}
+        self.assertEqual(self.usernames({'min_age': 18, 'max_age': 29}), {name for name, age in ages.items() if 18 <= age <= 29})
+        self.assertEqual(self.usernames({'age_band': '60+'}), {name for name, age in ages.items() if age >= 60})
+
+    def test_admin_list_filter_errors(self):
+        for params, message in (
+            ({'min_age': -1}, "'min_age' and 'max_age' must be between 0 and 150."),
+            ({'max_age': 151}, "'min_age' and 'max_age' must be between 0 and 150."),
+            ({'min_age': 'ten'}, "'min_age' and 'max_age' must be whole numbers."),
+            ({'min_age': 30, 'max_age': 20}, "'min_age' must not be greater than 'max_age'."),
+            ({'age_band': '18-30'}, f"'age_band' must be one of {', '.join(AGE_BAND_LABELS)}."),
+        ):
+            with self.subTest(**params):
+                response = self.admin_client.get('/user/admin/user/', params)
+                self.assertEqual((response.status_code, response.json()), (400, {'message': message}))
+
+    def test_export_carries_the_current_age(self):
+        # The stored age lags until the next refresh, the export does not
+        User.objects.update(age=0)
+        response = self.admin_client.get('/user/admin/user/', {'export': 'csv'})
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        today = date.today()
+        expected = {user.username: str(age_on(user.date_of_birth, today)) if user.date_of_birth else ''
+                    for user in User.objects.all()}
+        self.assertEqual({row['username']: row['current_age'] for row in rows}, expected)
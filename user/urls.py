@@ -3,7 +3,7 @@ from django.urls import path
 
 # these are local imports
 from .views import RegisterUser, LoginView, AdminRegisterUser, AdminLoginView, AdminUserCRUDView, UserCRUDView
-from .views import SearchView
+from .views import SearchView, AutocompleteView, AdminBulkRegisterView
 
 
 urlpatterns = [
@@ -11,6 +11,7 @@ urlpatterns = [
     path('login', LoginView.as_view(), name='login'),
 
     path('admin/register', AdminRegisterUser.as_view(), name='admin_register'),
+    path('admin/register/bulk', AdminBulkRegisterView.as_view(), name='admin_register_bulk'),
     path('admin/login', AdminLoginView.as_view(), name='admin_login'),
 
     path('admin/user/', AdminUserCRUDView.as_view()),
@@ -18,5 +19,6 @@ urlpatterns = [
 
     path('user', UserCRUDView.as_view()),
 
-    path('search/', SearchView.as_view())
+    path('search/', SearchView.as_view()),
+    path('autocomplete/', AutocompleteView.as_view())
 ]
\ No newline at end of file
@@ -8,12 +8,23 @@ from rest_framework.pagination import PageNumberPagination
 
 # these are django imports
 from django.contrib.auth import authenticate
+from django.conf import settings
 from django.db.models import Q
+from django.http import StreamingHttpResponse
 
 # these are local imports
 from .serializers import UserSerializer
-from .models import User
+from .models import AGE_BAND_LABELS, MAX_AGE, User
+from .search import search_user_ids
+from .autocomplete import get_autocomplete_index
+from .projections import EXPORT_COLUMNS, EXPORT_USER_FIELDS, compact_entry, compact_values, is_compact
+from .export import EXPORT_CHUNK_SIZE, stream_csv, stream_ndjson
+from .registration import register_rows
+from HealthData.pagination import KeysetPagination
+from HealthData.replica import ReplicaReadMixin
 from user_profile.serializers import ProfileSerializer
+from tables.lookups import get_lookup_cache
+from tables.models import Role
 
 # Create your views here.
 """
@@ -89,7 +100,8 @@ class LoginView(APIView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        if user.role.name == "Admin":
+        # The role name comes from the lookup cache instead of a query per login
+        if get_lookup_cache().name(Role, user.role_id) == "Admin":
             return Response(
                 {"error": "Admin user cannot login from this endpoint."},
                 status=status.HTTP_403_FORBIDDEN
@@ -145,7 +157,43 @@ class AdminRegisterUser(APIView):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    
+
+
+class AdminBulkRegisterView(APIView):
+
+    """
+    Admin endpoint to register many patients at once, e.g. when onboarding a clinic.
+
+    Uniqueness is checked for the whole batch with set-based queries, the passwords are hashed in a
+    process pool and the users and profiles are inserted in bulk (see user/registration.py).
+
+    Accepts:
+    - POST request with a list of rows, each with the user fields of the registration and optionally
+      the profile fields (ka_regd_no, heamophilia_type, percentage, factor, inhibitor,
+      inhibitor_percentage, target_joints). At most BULK_REGISTRATION['MAX_ROWS'] rows.
+
+    Returns:
+    - 201 CREATED with the outcome of every row if at least one user was registered.
+    - 400 BAD REQUEST if the body is not a list, is too long, or no row could be registered.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({"error": "Expected a non-empty list of users."}, status=status.HTTP_400_BAD_REQUEST)
+        max_rows = settings.BULK_REGISTRATION.get('MAX_ROWS', 1000)
+        if len(rows) > max_rows:
+            return Response({"error": f"At most {max_rows} users can be registered at once."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = register_rows(rows)
+        created = sum(1 for result in results if result['status'] == 'created')
+        return Response(
+            {"created": created, "failed": len(results) - created, "results": results},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+        )
+
+
 class AdminLoginView(APIView):
 
     """
@@ -205,19 +253,65 @@ class AdminLoginView(APIView):
 
 
 
-class AdminUserCRUDView(APIView):
+def filter_users(queryset, params):
+    """
+    Apply the admin user list filters from the query parameters.
+
+    Supports exact 'city', 'state', 'gender' and 'role' (ids, e.g. G01 and R02), 'is_active'
+    ('true'/'false'), an inclusive 'min_age'/'max_age' range (0 to MAX_AGE) and an 'age_band' (e.g. 18-29, see
+    AGE_BANDS). Ages are as of today, filtered as date_of_birth ranges. Each filter is served by an index.
+
+    Raises ValueError with a message suitable for the client if a parameter is invalid.
+    """
+    for field in ('city', 'state'):
+        if params.get(field):
+            queryset = queryset.filter(**{field: params[field]})
+    for field in ('gender', 'role'):
+        if params.get(field):
+            queryset = queryset.filter(**{f'{field}_id': params[field]})
+
+    if params.get('is_active'):
+        if params['is_active'].lower() not in ('true', 'false'):
+            raise ValueError("'is_active' must be 'true' or 'false'.")
+        # is_active=<bool> compiles to a bare WHERE "is_active" (or NOT "is_active"), which SQLite
+        # cannot match to user_is_active_idx; IN compares against the value and uses the index
+        queryset = queryset.filter(is_active__in=[params['is_active'].lower() == 'true'])
+
+    try:
+        youngest = int(params['min_age']) if params.get('min_age') else None
+        oldest = int(params['max_age']) if params.get('max_age') else None
+    except ValueError:
+        raise ValueError("'min_age' and 'max_age' must be whole numbers.")
+    if any(age is not None and not 0 <= age <= MAX_AGE for age in (youngest, oldest)):
+        raise ValueError(f"'min_age' and 'max_age' must be between 0 and {MAX_AGE}.")
+    if youngest is not None and oldest is not None and youngest > oldest:
+        raise ValueError("'min_age' must not be greater than 'max_age'.")
+    queryset = queryset.age_between(youngest, oldest)
+
+    if params.get('age_band'):
+        if params['age_band'] not in AGE_BAND_LABELS:
+            raise ValueError(f"'age_band' must be one of {', '.join(AGE_BAND_LABELS)}.")
+        queryset = queryset.in_age_band(params['age_band'])
+    return queryset
+
+
+class AdminUserCRUDView(ReplicaReadMixin, APIView):
     """
     Admin view to perform CRUD operations on users.
 
     Accepts:
-    - GET request to fetch all users or a specific user by 'username'.
+    - GET request to fetch a specific user by 'username', or a page of users in id order. The list
+      accepts the filters of filter_users(), 'cursor' and 'page_size' (see HealthData/pagination.py),
+      and 'compact=true' for {user, profile} entries of the main columns only, fetched in one query.
+      With 'export=csv' or 'export=ndjson' the whole filtered roster is streamed as a file instead.
+      GET requests read from the read replica when one is configured (see HealthData/replica.py).
     - POST request to create a new user.
     - PUT request to update an existing user's details by 'username'.
     - PATCH request to partially update a user's details by 'username'.
     - DELETE request to deactivate a user by 'username'.
 
     Returns:
-    - 200 OK with user data or list of users.
+    - 200 OK with user data, a page of users or the streamed export.
     - 201 CREATED with new user data.
     - 400 BAD REQUEST with validation errors.
     - 404 NOT FOUND if the user is not found.
@@ -234,9 +328,33 @@ class AdminUserCRUDView(APIView):
             except User.DoesNotExist:
                 return Response({"message":f"User with username {username} does not exist"},status=status.HTTP_404_NOT_FOUND)
 
-        users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        try:
+            users = filter_users(User.objects.all(), request.GET)
+        except ValueError as error:
+            return Response({"message": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        export = request.GET.get('export')
+        if export is not None:
+            # Streamed after the view returns, so bound to the database chosen now
+            users = users.using(users.db)
+            users = compact_values(users.with_age().order_by('id'), EXPORT_USER_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+            if export == 'csv':
+                response = StreamingHttpResponse(stream_csv(users, EXPORT_COLUMNS), content_type='text/csv')
+            elif export == 'ndjson':
+                entries = (compact_entry(row, EXPORT_USER_FIELDS) for row in users)
+                response = StreamingHttpResponse(stream_ndjson(entries), content_type='application/x-ndjson')
+            else:
+                return Response({"message": "'export' must be 'csv' or 'ndjson'."}, status=status.HTTP_400_BAD_REQUEST)
+            response['Content-Disposition'] = f'attachment; filename="users.{export}"'
+            return response
+
+        paginator = KeysetPagination()
+        if is_compact(request):
+            page = paginator.paginate_queryset(compact_values(users), request, view=self)
+            return paginator.get_paginated_response([compact_entry(row) for row in page])
+        page = paginator.paginate_queryset(users, request, view=self)
+        serializer = UserSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
         serializer = UserSerializer(data=request.data)
@@ -293,25 +411,18 @@ class UserCRUDView(APIView):
     Returns:
     - 200 OK with user data.
     - 400 BAD REQUEST with validation errors.
-    - 404 NOT FOUND if the user is not found.
     - 204 NO CONTENT if the user is successfully deactivated.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        try:
-            user = User.objects.get(username = request.user.username)
-            serializer = UserSerializer(user)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-
-        except User.DoesNotExist:
-            return Response({"message":f"User with username {request.user.username} does not exist"}, status=status.HTTP_404_NOT_FOUND)
+        # request.user may come from the token cache, which could still hold the details from before an edit
+        serializer = UserSerializer(User.objects.get(pk=request.user.pk))
+        return Response(serializer.data, status=status.HTTP_200_OK)
         
     def put(self, request):
-        try:
-            user = User.objects.get(username=request.user.username)
-        except User.DoesNotExist:
-            return Response({"message":f"User with username {request.user.username} does not exist"}, status=status.HTTP_404_NOT_FOUND)
+        # request.user may come from the token cache; writing it back could revert a concurrent admin change
+        user = User.objects.get(pk=request.user.pk)
 
         serializer = UserSerializer(user, data=request.data)
         if serializer.is_valid():
@@ -320,10 +431,7 @@ class UserCRUDView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def patch(self, request):
-        try:
-            user = User.objects.get(username=request.user.username)
-        except User.DoesNotExist:
-            return Response({"message":f"User with username {request.user.username} does not exist"}, status=status.HTTP_404_NOT_FOUND)
+        user = User.objects.get(pk=request.user.pk)
 
         serializer = UserSerializer(user, data=request.data, partial=True)
         if serializer.is_valid():
@@ -332,10 +440,7 @@ class UserCRUDView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def delete(self, request):
-        try:
-            user = User.objects.get(username=request.user.username)
-        except User.DoesNotExist:
-            return Response({"message":f"User with username {request.user.username} does not exist"}, status=status.HTTP_404_NOT_FOUND)
+        user = User.objects.get(pk=request.user.pk)
 
         user.is_active = False
         user.save() 
@@ -343,12 +448,17 @@ class UserCRUDView(APIView):
         
         return Response(status=status.HTTP_204_NO_CONTENT)
     
-class SearchView(APIView):
+class SearchView(ReplicaReadMixin, APIView):
     """
     Search for users based on query parameters.
 
+    On SQLite the query is answered by the FTS5 search index (see user/search.py) and the
+    results are ranked by relevance; queries shorter than three characters, and other
+    databases, fall back to icontains filters. Reads go to the read replica when one is configured.
+
     Accepts:
-    - GET request with a search query ('q').
+    - GET request with a search query ('q'), and optionally 'compact=true' to get only the main
+      user and profile columns, fetched in one query and returned without the serializers.
 
     Returns:
     - 200 OK with paginated user search results.
@@ -375,15 +485,29 @@ class SearchView(APIView):
         paginator.page_size = 10
         paginator.page_query_param = 'page_size'
     
-        users = User.objects.select_related('profile').filter(
-            Q(username__icontains=search_query) |
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query) |
-            Q(profile__ka_regd_no__icontains=search_query) 
-            )
-        
-        paginated_users = paginator.paginate_queryset(users, request)   
+        compact = is_compact(request)
+        ranked_ids = search_user_ids(search_query)
+        if ranked_ids is None:
+            users = User.objects.select_related('profile').filter(
+                Q(username__icontains=search_query) |
+                Q(first_name__icontains=search_query) |
+                Q(last_name__icontains=search_query) |
+                Q(email__icontains=search_query) |
+                Q(profile__ka_regd_no__icontains=search_query) 
+                ).order_by('id')
+            paginated_users = paginator.paginate_queryset(compact_values(users) if compact else users, request)
+        else:
+            # The page of ranked ids is read from the full-text index with LIMIT/OFFSET
+            page_ids = paginator.paginate_queryset(ranked_ids, request)
+            page_users = User.objects.filter(id__in=page_ids)
+            if compact:
+                users_by_id = {row['id']: row for row in compact_values(page_users)}
+            else:
+                users_by_id = page_users.select_related('profile').in_bulk()
+            paginated_users = [users_by_id[user_id] for user_id in page_ids if user_id in users_by_id]
+
+        if compact:
+            return paginator.get_paginated_response([compact_entry(row) for row in paginated_users])
 
         result = []
 
@@ -403,6 +527,41 @@ class SearchView(APIView):
         
         return paginator.get_paginated_response(result)
 
-    
-        
-        
\ No newline at end of file
+
+class AutocompleteView(APIView):
+    """
+    Suggest users while a KA registration number or a name is being typed.
+
+    Suggestions come from an in-memory sorted index (see user/autocomplete.py), so a keystroke
+    costs a bisect instead of a database search and full serialization.
+
+    Accepts:
+    - GET request with a prefix ('q') and an optional 'limit' (default 10, at most 50).
+
+    Returns:
+    - 200 OK with the matching users' username, ka_regd_no, first_name, last_name and the matched field.
+    - 400 BAD REQUEST if no prefix is provided.
+    - 403 FORBIDDEN if the user is not authorized or deactivated.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+
+        if not request.user.is_staff:
+            return Response({"message": "You are not authorized to perform this action."}, status=status.HTTP_403_FORBIDDEN)
+
+        if not request.user.is_active:
+            return Response({"message": "Your account is deactivated."}, status=status.HTTP_403_FORBIDDEN)
+
+        prefix = request.GET.get('q', '').strip()
+        if not prefix:
+            return Response({"message": "Please provide a search query."}, status=status.HTTP_400_BAD_REQUEST)
+
+        options = getattr(settings, 'USER_AUTOCOMPLETE', {})
+        try:
+            limit = int(request.GET.get('limit', options.get('LIMIT', 10)))
+        except ValueError:
+            return Response({"message": "'limit' must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, options.get('MAX_LIMIT', 50)))
+
+        return Response({"results": get_autocomplete_index().suggest(prefix, limit)})
@@ -0,0 +1,162 @@
+# these are django imports
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for the admin analytics endpoint
+    np = None
+
+# these are local imports
+from .models import DailyTrack
+from user_profile.models import Profile
+
+"""
+Cohort level adherence and bleed-rate statistics.
+
+The DailyTrack columns are pulled with values_list() in chunks straight into NumPy arrays
+(already reduced to integers in SQL), and every grouping is computed with vectorized passes
+(bincount, unique, searchsorted) instead of looping over model instances.
+"""
+
+CHUNK_SIZE = 100_000
+ADHERENCE_BINS = 10
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def _yes(field):
+    return Case(When(**{field: 'Yes'}, then=Value(1)), default=Value(0), output_field=IntegerField())
+
+
+def load_cohort_arrays(start=None, end=None, chunk_size=CHUNK_SIZE):
+    """
+    Load the columns the statistics need as NumPy arrays.
+
+    Returns a dict with, per DailyTrack row, 'user_id', 'month_key' (year * 12 + month - 1),
+    'bleed' and 'injection' (0/1), and per Profile, 'profile_user_id', 'heamophilia_type' and 'factor'.
+    """
+    records = DailyTrack.objects.all()
+    if start is not None:
+        records = records.filter(date__gte=start)
+    if end is not None:
+        records = records.filter(date__lte=end)
+    rows = records.annotate(
+        month_key=ExtractYear('date') * 12 + ExtractMonth('date') - 1,
+        bleed=_yes('break_through_bleed'),
+        injection=_yes('inj_hemilibra'),
+    ).values_list('user_id', 'month_key', 'bleed', 'injection').order_by()
+
+    chunks = []
+    buffer = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        buffer.append(row)
+        if len(buffer) >= chunk_size:
+            chunks.append(np.array(buffer, dtype=np.int64))
+            buffer = []
+    if buffer:
+        chunks.append(np.array(buffer, dtype=np.int64))
+    columns = np.concatenate(chunks) if chunks else np.empty((0, 4), dtype=np.int64)
+
+    profiles = list(Profile.objects.values_list('user_id', 'heamophilia_type', 'factor').order_by())
+    return {
+        'user_id': columns[:, 0],
+        'month_key': columns[:, 1],
+        'bleed': columns[:, 2],
+        'injection': columns[:, 3],
+        'profile_user_id': np.array([row[0] for row in profiles], dtype=np.int64),
+        'heamophilia_type': np.array([row[1] or 'Unknown' for row in profiles], dtype=object),
+        'factor': np.array([row[2] or 'Unknown' for row in profiles], dtype=object),
+    }
+
+
+def _distribution(values):
+    if not len(values):
+        return {'patients': 0, 'mean': None, 'percentiles': {}, 'histogram': []}
+    counts, edges = np.histogram(values, bins=ADHERENCE_BINS, range=(0.0, 1.0))
+    return {
+        'patients': int(len(values)),
+        'mean': round(float(values.mean()), 4),
+        'percentiles': {f"p{p}": round(float(v), 4) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+        'histogram': [
+            {'from': round(float(low), 2), 'to': round(float(high), 2), 'patients': int(count)}
+            for low, high, count in zip(edges[:-1], edges[1:], counts)
+        ],
+    }
+
+
+def compute_cohort_stats(arrays):
+    """
+    Compute injection adherence and bleed rates from the arrays returned by load_cohort_arrays().
+
+    Adherence is a patient's share of logged days with a Hemlibra injection. The bleed rate is
+    bleed days per patient-month (a month in which the patient logged at least one day).
+    Both are reported for the whole cohort and per (heamophilia_type, factor) group.
+    """
+    # User ids are auto-increment integers, so a lookup table indexed by id is cheaper than sorting the rows
+    user_id = arrays['user_id']
+    rows_per_id = np.bincount(user_id) if len(user_id) else np.zeros(0, dtype=np.int64)
+    patients = np.flatnonzero(rows_per_id)
+    n_patients = len(patients)
+    index_of_id = np.zeros(len(rows_per_id), dtype=np.int64)
+    index_of_id[patients] = np.arange(n_patients)
+    patient = index_of_id[user_id]
+
+    logged_days = rows_per_id[patients]
+    injection_days = np.bincount(patient, weights=arrays['injection'], minlength=n_patients)
+    bleed_days = np.bincount(patient, weights=arrays['bleed'], minlength=n_patients)
+    adherence = np.divide(injection_days, logged_days, out=np.zeros(n_patients), where=logged_days > 0)
+
+    # Count rows per (patient, month) cell of a dense grid, the non-empty cells are the patient-months
+    month_key = arrays['month_key']
+    first_month = int(month_key.min()) if len(month_key) else 0
+    span = int(month_key.max()) - first_month + 1 if len(month_key) else 1
+    cells = np.bincount(patient * span + (month_key - first_month), minlength=n_patients * span)
+    months_per_patient = np.count_nonzero(cells.reshape(n_patients, span), axis=1)
+
+    # Map every patient to its (heamophilia_type, factor) group, patients without a profile form their own
+    profile_user_id = arrays['profile_user_id']
+    group_labels = np.array(
+        [f"{kind}|{factor}" for kind, factor in zip(arrays['heamophilia_type'], arrays['factor'])], dtype=object
+    )
+    labels, profile_group = np.unique(np.append(group_labels, 'Unknown|Unknown'), return_inverse=True)
+    missing_group = profile_group[-1]
+    profile_group = profile_group[:-1]
+
+    order = np.argsort(profile_user_id)
+    position = np.searchsorted(profile_user_id[order], patients)
+    position = np.minimum(position, max(len(order) - 1, 0))
+    has_profile = (profile_user_id[order][position] == patients) if len(order) else np.zeros(n_patients, dtype=bool)
+    patient_group = np.where(has_profile, profile_group[order][position] if len(order) else missing_group, missing_group)
+
+    n_groups = len(labels)
+    group_patients = np.bincount(patient_group, minlength=n_groups)
+    group_bleeds = np.bincount(patient_group, weights=bleed_days, minlength=n_groups)
+    group_months = np.bincount(patient_group, weights=months_per_patient, minlength=n_groups)
+    group_adherence = np.bincount(patient_group, weights=adherence, minlength=n_groups)
+
+    total_months = int(months_per_patient.sum())
+    groups = []
+    for index, label in enumerate(labels):
+        if not group_patients[index]:
+            continue
+        kind, factor = label.split('|', 1)
+        groups.append({
+            'heamophilia_type': kind,
+            'factor': factor,
+            'patients': int(group_patients[index]),
+            'patient_months': int(group_months[index]),
+            'bleed_days': int(group_bleeds[index]),
+            'bleeds_per_patient_month': round(float(group_bleeds[index] / group_months[index]), 4) if group_months[index] else None,
+            'mean_adherence': round(float(group_adherence[index] / group_patients[index]), 4),
+            'adherence': _distribution(adherence[patient_group == index]),
+        })
+
+    return {
+        'patients': int(n_patients),
+        'logged_days': int(len(user_id)),
+        'patient_months': total_months,
+        'bleed_days': int(bleed_days.sum()),
+        'bleeds_per_patient_month': round(float(bleed_days.sum() / total_months), 4) if total_months else None,
+        'adherence': _distribution(adherence),
+        'groups': groups,
+    }
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UserDailyTrackConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_daily_track'
+
+    def ready(self):
+        # Keep MonthlySummary in step with DailyTrack writes, and delete the files of deleted report jobs
+        from . import signals  # noqa: F401
@@ -0,0 +1,121 @@
+import calendar
+
+from asgiref.sync import sync_to_async
+
+# these are django imports
+from django.conf import settings
+from django.http import HttpResponse
+
+# these are local imports
+from HealthData.asyncviews import AsyncAPIView
+from .models import DailyTrack, MonthlySummary
+from .serializers import DailyTrackSerializer
+from .jobs import get_executor
+from .reports import render_monthly_report
+from .report_cache import get_report_cache
+from .views import DailyTrackPagination, DailyTrackViewCRUDView, filter_daily_tracks, monthly_report_profiles, monthly_report_version
+from user_profile.models import Profile
+
+"""
+Async variants of the daily tracking and monthly report views, for the ASGI application.
+
+Reads use the async ORM, so a request waiting for the database does not hold a thread, and PDF
+rendering runs in the report worker pool (see jobs.py). Writes reuse the serializers and signals
+of the sync views and run in the ORM's sync thread. The responses are the same as the sync views'.
+"""
+
+
+def _render_in_pool(*args):
+    if settings.REPORT_JOBS.get('RUN_INLINE', False):
+        return render_monthly_report(*args)
+    # Rendering is CPU-bound, so it runs in another process instead of holding the GIL
+    return get_executor().submit(render_monthly_report, *args).result()
+
+
+class AsyncDailyTrackView(AsyncAPIView):
+    """
+    Async variant of DailyTrackViewCRUDView.
+
+    Accepts:
+    - GET request with the parameters of DailyTrackViewCRUDView.get, read with the async ORM.
+    - POST, PUT and PATCH requests, handled by DailyTrackViewCRUDView.
+
+    Returns:
+    - The same responses as DailyTrackViewCRUDView.
+    """
+
+    async def get(self, request):
+        try:
+            daily_tracks = filter_daily_tracks(DailyTrack.objects.filter(user=request.user), request.GET)
+        except ValueError as exc:
+            return self.json_response({"error": str(exc)}, status=400)
+
+        paginator = DailyTrackPagination()
+        daily_tracks = await paginator.apaginate_queryset(daily_tracks, request, view=self)
+        return paginator.get_paginated_data(DailyTrackSerializer(daily_tracks, many=True).data)
+
+    async def post(self, request):
+        return await self._write(DailyTrackViewCRUDView.post, request)
+
+    async def put(self, request):
+        return await self._write(DailyTrackViewCRUDView.put, request)
+
+    async def patch(self, request):
+        return await self._write(DailyTrackViewCRUDView.patch, request)
+
+    async def _write(self, handler, request):
+        response = await sync_to_async(handler)(DailyTrackViewCRUDView(), request)
+        return self.json_response(response.data, status=response.status_code)
+
+
+class AsyncDownloadMonthlyReportView(AsyncAPIView):
+    """
+    Async variant of DownloadMonthlyReportAPIView.
+
+    The profile and the version of the month's records are read with one async query. A cached
+    report is returned without touching the records; otherwise they are read with the async ORM
+    and the PDF is rendered in the report worker pool while the event loop serves other requests.
+    Reads go to the primary, like the sync view.
+
+    Accepts:
+    - GET request with the year and month (1-12).
+
+    Returns:
+    - 200 OK with the PDF report.
+    - 400 BAD REQUEST if the month is not between 1 and 12.
+    - 404 NOT FOUND if the user profile is not found or there are no records for the month.
+    """
+
+    async def get(self, request, year, month):
+        if not 1 <= month <= 12:
+            return self.json_response({"error": "Month must be between 1 and 12."}, status=400)
+        month_name = calendar.month_name[int(month)]
+        user = request.user
+
+        try:
+            profile = await monthly_report_profiles(year, month).aget(user=user)
+        except Profile.DoesNotExist:
+            return self.json_response({"error": "User profile not found."}, status=404)
+
+        if not profile.records_count:
+            return self.json_response({"message": f"No records found for {month_name} {year}."}, status=404)
+
+        key = (user.id, int(year), int(month))
+        version = monthly_report_version(user, profile)
+        cache = get_report_cache()
+        # The cache reads from disk on a memory miss, which must not block the event loop
+        pdf_bytes = await sync_to_async(cache.get, thread_sensitive=False)(key, version)
+        if pdf_bytes is None:
+            daily_records = [
+                record async for record in
+                DailyTrack.objects.filter(user=user, date__year=year, date__month=month).order_by('date')
+            ]
+            summary = await MonthlySummary.objects.filter(user=user, year=year, month=month).afirst()
+            # get_or_render() still renders a report requested concurrently only once
+            pdf_bytes = await sync_to_async(cache.get_or_render, thread_sensitive=False)(
+                key, version, lambda: _render_in_pool(user, profile, daily_records, month_name, year, summary)
+            )
+
+        response = HttpResponse(pdf_bytes, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="HealthTrack_{user.username}_{month_name}_{year}.pdf"'
+        return response
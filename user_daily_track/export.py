@@ -0,0 +1,130 @@
+import calendar
+import zipfile
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, wait
+
+# these are django imports
+from django.conf import settings
+
+# these are local imports
+from .jobs import get_executor
+from .models import DailyTrack
+from .reports import render_monthly_report
+from .summaries import summarize
+
+"""
+Helpers for exporting the monthly reports of many patients as one streamed ZIP archive.
+"""
+
+# Patients loaded (with their profiles and records) per pair of queries
+EXPORT_BATCH_SIZE = 200
+
+
+class _ZipStream:
+    """
+    Write-only file object that collects what ZipFile writes until it is popped.
+
+    It has no tell()/seek(), so ZipFile writes a streamable archive (with data descriptors)
+    instead of seeking back to patch the local headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_cohort_records(users, year, month, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield (user, profile, records) for every user in the queryset with records in the month.
+
+    Users are walked in primary key order, batch_size at a time. Each batch costs one query for the
+    users and their profiles and one for their DailyTrack records, however many patients there are.
+    """
+    last_id = 0
+    while True:
+        batch = list(
+            users.filter(id__gt=last_id, profile__isnull=False).select_related('profile').order_by('id')[:batch_size]
+        )
+        if not batch:
+            return
+        last_id = batch[-1].id
+
+        records_by_user = defaultdict(list)
+        records = DailyTrack.objects.using(users.db).filter(
+            user_id__in=[user.id for user in batch], date__year=year, date__month=month
+        ).order_by('user_id', 'date')
+        for record in records:
+            records_by_user[record.user_id].append(record)
+
+        for user in batch:
+            if records_by_user.get(user.id):
+                yield user, user.profile, records_by_user[user.id]
+
+
+def iter_rendered_reports(cohort, year, month):
+    """
+    Render the monthly report of every (user, profile, records) entry in parallel.
+
+    Yields (filename, pdf_bytes) in completion order. At most twice the pool size of renders are in
+    flight, so memory is bounded by the pool, not by the size of the cohort.
+    """
+    month_name = calendar.month_name[month]
+
+    def filename(user):
+        return f"HealthTrack_{user.username}_{month_name}_{year}.pdf"
+
+    if settings.REPORT_JOBS.get('RUN_INLINE', False):
+        for user, profile, records in cohort:
+            yield filename(user), render_monthly_report(user, profile, records, month_name, year, summarize(records))
+        return
+
+    executor = get_executor()
+    max_in_flight = 2 * settings.REPORT_JOBS.get('MAX_WORKERS', 2)
+    pending = {}
+    cohort = iter(cohort)
+    try:
+        while True:
+            for user, profile, records in cohort:
+                future = executor.submit(
+                    render_monthly_report, user, profile, records, month_name, year, summarize(records)
+                )
+                pending[future] = filename(user)
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    finally:
+        # The client went away or a render failed, drop whatever has not started yet
+        for future in pending:
+            future.cancel()
+
+
+def stream_zip(named_files):
+    """
+    Yield a ZIP archive, chunk by chunk, containing every (filename, data) pair.
+
+    Each member is written and handed to the caller as soon as it arrives, so the archive is never
+    held in memory as a whole.
+    """
+    sink = _ZipStream()
+    # PDF page streams are already compressed, deflating them again only costs CPU
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for name, data in named_files:
+            archive.writestr(name, data)
+            yield sink.pop()
+    yield sink.pop()
@@ -0,0 +1,316 @@
+import os
+import socket
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+# these are django imports
+import django
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# these are local imports
+from HealthData.transactions import write_atomic
+
+"""
+Report jobs are rendered outside the request/response cycle in a bounded process pool.
+
+The job itself lives in the database (ReportJob), so the pool only ever receives a job id.
+A worker claims a queued job with a conditional UPDATE, which makes it safe for several
+web processes (or the process_report_jobs command) to pick up the same queue after a restart.
+
+A running job records its worker's host and pid, and the worker writes a heartbeat every
+HEARTBEAT_SECONDS while it renders. A running job is only put back in the queue once its worker
+is gone: the process no longer exists, or no heartbeat came for STALE_AFTER_SECONDS. Jobs left
+over from a previous run are resubmitted when the server starts (resume_pending_jobs(), in one
+process only) or by the process_report_jobs command.
+
+Finished jobs are kept for RETENTION_SECONDS and then deleted with their files by
+delete_expired_jobs(), which runs with every resume and process_report_jobs run. Deleting a job,
+or its user, deletes its file once the delete commits (see signals.py).
+"""
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _options():
+    return getattr(settings, 'REPORT_JOBS', {})
+
+
+def _init_worker():
+    # Pool workers are spawned fresh, so Django has to be set up before a job can run
+    django.setup()
+
+
+def create_executor():
+    """
+    Create a process pool for rendering report jobs, sized by REPORT_JOBS['MAX_WORKERS'].
+    """
+    return ProcessPoolExecutor(
+        max_workers=_options().get('MAX_WORKERS', 2),
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+
+
+def get_executor():
+    """
+    Return the process-wide pool that renders report jobs, creating it on first use.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = create_executor()
+    return _executor
+
+
+def acquire_lease(name, seconds):
+    """
+    Take the JobLease 'name' for this process for 'seconds', unless another process holds it.
+    Returns whether this process holds it.
+    """
+    from .models import JobLease
+
+    now = timezone.now()
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+    expires_at = now + timedelta(seconds=seconds)
+    with write_atomic():
+        taken = JobLease.objects.filter(name=name).filter(
+            Q(expires_at__lte=now) | Q(holder=holder)
+        ).update(holder=holder, expires_at=expires_at)
+        if taken:
+            return True
+        try:
+            with transaction.atomic():
+                JobLease.objects.create(name=name, holder=holder, expires_at=expires_at)
+        except IntegrityError:
+            # Held by another process
+            return False
+    return True
+
+
+def resume_pending_jobs():
+    """
+    Submit the jobs left queued (or running in a worker that is gone) by a previous process to the
+    pool. Returns the number of jobs submitted.
+
+    Every web worker calls this when it starts, but only the first one within STALE_AFTER_SECONDS
+    resumes the jobs, so one pool is started instead of one per worker.
+    """
+    if not acquire_lease('resume_report_jobs', _options().get('STALE_AFTER_SECONDS', 120)):
+        return 0
+    job_ids = pending_job_ids()
+    if job_ids:
+        executor = get_executor()
+        for job_id in job_ids:
+            executor.submit(run_job_in_worker, job_id)
+    return len(job_ids)
+
+
+def enqueue(job):
+    """
+    Schedule a ReportJob for rendering once the transaction that created it commits.
+    """
+    if _options().get('RUN_INLINE', False):
+        transaction.on_commit(lambda: run_job(str(job.pk)))
+    else:
+        transaction.on_commit(lambda: get_executor().submit(run_job_in_worker, str(job.pk)))
+
+
+def _worker_alive(host, pid):
+    """
+    Whether the worker process is still running. Only known for workers on this host.
+    """
+    if host != socket.gethostname() or pid is None:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, owned by another user
+        return True
+    return True
+
+
+def requeue_dead_jobs():
+    """
+    Put running jobs whose worker is gone back in the queue: a worker on this host that no longer
+    exists, or any worker that sent no heartbeat for STALE_AFTER_SECONDS. Returns the number re-queued.
+    """
+    from .models import ReportJob
+
+    stale_before = timezone.now() - timedelta(seconds=_options().get('STALE_AFTER_SECONDS', 120))
+    running = ReportJob.objects.filter(status=ReportJob.STATUS_RUNNING).values_list('pk', 'worker_host', 'worker_pid', 'heartbeat_at')
+    requeued = 0
+    for pk, host, pid, heartbeat_at in running:
+        if heartbeat_at is not None and heartbeat_at >= stale_before and _worker_alive(host, pid):
+            continue
+        # Only if still running with the same heartbeat, i.e. not finished or re-claimed in the meantime
+        requeued += ReportJob.objects.filter(pk=pk, status=ReportJob.STATUS_RUNNING, heartbeat_at=heartbeat_at).update(
+            status=ReportJob.STATUS_QUEUED, started_at=None, worker_host=None, worker_pid=None, heartbeat_at=None
+        )
+    return requeued
+
+
+def delete_expired_jobs():
+    """
+    Delete the jobs that finished more than RETENTION_SECONDS ago, with their files, and the files
+    of OUTPUT_DIRECTORY as old whose job no longer exists. Returns the number of jobs deleted.
+    """
+    from .models import ReportJob
+
+    expired_before = timezone.now() - timedelta(seconds=_options().get('RETENTION_SECONDS', 24 * 60 * 60))
+    _, deleted = ReportJob.objects.filter(
+        status__in=[ReportJob.STATUS_DONE, ReportJob.STATUS_FAILED], finished_at__lt=expired_before
+    ).delete()
+
+    # e.g. rendered by a worker after its job was deleted, or left half written by a dead worker
+    directory = Path(_options().get('OUTPUT_DIRECTORY', 'report_jobs'))
+    old_files = {}
+    if directory.is_dir():
+        for path in directory.iterdir():
+            if path.is_file() and path.stat().st_mtime < expired_before.timestamp():
+                old_files.setdefault(path.name.split('.')[0], []).append(path)
+    if old_files:
+        job_ids = set()
+        for name in old_files:
+            try:
+                job_ids.add(uuid.UUID(name))
+            except ValueError:
+                pass
+        existing = {str(job_id) for job_id in ReportJob.objects.filter(pk__in=job_ids).values_list('pk', flat=True)}
+        for name, paths in old_files.items():
+            if name not in existing:
+                for path in paths:
+                    path.unlink(missing_ok=True)
+    return deleted.get(ReportJob._meta.label, 0)
+
+
+def pending_job_ids():
+    """
+    Return the ids of jobs waiting to be rendered, after re-queueing the jobs of dead workers and
+    deleting the expired ones.
+    """
+    from .models import ReportJob
+
+    requeue_dead_jobs()
+    delete_expired_jobs()
+    return [
+        str(job_id) for job_id in
+        ReportJob.objects.filter(status=ReportJob.STATUS_QUEUED).order_by('created_at').values_list('id', flat=True)
+    ]
+
+
+def job_file_path(job_id):
+    return Path(_options().get('OUTPUT_DIRECTORY', 'report_jobs')) / f"{job_id}.pdf"
+
+
+def delete_job_file(job_id, file_path=None):
+    """
+    Delete the file rendered for a job, if any.
+    """
+    paths = {job_file_path(job_id)}
+    if file_path:
+        paths.add(Path(file_path))
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def run_job_in_worker(job_id):
+    """
+    Run a job inside a pool worker, which owns its own database connection.
+    """
+    close_old_connections()
+    try:
+        return run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+class _Heartbeat:
+    """
+    Context manager refreshing a running job's heartbeat_at from a background thread.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.interval = _options().get('HEARTBEAT_SECONDS', 30)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._beat, name=f'report-job-heartbeat-{job_id}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _beat(self):
+        from .models import ReportJob
+
+        try:
+            while not self._stopped.wait(self.interval):
+                ReportJob.objects.filter(pk=self.job_id, status=ReportJob.STATUS_RUNNING).update(heartbeat_at=timezone.now())
+        finally:
+            # The thread's own connection
+            connection.close()
+
+
+def run_job(job_id):
+    """
+    Render a single ReportJob to disk and record the outcome. Returns the job's final status.
+    """
+    from .models import ReportJob
+
+    now = timezone.now()
+    claimed = ReportJob.objects.filter(pk=job_id, status=ReportJob.STATUS_QUEUED).update(
+        status=ReportJob.STATUS_RUNNING, started_at=now,
+        worker_host=socket.gethostname(), worker_pid=os.getpid(), heartbeat_at=now,
+    )
+    if not claimed:
+        # Already picked up by another worker, or no longer queued
+        return None
+
+    with _Heartbeat(job_id):
+        return _render_job(job_id)
+
+
+def _render_job(job_id):
+    from user_profile.models import Profile
+    from .models import DailyTrack, ReportJob
+    from .reports import report_title, write_report
+
+    job = ReportJob.objects.select_related('user').get(pk=job_id)
+    path = job_file_path(job.pk)
+    try:
+        profile = Profile.objects.get(user=job.user)
+        records = DailyTrack.objects.filter(
+            user=job.user, date__range=(job.start_date, job.end_date)
+        ).order_by('date')
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'wb') as fileobj:
+            write_report(fileobj, report_title(job.start_date, job.end_date), job.user, profile,
+                         records.iterator(chunk_size=500))
+        os.replace(tmp_path, path)
+    except Exception as exc:
+        ReportJob.objects.filter(pk=job_id).update(
+            status=ReportJob.STATUS_FAILED, error=str(exc) or exc.__class__.__name__,
+            finished_at=timezone.now()
+        )
+        return ReportJob.STATUS_FAILED
+
+    ReportJob.objects.filter(pk=job_id).update(
+        status=ReportJob.STATUS_DONE, file_path=str(path), finished_at=timezone.now()
+    )
+    return ReportJob.STATUS_DONE
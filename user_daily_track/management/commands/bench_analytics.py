@@ -0,0 +1,131 @@
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+# these are django imports
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+# these are local imports
+from tables.models import Gender, Heamophilia, Role
+from user.models import User
+from user_daily_track import analytics
+from user_daily_track.management.commands.seed_load import Command as SeedLoad
+from user_daily_track.models import DailyTrack
+from user_profile.models import Profile
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the cohort analytics end to end, loading the arrays from the database and computing the "
+        "statistics, on patients and daily history seeded like seed_load (by default 2k patients x 3 years). "
+        "The seeded rows are rolled back afterwards unless --keep is given; --existing times the data "
+        "already in the database instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=2000)
+        parser.add_argument('--years', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keep', action='store_true', help="Commit the seeded rows instead of rolling them back.")
+        parser.add_argument('--existing', action='store_true', help="Do not seed, time the rows already in the database.")
+        parser.add_argument('--python-baseline', action='store_true',
+                            help="Also time the same statistics computed row by row in Python.")
+
+    def handle(self, *args, **options):
+        if analytics.np is None:
+            raise CommandError("NumPy is not installed.")
+
+        if options['existing']:
+            self.run(options)
+            return
+        try:
+            with transaction.atomic():
+                self.seed(options)
+                self.run(options)
+                if not options['keep']:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write("Rolled back the seeded rows.")
+
+    def seed(self, options):
+        """
+        Insert the patients, their profiles and their daily history with seed_load's generators, so
+        the rows carry the real Heamophilia names and Profile.factor choices.
+        """
+        role = Role.objects.filter(name='User').first()
+        genders = list(Gender.objects.values_list('gender_id', flat=True).order_by('gender_id'))
+        heamophilia_types = list(Heamophilia.objects.values_list('name', flat=True).order_by('name'))
+        if role is None or not genders or not heamophilia_types:
+            raise CommandError("Create the 'User' role and at least one Gender and Heamophilia first.")
+
+        started = time.perf_counter()
+        seeder = SeedLoad()
+        rng = random.Random(options['seed'])
+        end = date.today()
+        days = [end - timedelta(days=offset) for offset in range(options['years'] * 365 - 1, -1, -1)]
+        first_id = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        users, profiles = seeder.build_users(
+            rng, options['patients'], first_id, 'bench', role, genders, heamophilia_types, make_password(None), end
+        )
+        User.objects.bulk_create(users, batch_size=options['batch_size'])
+        Profile.objects.bulk_create(profiles, batch_size=options['batch_size'])
+        records = seeder.insert_history(seeder.build_history(rng, users, days), options['batch_size'])
+        self.stdout.write(
+            f"Seeded {len(users)} patients and {records} daily rows in {time.perf_counter() - started:.1f} s"
+        )
+
+    def run(self, options):
+        self.stdout.write(f"{DailyTrack.objects.count()} daily rows, {Profile.objects.count()} profiles in the database")
+
+        started = time.perf_counter()
+        arrays = analytics.load_cohort_arrays()
+        loaded = time.perf_counter() - started
+        stats = analytics.compute_cohort_stats(arrays)
+        elapsed = time.perf_counter() - started
+        rows = len(arrays['user_id'])
+        self.stdout.write(
+            f"end to end: {elapsed * 1000:.1f} ms (load {loaded * 1000:.1f} ms, compute {(elapsed - loaded) * 1000:.1f} ms, "
+            f"{rows / elapsed / 1e6:.2f}M rows/s), {stats['bleeds_per_patient_month']} bleeds per patient-month, "
+            f"mean adherence {stats['adherence']['mean']}"
+        )
+
+        if options['python_baseline']:
+            started = time.perf_counter()
+            self.python_baseline(arrays)
+            baseline = time.perf_counter() - started
+            self.stdout.write(
+                f"python loop over the loaded rows: {baseline * 1000:.1f} ms "
+                f"({baseline / max(elapsed - loaded, 1e-9):.0f}x the vectorized compute)"
+            )
+
+    def python_baseline(self, arrays):
+        """
+        The same per-patient and per-group totals, one row at a time.
+        """
+        logged, injections, bleeds = defaultdict(int), defaultdict(int), defaultdict(int)
+        months = set()
+        for user_id, month_key, bleed, injection in zip(
+            arrays['user_id'].tolist(), arrays['month_key'].tolist(), arrays['bleed'].tolist(), arrays['injection'].tolist()
+        ):
+            logged[user_id] += 1
+            injections[user_id] += injection
+            bleeds[user_id] += bleed
+            months.add((user_id, month_key))
+
+        groups = dict(zip(arrays['profile_user_id'].tolist(), zip(arrays['heamophilia_type'], arrays['factor'])))
+        group_bleeds, group_months = defaultdict(int), defaultdict(int)
+        for user_id, month_key in months:
+            group_months[groups.get(user_id)] += 1
+        for user_id, count in bleeds.items():
+            group_bleeds[groups.get(user_id)] += count
+        adherence = sorted(injections[user_id] / logged[user_id] for user_id in logged)
+        return adherence, group_bleeds, group_months
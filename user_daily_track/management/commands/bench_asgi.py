@@ -0,0 +1,170 @@
+import asyncio
+import math
+import os
+import time
+from datetime import date
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby, islice
+from operator import itemgetter
+
+# these are django imports
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+# these are rest_framework imports
+from rest_framework.authtoken.models import Token
+
+# these are local imports
+from user_daily_track.jobs import get_executor
+from user_daily_track.models import DailyTrack
+from user_daily_track.report_cache import get_report_cache
+from user_daily_track.reports import report_title
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a non-empty list.
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync views behind a threaded WSGI worker with their async variants on the ASGI "
+        "application, in this process. Simulated patients each page through their records and download "
+        "monthly reports (uncached, so every one is rendered) at the same time; the command reports the "
+        "throughput and latency of both deployments. Only reads, nothing is written apart from the tokens "
+        "of the simulated patients, which are removed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=16, help="Concurrent simulated patients.")
+        parser.add_argument('--months', type=int, default=3, help="Monthly reports downloaded per patient.")
+        parser.add_argument('--pages', type=int, default=5, help="Record list requests per patient.")
+        parser.add_argument('--threads', type=int, default=4, help="Threads of the WSGI worker.")
+
+    def handle(self, *args, **options):
+        patients = self.patients(options['users'], options['months'])
+        tokens, created = [], []
+        for user_id, _ in patients:
+            token, was_created = Token.objects.get_or_create(user_id=user_id)
+            tokens.append(token.key)
+            if was_created:
+                created.append(token.pk)
+
+        # One request plan per patient: list pages interleaved with report downloads
+        plans = []
+        for (_, months), key in zip(patients, tokens):
+            plan = [('list', None)] * options['pages'] + [('report', month) for month in months]
+            plans.append((key, plan[::2] + plan[1::2]))
+
+        setup_test_environment()
+        try:
+            get_report_cache().clear()
+            wsgi = self.run_wsgi(plans, options['threads'])
+            get_report_cache().clear()
+            # The async views render in the report worker pool, started (and reportlab imported) before the clock runs
+            workers = settings.REPORT_JOBS.get('MAX_WORKERS', 2)
+            list(get_executor().map(report_title, [date.today()] * workers, [date.today()] * workers))
+            asgi = asyncio.run(self.run_asgi(plans))
+            get_report_cache().clear()
+        finally:
+            teardown_test_environment()
+            Token.objects.filter(pk__in=created).delete()
+
+        # Rendering in the worker pool only runs in parallel with the requests on a multi-core host
+        self.stdout.write(f"{os.cpu_count()} CPU(s), {len(plans)} patients, {options['threads']} WSGI threads, "
+                          f"{settings.REPORT_JOBS.get('MAX_WORKERS', 2)} report workers")
+        for name, result in (('wsgi', wsgi), ('asgi', asgi)):
+            self.report(name, result)
+        self.stdout.write(self.style.SUCCESS(
+            f"asgi: {asgi['requests'] / asgi['seconds']:.1f} vs {wsgi['requests'] / wsgi['seconds']:.1f} requests/s, "
+            f"list p95 {asgi['list_p95_ms']:.1f} vs {wsgi['list_p95_ms']:.1f} ms while reports render"
+        ))
+
+    def patients(self, count, months):
+        """
+        Return (user id, months) of the first 'count' patients with records in at least 'months' months.
+        """
+        rows = (
+            DailyTrack.objects.annotate(month=TruncMonth('date')).values('user_id', 'month')
+            .annotate(records=Count('id')).order_by('user_id', '-month')
+        )
+        patients = []
+        for user_id, user_rows in groupby(rows.iterator(), key=itemgetter('user_id')):
+            patient_months = [row['month'] for row in islice(user_rows, months)]
+            if len(patient_months) == months:
+                patients.append((user_id, patient_months))
+                if len(patients) == count:
+                    return patients
+        raise CommandError(f"Need {count} patients with {months} months of records, run seed_load first.")
+
+    def url(self, kind, month, prefix):
+        if kind == 'list':
+            return f'/data/{prefix}'
+        return f'/data/{prefix}download/{month.year}/{month.month}'
+
+    def run_wsgi(self, plans, threads):
+        # A WSGI worker serves one request per thread; the patients queue for the threads
+        def serve(kind, month, key):
+            started = time.perf_counter()
+            try:
+                response = Client().get(self.url(kind, month, ''), headers={'Authorization': f'Token {key}'})
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            finally:
+                close_old_connections()
+            return kind, response.status_code, (time.perf_counter() - started) * 1000
+
+        def patient(key, plan):
+            # Every patient sends their next request as soon as the previous one is answered
+            return [workers.submit(serve, kind, month, key).result() for kind, month in plan]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as workers, ThreadPoolExecutor(max_workers=len(plans)) as patients:
+            futures = [patients.submit(patient, key, plan) for key, plan in plans]
+            results = [result for future in futures for result in future.result()]
+        return self.summarize(results, time.perf_counter() - started)
+
+    async def run_asgi(self, plans):
+        client = AsyncClient()
+
+        async def patient(key, plan):
+            results = []
+            for kind, month in plan:
+                started = time.perf_counter()
+                response = await client.get(self.url(kind, month, 'async/'), headers={'Authorization': f'Token {key}'})
+                results.append((kind, response.status_code, (time.perf_counter() - started) * 1000))
+            return results
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(patient(key, plan) for key, plan in plans))
+        return self.summarize([result for outcome in outcomes for result in outcome], time.perf_counter() - started)
+
+    def summarize(self, results, seconds):
+        failed = [status for _, status, _ in results if status != 200]
+        if failed:
+            raise CommandError(f"{len(failed)} requests failed with status {sorted(set(failed))}.")
+        lists = [elapsed for kind, _, elapsed in results if kind == 'list']
+        reports = [elapsed for kind, _, elapsed in results if kind == 'report']
+        return {
+            'requests': len(results),
+            'seconds': seconds,
+            'list_p50_ms': percentile(lists, 0.5),
+            'list_p95_ms': percentile(lists, 0.95),
+            'report_p50_ms': percentile(reports, 0.5),
+            'report_p95_ms': percentile(reports, 0.95),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name}  {result['requests']} requests in {result['seconds']:6.2f} s "
+            f"({result['requests'] / result['seconds']:6.1f}/s)   list p50 {result['list_p50_ms']:7.1f} ms "
+            f"p95 {result['list_p95_ms']:7.1f} ms   report p50 {result['report_p50_ms']:7.1f} ms p95 {result['report_p95_ms']:7.1f} ms"
+        )
@@ -0,0 +1,73 @@
+import time
+from datetime import date, timedelta
+from itertools import combinations
+
+# these are django imports
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+# these are local imports
+from user_daily_track.models import FILTER_FIELDS, DailyTrack
+from user_daily_track.views import DailyTrackPagination, filter_daily_tracks
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the query plan (and optionally the timing) of the DailyTrack list query for every "
+        "supported filter combination, and check that each one is served by an index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="User id to query (defaults to the user with the most records).")
+        parser.add_argument('--repeat', type=int, default=0, help="Run each query this many times and report the mean time.")
+        parser.add_argument('--analyze', action='store_true', help="Run ANALYZE first so the planner has statistics.")
+
+    def handle(self, *args, **options):
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        user_id = options['user'] or self.busiest_user()
+        today = date.today()
+        ranges = [{}, {'from': (today - timedelta(days=30)).isoformat()},
+                  {'from': (today - timedelta(days=365)).isoformat(), 'to': today.isoformat()}]
+        flag_sets = [flags for size in range(len(FILTER_FIELDS) + 1) for flags in combinations(FILTER_FIELDS, size)]
+
+        unindexed = 0
+        for date_range in ranges:
+            for flags in flag_sets:
+                params = dict(date_range, **{field: 'Yes' for field in flags})
+                queryset = filter_daily_tracks(DailyTrack.objects.filter(user_id=user_id), params)
+                queryset = queryset.order_by(*DailyTrackPagination.ordering)[:DailyTrackPagination.page_size + 1]
+                plan = queryset.explain()
+
+                uses_index = 'INDEX' in plan and 'SCAN user_daily_track_dailytrack' not in plan
+                sorts = 'TEMP B-TREE' in plan
+                unindexed += not uses_index
+
+                label = ', '.join(f"{key}={value}" for key, value in params.items()) or '(no filters)'
+                verdict = self.style.SUCCESS('index') if uses_index else self.style.ERROR('NO INDEX')
+                if sorts:
+                    verdict += self.style.WARNING(' +sort')
+                line = f"{verdict:<8} {label}"
+                if options['repeat']:
+                    line += f"  [{self.time_query(queryset, options['repeat']):.3f} ms]"
+                self.stdout.write(line)
+                self.stdout.write(f"    {' | '.join(plan.splitlines())}")
+
+        total = len(ranges) * len(flag_sets)
+        if unindexed:
+            self.stdout.write(self.style.ERROR(f"{unindexed} of {total} filter combinations are not served by an index."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"All {total} filter combinations are served by an index."))
+
+    def busiest_user(self):
+        from django.db.models import Count
+        row = DailyTrack.objects.values('user_id').annotate(records=Count('id')).order_by('-records').first()
+        return row['user_id'] if row else 1
+
+    def time_query(self, queryset, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset.all())
+        return (time.perf_counter() - started) * 1000 / repeat
@@ -0,0 +1,209 @@
+import json
+import math
+import platform
+import time
+import tracemalloc
+from datetime import timedelta
+
+# these are django imports
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+
+# these are rest_framework imports
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+# these are local imports
+from tables.models import Role
+from user.models import User
+from user_daily_track.models import DailyTrack
+from user_daily_track.report_cache import get_report_cache
+
+# Differences below these are noise, whatever the relative change
+MIN_LATENCY_REGRESSION_MS = 1.0
+MIN_MEMORY_REGRESSION_KIB = 64
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a non-empty list.
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main API endpoints against the configured (seeded, see seed_load) database with the "
+        "test client. Records p50/p95 latency, SQL queries and peak memory per endpoint, writes them to a JSON "
+        "file and can compare them with a saved baseline. Every write is rolled back at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username of the patient to benchmark as (defaults to the one with the most records).")
+        parser.add_argument('--password', default='load-test-password', help="The patient's password, for the login endpoint.")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--search', default='sharma', help="Query used for the search endpoints.")
+        parser.add_argument('--output', default='bench_endpoints.json', help="Where to write the results.")
+        parser.add_argument('--compare', help="Baseline JSON file to compare the results with.")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Relative increase of latency or memory counted as a regression (default 0.2 = 20%%).")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with transaction.atomic():
+                results = self.run(options)
+                transaction.set_rollback(True)
+        finally:
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'iterations': options['iterations'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'users': User.objects.count(),
+                'daily_tracks': DailyTrack.objects.count(),
+            },
+            'endpoints': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                regressions = self.compare(json.load(baseline)['endpoints'], results, options['threshold'])
+            if regressions:
+                raise CommandError(f"{regressions} regression(s) against {options['compare']}.")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}."))
+
+    def run(self, options):
+        patient = self.patient(options['user'])
+        admin = self.admin()
+        client = self.client_for(patient)
+        admin_client = self.client_for(admin)
+        anonymous = APIClient()
+
+        latest = DailyTrack.objects.filter(user=patient).order_by('-date').values_list('date', flat=True).first()
+        if latest is None:
+            raise CommandError(f"{patient.username} has no DailyTrack records, run seed_load first.")
+        # New records are dated after every existing one, one day per request
+        new_dates = (latest + timedelta(days=offset) for offset in range(1, 100000))
+        get_report_cache().clear()
+
+        endpoints = [
+            ('login', lambda: anonymous.post('/user/login', {'username': patient.username, 'password': options['password']}, format='json')),
+            ('user_get', lambda: client.get('/user/user')),
+            ('user_patch', lambda: client.patch('/user/user', {'city': 'Mysuru'}, format='json')),
+            ('search', lambda: admin_client.get('/user/search/', {'q': options['search']})),
+            ('search_compact', lambda: admin_client.get('/user/search/', {'q': options['search'], 'compact': 'true'})),
+            ('daily_track_list', lambda: client.get('/data/')),
+            ('daily_track_create', lambda: client.post('/data/', {
+                'date': next(new_dates).isoformat(), 'break_through_bleed': 'No',
+                'inj_hemilibra': 'Yes', 'physiotherapy': 'No'}, format='json')),
+            ('profile_get', lambda: client.get('/profile/')),
+            ('profile_patch', lambda: client.patch('/profile/', {'target_joints': 'Left knee'}, format='json')),
+            ('monthly_report', lambda: client.get(f'/data/download/{latest.year}/{latest.month}')),
+        ]
+
+        results = {}
+        for name, request in endpoints:
+            results[name] = self.measure(request, options['iterations'], options['warmup'])
+            result = results[name]
+            self.stdout.write(
+                f"{name:<20} p50 {result['p50_ms']:8.2f} ms   p95 {result['p95_ms']:8.2f} ms   "
+                f"{result['queries']:3d} queries   peak {result['peak_kib']:8.1f} KiB   status {result['status']}"
+            )
+        return results
+
+    def measure(self, request, iterations, warmup):
+        for _ in range(warmup):
+            request()
+
+        timings = []
+        queries = []
+        statuses = set()
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = request()
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured.captured_queries))
+            statuses.add(response.status_code)
+
+        # Memory is traced in a separate request, tracing slows everything down
+        tracemalloc.start()
+        try:
+            request()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'p50_ms': round(percentile(timings, 0.5), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'mean_ms': round(sum(timings) / len(timings), 3),
+            'queries': max(queries),
+            'peak_kib': round(peak / 1024, 1),
+            'status': sorted(statuses)[0] if len(statuses) == 1 else sorted(statuses),
+        }
+
+    def compare(self, baseline, results, threshold):
+        regressions = 0
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                self.stdout.write(f"{name:<20} not in the baseline")
+                continue
+            problems = []
+            for metric, floor in (('p50_ms', MIN_LATENCY_REGRESSION_MS), ('p95_ms', MIN_LATENCY_REGRESSION_MS),
+                                  ('peak_kib', MIN_MEMORY_REGRESSION_KIB)):
+                if result[metric] > before[metric] * (1 + threshold) and result[metric] - before[metric] > floor:
+                    problems.append(f"{metric} {before[metric]} -> {result[metric]}")
+            if result['queries'] > before['queries']:
+                problems.append(f"queries {before['queries']} -> {result['queries']}")
+            if result['status'] != before['status']:
+                problems.append(f"status {before['status']} -> {result['status']}")
+
+            if problems:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(f"{name:<20} REGRESSION: {', '.join(problems)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name:<20} ok"))
+        return regressions
+
+    def patient(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User {username} does not exist.")
+        row = DailyTrack.objects.values('user_id').annotate(records=Count('id')).order_by('-records').first()
+        if row is None:
+            raise CommandError("The database has no DailyTrack records, run seed_load first.")
+        return User.objects.get(id=row['user_id'])
+
+    def admin(self):
+        admin = User.objects.filter(is_staff=True, is_active=True).order_by('id').first()
+        if admin is None:
+            # Rolled back with the rest of the run
+            admin = User(username='bench-admin', email='bench-admin@example.com', role=Role.objects.filter(role_id='R01').first())
+            admin.set_unusable_password()
+            admin.save()
+        return admin
+
+    def client_for(self, user):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
@@ -0,0 +1,211 @@
+import math
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from multiprocessing import get_context
+
+# these are django imports
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# these are local imports
+from HealthData.sqlite import SQLITE_PROFILES, init_command
+
+# Fake records are dated from here on, far past any real history, and deleted with the copy
+BENCH_START_DATE = date(2200, 1, 1)
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of a list, 0 when it is empty.
+    """
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _connect(path, profile):
+    connection = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None, check_same_thread=False)
+    for statement in init_command(profile).split(';'):
+        connection.execute(statement)
+    return connection
+
+
+def _begin(mode):
+    return f"BEGIN {mode}" if mode else 'BEGIN'
+
+
+def _worker(role, index, path, profile, table, user_ids, start_at, seconds, read_transactions):
+    """
+    Run one simulated worker process against the database copy at 'path' until the time is up.
+
+    A writer logs a DailyTrack record and reads back the month in one write_atomic() transaction,
+    like the daily entry endpoint; a reader fetches the latest month of a patient, like the history
+    list, and with read_transactions also counts the month in the same atomic() transaction. Without
+    persistent connections every operation opens (and initialises) its own connection.
+    """
+    rng = random.Random(index)
+    persistent = profile['conn_max_age'] > 0
+    begin_write = _begin(profile['write_transaction_mode'] or profile['transaction_mode'])
+    begin_read = _begin(profile['transaction_mode'])
+    insert = (
+        f'INSERT OR IGNORE INTO "{table}" (user_id, date, break_through_bleed, inj_hemilibra, physiotherapy, '
+        f"created_at, updated_at) VALUES (?, ?, 'No', 'Yes', 'No', datetime('now'), datetime('now'))"
+    )
+    month = f'SELECT COUNT(*) FROM "{table}" WHERE user_id = ? AND date BETWEEN ? AND ?'
+    latest = f'SELECT * FROM "{table}" WHERE user_id = ? ORDER BY date DESC LIMIT 30'
+    today = date.today()
+    month_start, today = today.replace(day=1).isoformat(), today.isoformat()
+
+    latencies = []
+    locked = 0
+    connection = None
+    operation = 0
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            if connection is None:
+                connection = _connect(path, profile)
+            if role == 'writer':
+                # Every writer has its own run of dates, so the (user, date) pairs never collide
+                day = BENCH_START_DATE + timedelta(days=operation)
+                user_id = user_ids[(index + operation * 7919) % len(user_ids)]
+                connection.execute(begin_write)
+                try:
+                    connection.execute(insert, (user_id, day.isoformat()))
+                    connection.execute(month, (user_id, day.replace(day=1).isoformat(), day.isoformat())).fetchone()
+                    connection.execute('COMMIT')
+                except sqlite3.Error:
+                    if connection.in_transaction:
+                        connection.execute('ROLLBACK')
+                    raise
+            elif read_transactions:
+                user_id = rng.choice(user_ids)
+                connection.execute(begin_read)
+                try:
+                    connection.execute(latest, (user_id,)).fetchall()
+                    connection.execute(month, (user_id, month_start, today)).fetchone()
+                    connection.execute('COMMIT')
+                except sqlite3.Error:
+                    if connection.in_transaction:
+                        connection.execute('ROLLBACK')
+                    raise
+            else:
+                connection.execute(latest, (rng.choice(user_ids),)).fetchall()
+            latencies.append((time.perf_counter() - started) * 1000)
+        except sqlite3.OperationalError as error:
+            if 'locked' not in str(error) and 'busy' not in str(error):
+                raise
+            locked += 1
+        finally:
+            if connection is not None and not persistent:
+                connection.close()
+                connection = None
+        operation += 1
+    if connection is not None:
+        connection.close()
+    return role, latencies, locked
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the SQLite connection profiles of HealthData/sqlite.py under a mixed read/write load. "
+        "Each profile runs writer and reader processes for a fixed time against its own copy of the "
+        "configured database; the database itself is never written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help="Writer processes.")
+        parser.add_argument('--readers', type=int, default=4, help="Reader processes.")
+        parser.add_argument('--seconds', type=float, default=5.0, help="Duration of the load per profile.")
+        parser.add_argument('--profiles', nargs='+', default=['baseline', 'production'], choices=sorted(SQLITE_PROFILES))
+        parser.add_argument('--db', help="SQLite file to copy (defaults to the 'default' database).")
+        parser.add_argument('--read-transactions', action='store_true',
+                            help="Readers run their queries in a read-only transaction, like an atomic() block.")
+
+    def handle(self, *args, **options):
+        source = str(options['db'] or settings.DATABASES['default']['NAME'])
+        if not os.path.exists(source):
+            raise CommandError(f"{source} does not exist.")
+
+        # Imported here: the worker processes import this module without Django being set up
+        from user_daily_track.models import DailyTrack
+        table = DailyTrack._meta.db_table
+        connection = sqlite3.connect(source)
+        try:
+            user_ids = [row[0] for row in connection.execute(f'SELECT DISTINCT user_id FROM "{table}" LIMIT 10000')]
+        finally:
+            connection.close()
+        if not user_ids:
+            raise CommandError("The database has no DailyTrack records, run seed_load first.")
+
+        results = {}
+        for name in options['profiles']:
+            results[name] = self.run_profile(source, name, table, user_ids, options)
+            self.report(name, results[name], options['seconds'])
+
+        if 'baseline' in results and len(results) > 1:
+            baseline = results['baseline']
+            for name, result in results.items():
+                if name != 'baseline' and baseline['writes']:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{name}: {result['writes'] / baseline['writes']:.1f}x the baseline write throughput, "
+                        f"{result['locked']} vs {baseline['locked']} 'database is locked' errors"
+                    ))
+
+    def run_profile(self, source, name, table, user_ids, options):
+        profile = SQLITE_PROFILES[name]
+        directory = tempfile.mkdtemp(prefix='bench-sqlite-')
+        try:
+            path = os.path.join(directory, 'bench.sqlite3')
+            # The online backup gives a consistent copy even while the source is in use
+            original, copy = sqlite3.connect(source), sqlite3.connect(path)
+            try:
+                original.backup(copy)
+            finally:
+                original.close()
+                copy.close()
+            # The journal mode is stored in the file, so the copy starts from the profile's mode
+            _connect(path, profile).close()
+
+            roles = ['writer'] * options['writers'] + ['reader'] * options['readers']
+            # Started together once every process is up
+            start_at = time.time() + 2.0
+            with ProcessPoolExecutor(max_workers=len(roles), mp_context=get_context('spawn')) as pool:
+                futures = [
+                    pool.submit(
+                        _worker, role, index, path, profile, table, user_ids, start_at, options['seconds'],
+                        options['read_transactions'],
+                    )
+                    for index, role in enumerate(roles)
+                ]
+                outcomes = [future.result() for future in futures]
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        writes = [latency for role, latencies, _ in outcomes if role == 'writer' for latency in latencies]
+        reads = [latency for role, latencies, _ in outcomes if role == 'reader' for latency in latencies]
+        return {
+            'writes': len(writes),
+            'reads': len(reads),
+            'write_p50_ms': percentile(writes, 0.5),
+            'write_p95_ms': percentile(writes, 0.95),
+            'read_p95_ms': percentile(reads, 0.95),
+            'locked': sum(locked for _, _, locked in outcomes),
+        }
+
+    def report(self, name, result, seconds):
+        self.stdout.write(
+            f"{name:<12} writes {result['writes'] / seconds:8.1f}/s   reads {result['reads'] / seconds:9.1f}/s   "
+            f"write p50 {result['write_p50_ms']:7.2f} ms   p95 {result['write_p95_ms']:7.2f} ms   "
+            f"read p95 {result['read_p95_ms']:7.2f} ms   locked {result['locked']}"
+        )
@@ -0,0 +1,31 @@
+# these are django imports
+from django.core.management.base import BaseCommand
+
+# these are local imports
+from user_daily_track.jobs import create_executor, pending_job_ids, run_job, run_job_in_worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Render every queued report job, e.g. after a restart. Running jobs whose worker is gone are re-queued "
+        "and jobs past REPORT_JOBS['RETENTION_SECONDS'] deleted first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inline', action='store_true', help="Render in this process instead of the worker pool.")
+
+    def handle(self, *args, **options):
+        job_ids = pending_job_ids()
+        if not job_ids:
+            self.stdout.write("No queued report jobs.")
+            return
+
+        if options['inline']:
+            results = [run_job(job_id) for job_id in job_ids]
+        else:
+            with create_executor() as executor:
+                results = list(executor.map(run_job_in_worker, job_ids))
+
+        done = sum(1 for result in results if result == 'done')
+        failed = sum(1 for result in results if result == 'failed')
+        self.stdout.write(self.style.SUCCESS(f"Processed {len(job_ids)} report jobs: {done} done, {failed} failed."))
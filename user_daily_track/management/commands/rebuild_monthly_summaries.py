@@ -0,0 +1,13 @@
+# these are django imports
+from django.core.management.base import BaseCommand
+
+# these are local imports
+from user_daily_track.summaries import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Recount every MonthlySummary from the DailyTrack records, e.g. after rows were bulk loaded."
+
+    def handle(self, *args, **options):
+        written = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} monthly summaries."))
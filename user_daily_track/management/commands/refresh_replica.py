@@ -0,0 +1,29 @@
+import time
+
+# these are django imports
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+# these are local imports
+from HealthData.replica import refresh_replica
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database onto the read replica (settings.READ_REPLICA) with the online "
+        "backup API. With --every the copy is refreshed periodically until interrupted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, help="Refresh every this many seconds instead of once.")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                elapsed = refresh_replica()
+            except ImproperlyConfigured as error:
+                raise CommandError(str(error))
+            self.stdout.write(self.style.SUCCESS(f"Replica refreshed in {elapsed:.2f} s."))
+            if not options['every']:
+                return
+            time.sleep(max(0.0, options['every'] - elapsed))
@@ -0,0 +1,177 @@
+import random
+import time
+from datetime import date, timedelta
+from itertools import islice
+
+# these are django imports
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+# these are local imports
+from tables.models import Gender, Heamophilia, Role
+from user.models import User
+from user.search import rebuild_index
+from user_daily_track.models import DailyTrack
+from user_daily_track.summaries import rebuild_all
+from user_profile.models import Profile
+
+FIRST_NAMES = ('Aarav', 'Vivaan', 'Aditya', 'Arjun', 'Ananya', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Rohan',
+               'Saanvi', 'Tanvi', 'Kiran', 'Nikhil', 'Pooja', 'Rahul', 'Sneha', 'Varun', 'Lakshmi', 'Manoj')
+LAST_NAMES = ('Sharma', 'Patel', 'Reddy', 'Nair', 'Iyer', 'Gowda', 'Rao', 'Singh', 'Khan', 'Das',
+              'Hegde', 'Shetty', 'Kulkarni', 'Joshi', 'Menon', 'Pillai', 'Naik', 'Bhat', 'Kamath', 'Prabhu')
+CITIES = (('Bengaluru', 'Karnataka'), ('Mysuru', 'Karnataka'), ('Mangaluru', 'Karnataka'), ('Hubballi', 'Karnataka'),
+          ('Belagavi', 'Karnataka'), ('Chennai', 'Tamil Nadu'), ('Hyderabad', 'Telangana'), ('Kochi', 'Kerala'))
+FACTORS = ('vii', 'viii', 'ix', 'xi')
+PERCENTAGES = ('less then 1%', '1-10%', '10-20%', '20-30%')
+TARGET_JOINTS = ('Left knee', 'Right knee', 'Left ankle', 'Right ankle', 'Left elbow', 'Right elbow')
+BLEED_DETAILS = ('Swelling in the knee', 'Pain in the ankle', 'Nose bleed', 'Bruising on the arm', 'Joint stiffness')
+TREATMENTS = ('Factor infusion', 'Rest and ice', 'Factor infusion and physiotherapy', 'Compression bandage')
+# Order of the values in a generated history row
+HISTORY_FIELDS = ('user', 'date', 'break_through_bleed', 'break_through_bleed_details', 'treatment_for_bleed',
+                  'inj_hemilibra', 'physiotherapy')
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users with profiles and daily history for load testing. The same seed "
+        "and end date always produce the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--days', type=int, default=365, help="Days of DailyTrack history per user.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--end', type=date.fromisoformat, default=None,
+                            help="Last day of the history (YYYY-MM-DD, defaults to today).")
+        parser.add_argument('--prefix', default='load', help="Username prefix of the generated accounts.")
+        parser.add_argument('--password', default='load-test-password')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help="Delete previously generated accounts with the prefix first.")
+
+    def handle(self, *args, **options):
+        role = Role.objects.filter(name='User').first()
+        genders = list(Gender.objects.values_list('gender_id', flat=True).order_by('gender_id'))
+        heamophilia_types = list(Heamophilia.objects.values_list('name', flat=True).order_by('name'))
+        if role is None or not genders or not heamophilia_types:
+            raise CommandError("Create the 'User' role and at least one Gender and Heamophilia first.")
+
+        prefix = options['prefix']
+        if options['clear']:
+            deleted, _ = User.objects.filter(username__startswith=f"{prefix}-").delete()
+            self.stdout.write(f"Deleted {deleted} rows of previously generated data")
+        if User.objects.filter(username__startswith=f"{prefix}-").exists():
+            raise CommandError(f"Accounts with the prefix '{prefix}-' exist already, use --clear or another --prefix.")
+
+        started = time.perf_counter()
+        rng = random.Random(options['seed'])
+        end = options['end'] or date.today()
+        days = [end - timedelta(days=offset) for offset in range(options['days'] - 1, -1, -1)]
+        # Hashing is deliberately slow, so every account shares one hash computed once
+        password = make_password(options['password'])
+        batch_size = options['batch_size']
+
+        with transaction.atomic():
+            first_id = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+            users, profiles = self.build_users(rng, options['users'], first_id, prefix, role, genders, heamophilia_types, password, end)
+            User.objects.bulk_create(users, batch_size=batch_size)
+            Profile.objects.bulk_create(profiles, batch_size=batch_size)
+
+            records = self.insert_history(self.build_history(rng, users, days), batch_size)
+        loaded = time.perf_counter() - started
+
+        # bulk_create skips the signals, so the derived tables are rebuilt in one pass each
+        summaries = rebuild_all()
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(users)} users, {len(profiles)} profiles and {records} daily records in {loaded:.1f} s; "
+            f"rebuilt {summaries} monthly summaries and {indexed} search entries in {time.perf_counter() - started - loaded:.1f} s."
+        ))
+
+    def build_users(self, rng, count, first_id, prefix, role, genders, heamophilia_types, password, today):
+        users = []
+        profiles = []
+        for n in range(count):
+            user_id = first_id + n
+            first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            city, state = rng.choice(CITIES)
+            date_of_birth = today - timedelta(days=rng.randint(2 * 365, 70 * 365))
+            users.append(User(
+                id=user_id,
+                username=f"{prefix}-{user_id}",
+                email=f"{prefix}-{user_id}@example.com",
+                password=password,
+                first_name=first_name,
+                last_name=last_name,
+                date_of_birth=date_of_birth,
+                # bulk_create does not call User.save(), so age is filled in here
+                age=today.year - date_of_birth.year - ((today.month, today.day) < (date_of_birth.month, date_of_birth.day)),
+                phone_number=f"9{user_id:09d}",
+                parent_name=f"{rng.choice(FIRST_NAMES)} {last_name}",
+                address=f"{rng.randint(1, 999)}, {rng.randint(1, 40)}th Cross",
+                city=city,
+                state=state,
+                zip_code=f"{rng.randint(560001, 591999)}",
+                role=role,
+                gender_id=rng.choice(genders),
+            ))
+            inhibitor = 'yes' if rng.random() < 0.1 else 'no'
+            profiles.append(Profile(
+                user_id=user_id,
+                ka_regd_no=f"{prefix.upper()}{user_id:07d}",
+                heamophilia_type=rng.choice(heamophilia_types),
+                percentage=rng.choice(PERCENTAGES),
+                factor=rng.choice(FACTORS),
+                inhibitor=inhibitor,
+                inhibitor_percentage=round(rng.uniform(1, 40), 1) if inhibitor == 'yes' else None,
+                target_joints=rng.choice(TARGET_JOINTS),
+            ))
+        return users, profiles
+
+    def insert_history(self, rows, batch_size):
+        """
+        Insert DailyTrack rows, given as tuples in HISTORY_FIELDS order, with one executemany() per batch.
+
+        At a million rows bulk_create() spends most of its time preparing every field of every model
+        instance; the history values are already in database form, so they go straight to the cursor.
+        """
+        quote = connection.ops.quote_name
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        columns = [DailyTrack._meta.get_field(field).column for field in HISTORY_FIELDS] + ['created_at', 'updated_at']
+        sql = (
+            f"INSERT INTO {quote(DailyTrack._meta.db_table)} ({', '.join(quote(column) for column in columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})"
+        )
+        inserted = 0
+        with connection.cursor() as cursor:
+            for batch in iter(lambda: list(islice(rows, batch_size)), []):
+                cursor.executemany(sql, [row + (now, now) for row in batch])
+                inserted += len(batch)
+        return inserted
+
+    def build_history(self, rng, users, days):
+        """
+        Yield the DailyTrack rows of every user: each patient logs most days and has their own
+        injection adherence, physiotherapy habit and bleed rate.
+        """
+        days = [connection.ops.adapt_datefield_value(day) for day in days]
+        for user in users:
+            logging_rate = rng.uniform(0.6, 1.0)
+            adherence = rng.betavariate(8, 2)
+            physiotherapy_rate = rng.uniform(0.1, 0.6)
+            bleed_rate = rng.uniform(0.0, 0.05) * (1.5 - adherence)
+            for day in days:
+                if rng.random() > logging_rate:
+                    continue
+                bleed = rng.random() < bleed_rate
+                yield (
+                    user.id,
+                    day,
+                    'Yes' if bleed else 'No',
+                    rng.choice(BLEED_DETAILS) if bleed else None,
+                    rng.choice(TREATMENTS) if bleed else None,
+                    'Yes' if rng.random() < adherence else 'No',
+                    'Yes' if rng.random() < physiotherapy_rate else 'No',
+                )
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:04
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicate_entries(apps, schema_editor):
+    """
+    Keep only the most recently updated DailyTrack per (user, date) so the unique constraint can be added.
+    """
+    DailyTrack = apps.get_model('user_daily_track', 'DailyTrack')
+    duplicates = (
+        DailyTrack.objects.values('user_id', 'date')
+        .annotate(entries=Count('id'))
+        .filter(entries__gt=1)
+    )
+    for duplicate in duplicates:
+        entries = DailyTrack.objects.filter(user_id=duplicate['user_id'], date=duplicate['date'])
+        keep = entries.order_by('-updated_at', '-id').values_list('id', flat=True).first()
+        entries.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_daily_track', '0002_reportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_entries, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailytrack',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_track_per_user_date'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_daily_track', '0003_unique_user_date'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dailytrack',
+            index=models.Index(fields=['user', 'break_through_bleed', 'date'], name='dailytrack_user_bleed_date'),
+        ),
+        migrations.AddIndex(
+            model_name='dailytrack',
+            index=models.Index(fields=['user', 'inj_hemilibra', 'date'], name='dailytrack_user_inj_date'),
+        ),
+        migrations.AddIndex(
+            model_name='dailytrack',
+            index=models.Index(fields=['user', 'physiotherapy', 'date'], name='dailytrack_user_physio_date'),
+        ),
+    ]
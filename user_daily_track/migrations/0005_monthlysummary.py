@@ -0,0 +1,50 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_summaries(apps, schema_editor):
+    DailyTrack = apps.get_model('user_daily_track', 'DailyTrack')
+    MonthlySummary = apps.get_model('user_daily_track', 'MonthlySummary')
+    rows = DailyTrack.objects.annotate(
+        year=ExtractYear('date'), month=ExtractMonth('date')
+    ).values('user_id', 'year', 'month').annotate(
+        logged_days=Count('id'),
+        bleed_days=Count('id', filter=Q(break_through_bleed='Yes')),
+        injection_days=Count('id', filter=Q(inj_hemilibra='Yes')),
+        physiotherapy_days=Count('id', filter=Q(physiotherapy='Yes')),
+    ).order_by()
+    MonthlySummary.objects.bulk_create([MonthlySummary(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_daily_track', '0004_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('month', models.PositiveSmallIntegerField()),
+                ('logged_days', models.PositiveIntegerField(default=0)),
+                ('bleed_days', models.PositiveIntegerField(default=0)),
+                ('injection_days', models.PositiveIntegerField(default=0)),
+                ('physiotherapy_days', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'year', 'month'), name='unique_monthly_summary_per_user_month')],
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_daily_track', '0005_monthlysummary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='monthlysummary',
+            name='bleed_days',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='monthlysummary',
+            name='injection_days',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='monthlysummary',
+            name='logged_days',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='monthlysummary',
+            name='physiotherapy_days',
+            field=models.IntegerField(default=0),
+        ),
+    ]
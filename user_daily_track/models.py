@@ -1,7 +1,45 @@
+import uuid
+
 # these are django imports
 from django.db import models
 from django.utils import timezone
 
+# these are local imports
+from HealthData.transactions import write_atomic
+
+# Yes/No fields the DailyTrack list can be filtered on, each backed by a (user, field, date) index
+FILTER_FIELDS = ('break_through_bleed', 'inj_hemilibra', 'physiotherapy')
+
+# Fields a DailyTrack upsert writes when the (user, date) row already exists
+UPSERT_FIELDS = [
+    'break_through_bleed', 'break_through_bleed_details', 'treatment_for_bleed',
+    'inj_hemilibra', 'physiotherapy', 'updated_at',
+]
+
+
+class DailyTrackQuerySet(models.QuerySet):
+
+    def upsert(self, user, date, **fields):
+        """
+        Create the user's record for the date, or overwrite it if one exists, in a single
+        INSERT ... ON CONFLICT (user_id, date) DO UPDATE statement.
+
+        Fields that are not given are reset to their defaults, like a full update. The returned
+        instance carries the row's primary key; its created_at is only accurate for a new row.
+        The month's MonthlySummary is recounted in the same transaction.
+        """
+        from .summaries import rebuild_months
+
+        record = self.model(user=user, date=date, **fields)
+        with write_atomic():
+            self.bulk_create(
+                [record], update_conflicts=True, unique_fields=['user', 'date'], update_fields=UPSERT_FIELDS
+            )
+            # No signals are sent and the replaced values are unknown, so recount the month
+            rebuild_months(record.user_id, [(record.date.year, record.date.month)])
+        return record
+
+
 # Create your models here.
 class DailyTrack(models.Model):
     user = models.ForeignKey('user.User', on_delete=models.CASCADE, related_name='dailytrack' )
@@ -16,5 +54,118 @@ class DailyTrack(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = DailyTrackQuerySet.as_manager()
+
+    # Fields whose loaded values the monthly summary needs to undo this record's contribution
+    SUMMARY_FIELDS = ('date', 'break_through_bleed', 'inj_hemilibra', 'physiotherapy')
+
+    class Meta:
+        constraints = [
+            # One entry per user and day. The constraint's index also serves lookups by (user, date).
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_track_per_user_date'),
+        ]
+        indexes = [
+            # Back the Yes/No filters of the DailyTrack list; date last so filtered pages stay in key order
+            models.Index(fields=['user', 'break_through_bleed', 'date'], name='dailytrack_user_bleed_date'),
+            models.Index(fields=['user', 'inj_hemilibra', 'date'], name='dailytrack_user_inj_date'),
+            models.Index(fields=['user', 'physiotherapy', 'date'], name='dailytrack_user_physio_date'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so the monthly summary can be adjusted on save and delete
+        instance._summary_values = {
+            field: getattr(instance, field) for field in cls.SUMMARY_FIELDS if field in instance.__dict__
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        # The monthly summary is updated by a post_save receiver inside the same transaction
+        with write_atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with write_atomic():
+            return super().delete(*args, **kwargs)
+
     def __str__(self):
         return f"Daily Track - {self.date}"
+
+
+class ReportJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey('user.User', on_delete=models.CASCADE, related_name='report_jobs')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    file_path = models.CharField(max_length=255, blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    # The worker rendering a running job, and when it last reported in (see jobs.py)
+    worker_host = models.CharField(max_length=255, blank=True, null=True)
+    worker_pid = models.IntegerField(blank=True, null=True)
+    heartbeat_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Report Job - {self.start_date} to {self.end_date} ({self.status})"
+
+
+class JobLease(models.Model):
+    """
+    A named lease held by one process until expires_at, e.g. the resume of the pending report jobs
+    when the server starts (see jobs.py).
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    holder = models.CharField(max_length=255)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} held by {self.holder} until {self.expires_at}"
+
+
+class MonthlySummary(models.Model):
+    """
+    Per user and month totals of the DailyTrack records, kept up to date as records are written.
+    """
+    user = models.ForeignKey('user.User', on_delete=models.CASCADE, related_name='monthly_summaries')
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+
+    # Plain integers: a summary that drifted from its records (e.g. after writes that send no signals)
+    # may go below zero while a delete is applied, and is then recounted instead of failing the delete
+    logged_days = models.IntegerField(default=0)
+    bleed_days = models.IntegerField(default=0)
+    injection_days = models.IntegerField(default=0)
+    physiotherapy_days = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'year', 'month'], name='unique_monthly_summary_per_user_month'),
+        ]
+
+    def __str__(self):
+        return f"Monthly Summary - {self.year}-{self.month:02}"
@@ -0,0 +1,215 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# these are django imports
+from django.conf import settings
+
+
+def report_version(*parts):
+    """
+    Build a short, filesystem-safe version string from the values a report depends on.
+    """
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class _Flight:
+    """
+    A render in progress. Requests for the same report wait on the event instead of rendering again.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ReportCache:
+    """
+    Two-level (memory and disk) cache for rendered PDF reports.
+
+    Entries are stored under a key, e.g. (user_id, year, month), together with a version. A lookup
+    with a different version is a miss, so a report is re-rendered as soon as the data it was
+    built from changes. Both levels are bounded in bytes and evict the least recently used
+    entries first. Concurrent misses for the same key and version render the report only once.
+    """
+
+    def __init__(self, memory_max_bytes, disk_max_bytes, directory):
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.directory = Path(directory) if directory else None
+
+        self._memory = OrderedDict()  # key -> (version, data)
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._inflight = {}
+
+    def get(self, key, version):
+        """
+        Return the cached report for key/version, or None on a miss.
+        """
+        data = self._memory_get(key, version)
+        if data is not None:
+            return data
+
+        data = self._disk_get(key, version)
+        if data is not None:
+            self._memory_put(key, version, data)
+        return data
+
+    def get_or_render(self, key, version, render):
+        """
+        Return the cached report for key/version, calling render() to build it on a miss.
+        """
+        data = self.get(key, version)
+        if data is not None:
+            return data
+
+        with self._lock:
+            flight = self._inflight.get((key, version))
+            leader = flight is None
+            if leader:
+                flight = self._inflight[(key, version)] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            data = render()
+            self._memory_put(key, version, data)
+            self._disk_put(key, version, data)
+            flight.result = data
+            return data
+        except Exception as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[(key, version)]
+            flight.event.set()
+
+    def clear(self):
+        """
+        Drop every cached report from memory and disk.
+        """
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if self.directory is None or not self.directory.exists():
+            return
+        with self._disk_lock:
+            for path in self.directory.glob("*.pdf"):
+                path.unlink(missing_ok=True)
+
+    # Memory level
+
+    def _memory_get(self, key, version):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] != version:
+                # The underlying data changed, the old render is useless
+                self._memory_bytes -= len(entry[1])
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry[1]
+
+    def _memory_put(self, key, version, data):
+        if len(data) > self.memory_max_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous[1])
+            self._memory[key] = (version, data)
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.memory_max_bytes:
+                _, (_, evicted) = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    # Disk level
+
+    def _key_prefix(self, key):
+        return "-".join(str(part) for part in key)
+
+    def _disk_path(self, key, version):
+        return self.directory / f"{self._key_prefix(key)}-{version}.pdf"
+
+    def _disk_get(self, key, version):
+        if self.directory is None:
+            return None
+        path = self._disk_path(key, version)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        # Touch the file so disk eviction sees it as recently used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return data
+
+    def _disk_put(self, key, version, data):
+        if self.directory is None or len(data) > self.disk_max_bytes:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._disk_path(key, version)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        with self._disk_lock:
+            # Older versions of the same report can never be served again
+            for stale in self.directory.glob(f"{self._key_prefix(key)}-*.pdf"):
+                if stale != path:
+                    stale.unlink(missing_ok=True)
+            self._trim_disk()
+
+    def _trim_disk(self):
+        entries = []
+        total = 0
+        for path in self.directory.glob("*.pdf"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+_report_cache = None
+_report_cache_lock = threading.Lock()
+
+
+def get_report_cache():
+    """
+    Return the process-wide ReportCache configured by settings.REPORT_CACHE.
+    """
+    global _report_cache
+    if _report_cache is None:
+        with _report_cache_lock:
+            if _report_cache is None:
+                options = getattr(settings, "REPORT_CACHE", {})
+                _report_cache = ReportCache(
+                    memory_max_bytes=options.get("MEMORY_MAX_BYTES", 32 * 1024 * 1024),
+                    disk_max_bytes=options.get("DISK_MAX_BYTES", 512 * 1024 * 1024),
+                    directory=options.get("DIRECTORY"),
+                )
+    return _report_cache
@@ -0,0 +1,234 @@
+import io
+import calendar
+from itertools import islice
+from xml.sax.saxutils import escape
+
+# these are reportlab imports
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, Table, TableStyle
+
+
+# User fields printed in the report header. A change to any of them invalidates cached reports.
+REPORT_USER_FIELDS = (
+    'first_name', 'last_name', 'email', 'phone_number', 'date_of_birth',
+    'address', 'city', 'state', 'country', 'zip_code',
+)
+
+# Number of DailyTrack rows laid out at a time. Only one chunk of rows is held in memory.
+ROWS_PER_CHUNK = 50
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN_X = 50
+TOP_Y = 800
+BOTTOM_Y = 50
+TABLE_HEADERS = ["Date", "Break Bleed", "Treatment", "Injection", "Physiotherapy"]
+COLUMN_WIDTHS = [80, 80, 180, 80, 80]
+
+CELL_STYLE = getSampleStyleSheet()['BodyText'].clone('ReportCell', fontSize=9, leading=11)
+
+HEADER_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+ROW_STYLE = TableStyle([
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+
+def _record_row(record):
+    treatment = record.treatment_for_bleed if record.treatment_for_bleed else "-"
+    return [
+        record.date.strftime("%d-%b-%Y"),
+        record.break_through_bleed,
+        Paragraph(escape(treatment), CELL_STYLE),
+        record.inj_hemilibra,
+        record.physiotherapy
+    ]
+
+
+class _ReportWriter:
+    """
+    Lays out a report onto a canvas one page at a time.
+
+    Rows are added in chunks. Whatever does not fit on the current page is split off and carried
+    over to the next one, so a report can grow to any number of pages.
+    """
+
+    def __init__(self, fileobj, title):
+        self.pdf = canvas.Canvas(fileobj, pagesize=A4)
+        self.pdf.setTitle(title)
+        self.title = title
+        self.page_number = 1
+        self.y = TOP_Y
+        self.page_has_rows = False
+        self.width = sum(COLUMN_WIDTHS)
+
+    def draw_details(self, user, profile, summary=None):
+        pdf = self.pdf
+
+        # Set title
+        pdf.setFont("Helvetica-Bold", 16)
+        pdf.drawString(150, TOP_Y, self.title)
+
+        # Add user profile details
+        pdf.setFont("Helvetica", 11)
+
+        # Left column (Personal & Contact Details) - Left Aligned
+        left_x = MARGIN_X
+        right_x = 550  # Right-aligned start position
+        y_start = 770
+        line_spacing = 15
+
+        pdf.drawString(left_x, y_start, f"Name: {user.first_name} {user.last_name}")
+        pdf.drawString(left_x, y_start - line_spacing, f"Email: {user.email}")
+        pdf.drawString(left_x, y_start - 2 * line_spacing, f"Phone: {user.phone_number if user.phone_number else 'N/A'}")
+        pdf.drawString(left_x, y_start - 3 * line_spacing, f"Date of Birth: {user.date_of_birth.strftime('%d-%b-%Y') if user.date_of_birth else 'N/A'}")
+
+        # Format Address with City, State, Country
+        address = f"{user.address if user.address else ''}, {user.city if user.city else ''}, {user.state if user.state else ''}, {user.country if user.country else 'N/A'}"
+        address = address.replace(" ,", "").strip(", ")  # Remove empty values
+
+        pdf.drawString(left_x, y_start - 4 * line_spacing, f"Address: {address}")
+        pdf.drawString(left_x, y_start - 5 * line_spacing, f"Zip Code: {user.zip_code if user.zip_code else 'N/A'}")
+
+        # Right column (Medical Details) - Right Aligned
+        pdf.drawRightString(right_x, y_start, f"KA Regd No: {profile.ka_regd_no}")
+        pdf.drawRightString(right_x, y_start - line_spacing, f"Hemophilia Type: {profile.heamophilia_type if profile.heamophilia_type else 'N/A'}")
+        pdf.drawRightString(right_x, y_start - 2 * line_spacing, f"Factor: {profile.factor if profile.factor else 'N/A'}")
+        pdf.drawRightString(right_x, y_start - 3 * line_spacing, f"Inhibitor: {profile.inhibitor if profile.inhibitor else 'N/A'}")
+        pdf.drawRightString(right_x, y_start - 4 * line_spacing, f"Inhibitor %: {profile.inhibitor_percentage if profile.inhibitor_percentage else 'N/A'}")
+        pdf.drawRightString(right_x, y_start - 5 * line_spacing, f"Target Joints: {profile.target_joints if profile.target_joints else 'N/A'}")
+
+        # Leave room between the details and the table
+        self.y = y_start - 8 * line_spacing
+
+        if summary is not None:
+            pdf.setFont("Helvetica-Bold", 11)
+            pdf.drawString(left_x, y_start - 7 * line_spacing,
+                           f"Logged days: {summary.logged_days}    Bleed days: {summary.bleed_days}    "
+                           f"Hemlibra injection days: {summary.injection_days}    "
+                           f"Physiotherapy days: {summary.physiotherapy_days}")
+            self.y = y_start - 9 * line_spacing
+
+    def _draw_table_header(self):
+        header = Table([TABLE_HEADERS], colWidths=COLUMN_WIDTHS)
+        header.setStyle(HEADER_STYLE)
+        _, height = header.wrapOn(self.pdf, self.width, self.y - BOTTOM_Y)
+        header.drawOn(self.pdf, MARGIN_X, self.y - height)
+        self.y -= height
+
+    def _new_page(self):
+        self._draw_footer()
+        self.pdf.showPage()
+        self.page_number += 1
+        self.pdf.setFont("Helvetica-Bold", 12)
+        self.pdf.drawString(MARGIN_X, TOP_Y, f"{self.title} (continued)")
+        self.y = TOP_Y - 20
+        self.page_has_rows = False
+        self._draw_table_header()
+
+    def _draw_footer(self):
+        self.pdf.setFont("Helvetica", 9)
+        self.pdf.drawRightString(PAGE_WIDTH - MARGIN_X, BOTTOM_Y - 20, f"Page {self.page_number}")
+
+    def draw_rows(self, records):
+        """
+        Draw a table row for every record, starting new pages as needed.
+        """
+        self._draw_table_header()
+        records = iter(records)
+        while True:
+            chunk = [_record_row(record) for record in islice(records, ROWS_PER_CHUNK)]
+            if not chunk:
+                break
+            self._draw_chunk(chunk)
+
+    def _draw_chunk(self, rows):
+        table = Table(rows, colWidths=COLUMN_WIDTHS, splitInRow=1)
+        table.setStyle(ROW_STYLE)
+        while table is not None:
+            available = self.y - BOTTOM_Y
+            _, height = table.wrapOn(self.pdf, self.width, available)
+            parts = [] if height <= available else table.split(self.width, available)
+            if height <= available or (len(parts) < 2 and not self.page_has_rows):
+                # Either the rest fits, or it cannot be split at all and a new page would not help
+                table.drawOn(self.pdf, MARGIN_X, self.y - height)
+                self.y -= height
+                self.page_has_rows = True
+                return
+
+            if len(parts) < 2:
+                # Not even part of a row fits in what is left of this page
+                self._new_page()
+                continue
+
+            first, table = parts[0], parts[1]
+            _, height = first.wrapOn(self.pdf, self.width, available)
+            first.drawOn(self.pdf, MARGIN_X, self.y - height)
+            self._new_page()
+
+    def finish(self):
+        self._draw_footer()
+        self.pdf.showPage()
+        self.pdf.save()
+
+
+def report_title(start, end):
+    """
+    Return the report title for the period from start to end (both inclusive).
+    """
+    if start.year == end.year and start.month == end.month and start.day == 1 \
+            and end.day == calendar.monthrange(end.year, end.month)[1]:
+        return f"HealthTrack Report - {calendar.month_name[start.month]} {start.year}"
+    if start.year == end.year and (start.month, start.day) == (1, 1) and (end.month, end.day) == (12, 31):
+        return f"HealthTrack Report - {start.year}"
+    return f"HealthTrack Report - {start.strftime('%d-%b-%Y')} to {end.strftime('%d-%b-%Y')}"
+
+
+def write_report(fileobj, title, user, profile, records, summary=None):
+    """
+    Render a HealthTrack PDF report into a writable binary file object.
+
+    Accepts:
+    - fileobj: The file object the PDF is written to.
+    - title: The report title (e.g., "HealthTrack Report - January 2025").
+    - user: The User the report belongs to.
+    - profile: The user's Profile.
+    - records: An iterable of DailyTrack records in date order. It is consumed in chunks,
+      so a chunked queryset iterator keeps memory flat for long date ranges.
+    - summary: Optional MonthlySummary whose totals are printed above the table.
+    """
+    writer = _ReportWriter(fileobj, title)
+    writer.draw_details(user, profile, summary)
+    writer.draw_rows(records)
+    writer.finish()
+
+
+def render_monthly_report(user, profile, daily_records, month_name, year, summary=None):
+    """
+    Render the monthly HealthTrack PDF report and return it as bytes.
+
+    Accepts:
+    - user: The User the report belongs to.
+    - profile: The user's Profile.
+    - daily_records: An iterable of DailyTrack records for the month.
+    - month_name: The display name of the month (e.g., "January").
+    - year: The year of the report.
+    - summary: Optional MonthlySummary whose totals are printed above the table.
+
+    Returns:
+    - The rendered PDF document as bytes.
+    """
+    buffer = io.BytesIO()
+    write_report(buffer, f"HealthTrack Report - {month_name} {year}", user, profile, daily_records, summary)
+    return buffer.getvalue()
@@ -1,42 +1,58 @@
+# these are django imports
+from django.db import IntegrityError
+
 # these are rest_framework imports
 from rest_framework import serializers
 
 # these are local imports
-from .models import DailyTrack
+from HealthData.transactions import write_atomic
+from .models import DailyTrack, MonthlySummary, ReportJob
+
+DUPLICATE_DATE_MESSAGE = "A record already exists for this user on the given date."
+
 
 class DailyTrackSerializer(serializers.ModelSerializer):
     class Meta:
         model = DailyTrack
         fields = '__all__'
         read_only_fields = ('id', 'created_at', 'updated_at')
+        # One record per (user, date) is enforced by the database constraint, see create()
+        validators = []
 
     def validate(self, data):
-        # Check if a DailyTrack entry already exists for the given user and date
-        user = data.get('user')
-        date = data.get('date')
-
-        if DailyTrack.objects.filter(user=user, date=date).exists():
-            raise serializers.ValidationError("A record already exists for this user on the given date.")
+        values = data
+        if self.partial and self.instance is not None:
+            # Validate the record as it will be saved, not just the fields being changed
+            values = {**{field: getattr(self.instance, field) for field in (
+                'break_through_bleed', 'break_through_bleed_details', 'treatment_for_bleed',
+                'inj_hemilibra', 'physiotherapy')}, **data}
 
         # Custom validation for 'Yes' or 'No' choices
-        if data['break_through_bleed'] not in ['Yes', 'No']:
+        if values['break_through_bleed'] not in ['Yes', 'No']:
             raise serializers.ValidationError("Valid choice. Must be 'Yes' or 'No'.")
-        if data['inj_hemilibra'] not in ['Yes', 'No']:
+        if values['inj_hemilibra'] not in ['Yes', 'No']:
             raise serializers.ValidationError("Valid choice. Must be 'Yes' or 'No'.")
-        if data['physiotherapy'] not in ['Yes', 'No']:
+        if values['physiotherapy'] not in ['Yes', 'No']:
             raise serializers.ValidationError("Valid choice. Must be 'Yes' or 'No'.")
 
         # Custom validation for 'break_through_bleed_details' and 'treatment_for_bleed' when 'break_through_bleed' is 'Yes'
-        if data['break_through_bleed'] == 'Yes' and (data.get('break_through_bleed_details') is None or data.get('treatment_for_bleed') is None):
+        if values['break_through_bleed'] == 'Yes' and (values.get('break_through_bleed_details') is None or values.get('treatment_for_bleed') is None):
             raise serializers.ValidationError("Both break_through_bleed_details and treatment_for_bleed are required when break_through_bleed is 'Yes'.")
         
-        if data['break_through_bleed'] == 'No' and (data.get('break_through_bleed_details') not in [None, "None"] or data.get('treatment_for_bleed') not in [None, "None"]):
+        if values['break_through_bleed'] == 'No' and (values.get('break_through_bleed_details') not in [None, "None"] or values.get('treatment_for_bleed') not in [None, "None"]):
             raise serializers.ValidationError("break_through_bleed_details and treatment_for_bleed should be None when break_through_bleed is 'No'.")
         
         return data
 
     def create(self, validated_data):
-        return DailyTrack.objects.create(**validated_data)
+        try:
+            with write_atomic():
+                return DailyTrack.objects.create(**validated_data)
+        except IntegrityError:
+            # Only the (user, date) unique constraint is the client's error, anything else is a bug
+            if DailyTrack.objects.filter(user=validated_data.get('user'), date=validated_data.get('date')).exists():
+                raise serializers.ValidationError({"non_field_errors": [DUPLICATE_DATE_MESSAGE]})
+            raise
 
     def update(self, instance, validated_data):
         instance.break_through_bleed = validated_data.get('break_through_bleed', instance.break_through_bleed)
@@ -46,3 +62,30 @@ class DailyTrackSerializer(serializers.ModelSerializer):
         instance.physiotherapy = validated_data.get('physiotherapy', instance.physiotherapy)
         instance.save()
         return instance
+
+
+class DailyTrackEntrySerializer(DailyTrackSerializer):
+    """
+    Validates a DailyTrack entry keyed on its date, as used by batch uploads and upserts.
+
+    The user is taken from the request rather than from the entry, so validating an entry does
+    not touch the database.
+    """
+
+    class Meta(DailyTrackSerializer.Meta):
+        read_only_fields = DailyTrackSerializer.Meta.read_only_fields + ('user',)
+        extra_kwargs = {'date': {'required': True}}
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReportJob
+        fields = ('id', 'start_date', 'end_date', 'status', 'error', 'created_at', 'started_at', 'finished_at')
+        read_only_fields = fields
+
+
+class MonthlySummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MonthlySummary
+        fields = ('year', 'month', 'logged_days', 'bleed_days', 'injection_days', 'physiotherapy_days', 'updated_at')
+        read_only_fields = fields
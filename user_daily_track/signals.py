@@ -0,0 +1,53 @@
+# these are django imports
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+# these are local imports
+from .jobs import delete_job_file
+from .models import DailyTrack, ReportJob
+from .summaries import add_contribution, apply_deltas, rebuild_months
+
+
+def _current_values(instance):
+    return {field: getattr(instance, field) for field in DailyTrack.SUMMARY_FIELDS}
+
+
+def _loaded_values(instance):
+    loaded = getattr(instance, '_summary_values', None)
+    if loaded is None or len(loaded) != len(DailyTrack.SUMMARY_FIELDS):
+        return None
+    return loaded
+
+
+@receiver(post_save, sender=DailyTrack)
+def update_summary_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    if created:
+        apply_deltas(instance.user_id, add_contribution({}, _current_values(instance)))
+    else:
+        loaded = _loaded_values(instance)
+        if loaded is None:
+            # The record was not loaded from the database (or only partly), so its previous
+            # contribution is unknown. Recount its month instead.
+            rebuild_months(instance.user_id, [(instance.date.year, instance.date.month)])
+        else:
+            deltas = add_contribution({}, loaded, sign=-1)
+            apply_deltas(instance.user_id, add_contribution(deltas, _current_values(instance)))
+
+    instance._summary_values = _current_values(instance)
+
+
+@receiver(post_delete, sender=DailyTrack)
+def update_summary_on_delete(sender, instance, **kwargs):
+    values = _loaded_values(instance) or _current_values(instance)
+    apply_deltas(instance.user_id, add_contribution({}, values, sign=-1))
+
+
+@receiver(post_delete, sender=ReportJob)
+def delete_report_job_file(sender, instance, **kwargs):
+    # Only once committed, a rolled back delete keeps its file. The instance loses its pk once deleted.
+    job_id, file_path = instance.pk, instance.file_path
+    transaction.on_commit(lambda: delete_job_file(job_id, file_path))
@@ -0,0 +1,148 @@
+from collections import defaultdict
+
+# these are django imports
+from django.db import IntegrityError
+from django.db.models import Count, F, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+# these are local imports
+from HealthData.transactions import write_atomic
+from .models import DailyTrack, MonthlySummary
+
+"""
+Incremental maintenance of MonthlySummary.
+
+Every DailyTrack contributes one logged day to its month, plus one bleed, injection and
+physiotherapy day for each of those fields that is 'Yes'. Writes add or subtract that
+contribution instead of re-counting the month.
+"""
+
+# MonthlySummary counter -> DailyTrack field counted when it is 'Yes'
+COUNTED_FIELDS = {
+    'bleed_days': 'break_through_bleed',
+    'injection_days': 'inj_hemilibra',
+    'physiotherapy_days': 'physiotherapy',
+}
+COUNTERS = ('logged_days',) + tuple(COUNTED_FIELDS)
+
+
+def contribution(values):
+    """
+    Return ((year, month), counters) for a record given as a dict of its summary fields.
+    """
+    record_date = values['date']
+    counters = {'logged_days': 1}
+    for counter, field in COUNTED_FIELDS.items():
+        counters[counter] = 1 if values[field] == 'Yes' else 0
+    return (record_date.year, record_date.month), counters
+
+
+def add_contribution(deltas, values, sign=1):
+    """
+    Add (or with sign=-1, subtract) a record's contribution to a {(year, month): counters} dict.
+    """
+    month, counters = contribution(values)
+    month_deltas = deltas.setdefault(month, defaultdict(int))
+    for counter, value in counters.items():
+        month_deltas[counter] += sign * value
+    return deltas
+
+
+def _needs_recount():
+    """
+    Summaries without logged days, or with counts that disagree with their records.
+    """
+    condition = Q(logged_days__lte=0)
+    for counter in COUNTED_FIELDS:
+        condition |= Q(**{f'{counter}__lt': 0}) | Q(**{f'{counter}__gt': F('logged_days')})
+    return condition
+
+
+def apply_deltas(user_id, deltas):
+    """
+    Apply {(year, month): counters} changes to a user's summaries in one transaction.
+
+    Each month costs one UPDATE ... SET x = x + n. A month without a summary row yet is inserted,
+    unless the change is a pure decrement (e.g. records deleted along with their user). A decrement
+    that leaves the month without logged days, or with counts that cannot be right (negative, or
+    more than the logged days), recounts the month from its records: it removes the month after its
+    last record, and repairs a summary that drifted from the records.
+    """
+    with write_atomic():
+        for (year, month), counters in deltas.items():
+            changes = {counter: value for counter, value in counters.items() if value}
+            if not changes:
+                continue
+            summaries = MonthlySummary.objects.filter(user_id=user_id, year=year, month=month)
+            if summaries.update(**{counter: F(counter) + value for counter, value in changes.items()}):
+                if any(value < 0 for value in changes.values()) and summaries.filter(_needs_recount()).exists():
+                    rebuild_months(user_id, [(year, month)])
+                continue
+            if any(value < 0 for value in changes.values()):
+                continue
+            try:
+                with write_atomic():
+                    MonthlySummary.objects.create(user_id=user_id, year=year, month=month, **changes)
+            except IntegrityError:
+                # Created concurrently, the row exists now
+                summaries.update(**{counter: F(counter) + value for counter, value in changes.items()})
+
+
+def _aggregate(queryset):
+    return queryset.annotate(
+        year=ExtractYear('date'), month=ExtractMonth('date')
+    ).values('user_id', 'year', 'month').annotate(
+        logged_days=Count('id'),
+        **{counter: Count('id', filter=Q(**{field: 'Yes'})) for counter, field in COUNTED_FIELDS.items()}
+    ).order_by()
+
+
+def rebuild_months(user_id, months):
+    """
+    Recount a user's summaries for the given (year, month) pairs from the DailyTrack rows.
+
+    Used where the previous values of a record are unknown, e.g. after an upsert.
+    """
+    with write_atomic():
+        for year, month in months:
+            row = next(iter(_aggregate(DailyTrack.objects.filter(user_id=user_id, date__year=year, date__month=month))), None)
+            if row is None:
+                MonthlySummary.objects.filter(user_id=user_id, year=year, month=month).delete()
+                continue
+            counters = {counter: row[counter] for counter in COUNTERS}
+            MonthlySummary.objects.update_or_create(user_id=user_id, year=year, month=month, defaults=counters)
+
+
+def rebuild_all(batch_size=1000):
+    """
+    Recount every summary from scratch with a single aggregate query. Returns the number of rows written.
+    """
+    with write_atomic():
+        MonthlySummary.objects.all().delete()
+        summaries = (
+            MonthlySummary(user_id=row['user_id'], year=row['year'], month=row['month'],
+                           **{counter: row[counter] for counter in COUNTERS})
+            for row in _aggregate(DailyTrack.objects.all()).iterator(chunk_size=batch_size)
+        )
+        written = 0
+        batch = []
+        for summary in summaries:
+            batch.append(summary)
+            if len(batch) >= batch_size:
+                written += len(MonthlySummary.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            written += len(MonthlySummary.objects.bulk_create(batch))
+        return written
+
+
+def summarize(records):
+    """
+    Build an unsaved MonthlySummary from records already in memory.
+    """
+    summary = MonthlySummary(**{counter: 0 for counter in COUNTERS})
+    for record in records:
+        _, counters = contribution({field: getattr(record, field) for field in DailyTrack.SUMMARY_FIELDS})
+        for counter, value in counters.items():
+            setattr(summary, counter, getattr(summary, counter) + value)
+    return summary
@@ -1,3 +1,827 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import zipfile
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+# these are django imports
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+# these are rest_framework imports
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+# these are local imports
+from tables.models import Gender, Heamophilia, Role
+from user.models import User
+from user.search import search_user_ids
+from user_profile.models import Profile
+from . import analytics, async_views, report_cache, views
+from . import jobs
+from .jobs import acquire_lease, delete_expired_jobs, requeue_dead_jobs, resume_pending_jobs, run_job
+from .management.commands import bench_endpoints
+from .models import DailyTrack, MonthlySummary, ReportJob
+from .report_cache import ReportCache
+from .serializers import DailyTrackSerializer
+from .summaries import rebuild_all
+
+# Hashing with the default PBKDF2 iterations dominates the run time of the tests
+FAST_PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def create_patient(username, number, role, gender, **fields):
+    """
+    Create a user with a profile; 'number' keeps the unique fields of every patient distinct.
+    """
+    fields = {
+        'email': f"{username}@example.com",
+        'first_name': username.title(),
+        'last_name': 'Patient',
+        'phone_number': f"98765{number:05d}",
+        'date_of_birth': date(1990, 5, 17),
+        'city': 'Bengaluru',
+        **fields,
+    }
+    user = User(username=username, role=role, gender=gender, **fields)
+    user.set_password('password-123')
+    user.save()
+    Profile.objects.create(user=user, ka_regd_no=f"KA{number:05d}", heamophilia_type='A', factor='viii', inhibitor='no')
+    return user
+
+
+@override_settings(PASSWORD_HASHERS=FAST_PASSWORD_HASHERS)
+class DailyTrackTestCase(TestCase):
+    """
+    A patient and an admin (the first role, R01, is the admin role), with a token client for the patient.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_role = Role.objects.create(name='Admin')
+        cls.user_role = Role.objects.create(name='User')
+        cls.gender = Gender.objects.create(name='Male')
+        Heamophilia.objects.create(name='A')
+        cls.user = create_patient('alice', 1, cls.user_role, cls.gender)
+        cls.admin = create_patient('admin', 2, cls.admin_role, cls.gender)
+
+    def setUp(self):
+        self.client = self.client_for(self.user)
+
+    def client_for(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client
+
+    def track(self, day, bleed='No', injection='Yes', physiotherapy='No', user=None):
+        return DailyTrack.objects.create(
+            user=user or self.user, date=day, break_through_bleed=bleed, inj_hemilibra=injection, physiotherapy=physiotherapy
+        )
+
+
+class ReportCacheTests(TestCase):
+
+    def test_renders_once_per_version(self):
+        cache = ReportCache(memory_max_bytes=1024, disk_max_bytes=0, directory=None)
+        render = mock.Mock(return_value=b'%PDF report')
+
+        self.assertEqual(cache.get_or_render((1, 2025, 3), 'v1', render), b'%PDF report')
+        self.assertEqual(cache.get_or_render((1, 2025, 3), 'v1', render), b'%PDF report')
+        self.assertEqual(render.call_count, 1)
+
+        cache.get_or_render((1, 2025, 3), 'v2', render)
+        self.assertEqual(render.call_count, 2)
+
+    def test_memory_evicts_least_recently_used(self):
+        cache = ReportCache(memory_max_bytes=10, disk_max_bytes=0, directory=None)
+        cache.get_or_render('first', 'v1', lambda: b'123456')
+        cache.get_or_render('second', 'v1', lambda: b'123456')
+
+        self.assertIsNone(cache.get('first', 'v1'))
+        self.assertEqual(cache.get('second', 'v1'), b'123456')
+
+    def test_disk_keeps_only_the_latest_version(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Nothing fits in memory, so every hit comes from disk
+            cache = ReportCache(memory_max_bytes=0, disk_max_bytes=1024, directory=directory)
+            cache.get_or_render((1, 2025, 3), 'v1', lambda: b'first')
+            self.assertEqual(ReportCache(0, 1024, directory).get((1, 2025, 3), 'v1'), b'first')
+
+            cache.get_or_render((1, 2025, 3), 'v2', lambda: b'second')
+            self.assertIsNone(cache.get((1, 2025, 3), 'v1'))
+            self.assertEqual(cache.get((1, 2025, 3), 'v2'), b'second')
+
+
+class MonthlyReportDownloadTests(DailyTrackTestCase):
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(report_cache, '_report_cache', ReportCache(1024 * 1024, 0, None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(views, 'render_monthly_report', wraps=views.render_monthly_report)
+        self.render = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def download(self, year=2025, month=3):
+        response = self.client.get(f'/data/download/{year}/{month}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_report_is_cached_until_the_records_change(self):
+        self.track(date(2025, 3, 3))
+        first = self.download()
+        self.assertTrue(first.startswith(b'%PDF'))
+        self.assertEqual(self.download(), first)
+        self.assertEqual(self.render.call_count, 1)
+
+        response = self.client.patch('/data/', {'date': '2025-03-03', 'inj_hemilibra': 'No'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.download()
+        self.assertEqual(self.render.call_count, 2)
+
+    def test_report_follows_a_name_change(self):
+        self.track(date(2025, 3, 3))
+        self.download()
+        response = self.client.patch('/user/user', {'first_name': 'Renamed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.download()
+        self.assertEqual(self.render.call_count, 2)
+        self.assertEqual(self.render.call_args.args[0].first_name, 'Renamed')
+
+    def test_month_without_records(self):
+        response = self.client.get('/data/download/2025/4')
+        self.assertEqual(response.status_code, 404)
+        self.render.assert_not_called()
+
+
+class ReportPeriodTests(TestCase):
+
+    def test_periods(self):
+        self.assertEqual(views.report_period(year='2024', month='2'), (date(2024, 2, 1), date(2024, 2, 29)))
+        self.assertEqual(views.report_period(year=2025), (date(2025, 1, 1), date(2025, 12, 31)))
+        self.assertEqual(views.report_period(start='2025-01-10', end='2025-03-01'), (date(2025, 1, 10), date(2025, 3, 1)))
+
+    def test_invalid_periods(self):
+        for arguments in ({}, {'year': 'x'}, {'year': 2025, 'month': 13}, {'start': '2025-01-10'},
+                          {'start': '2025-03-01', 'end': '2025-01-10'}):
+            with self.subTest(arguments=arguments), self.assertRaises(ValueError):
+                views.report_period(**arguments)
+
+
+class LongReportDownloadTests(DailyTrackTestCase):
+
+    def test_year_report_spans_several_pages(self):
+        DailyTrack.objects.bulk_create([
+            DailyTrack(user=self.user, date=date.fromordinal(date(2025, 1, 1).toordinal() + offset),
+                       break_through_bleed='No', inj_hemilibra='Yes', physiotherapy='No')
+            for offset in range(120)
+        ])
+        response = self.client.get('/data/download/2025')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="HealthTrack_alice_2025.pdf"')
+        pdf = b''.join(response.streaming_content)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertGreater(pdf.count(b'/Type /Page\n'), 1)
+
+    def test_range_report(self):
+        self.track(date(2025, 1, 31))
+        self.track(date(2025, 2, 1))
+        response = self.client.get('/data/download/range', {'from': '2025-01-15', 'to': '2025-02-15'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+        response = self.client.get('/data/download/range', {'from': '2025-03-01', 'to': '2025-03-31'})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get('/data/download/range', {'from': '2025-03-31', 'to': '2025-03-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReportJobTests(DailyTrackTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.directory = directory
+        self.enterContext(self.settings(REPORT_JOBS={
+            'OUTPUT_DIRECTORY': directory, 'RUN_INLINE': True, 'HEARTBEAT_SECONDS': 30, 'STALE_AFTER_SECONDS': 120,
+            'RETENTION_SECONDS': 3600, 'MAX_ACTIVE_JOBS_PER_USER': 2,
+        }))
+
+    def test_job_is_rendered_and_downloaded(self):
+        self.track(date(2025, 3, 3))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/data/jobs/', {'year': 2025, 'month': 3}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['id']
+
+        response = self.client.get(f'/data/jobs/{job_id}')
+        self.assertEqual(response.json()['status'], ReportJob.STATUS_DONE)
+        response = self.client.get(f'/data/jobs/{job_id}/download')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+
+    def test_unfinished_job_cannot_be_downloaded(self):
+        job = ReportJob.objects.create(user=self.user, start_date=date(2025, 3, 1), end_date=date(2025, 3, 31))
+        response = self.client.get(f'/data/jobs/{job.pk}/download')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['status'], ReportJob.STATUS_QUEUED)
+
+    def test_claimed_job_is_not_run_again(self):
+        job = ReportJob.objects.create(user=self.user, start_date=date(2025, 3, 1), end_date=date(2025, 3, 31),
+                                       status=ReportJob.STATUS_RUNNING)
+        self.assertIsNone(run_job(str(job.pk)))
+
+    def running_job(self, host, pid, heartbeat_age):
+        return ReportJob.objects.create(
+            user=self.user, start_date=date(2025, 3, 1), end_date=date(2025, 3, 31), status=ReportJob.STATUS_RUNNING,
+            worker_host=host, worker_pid=pid, heartbeat_at=timezone.now() - timedelta(seconds=heartbeat_age),
+        )
+
+    def test_only_jobs_of_dead_workers_are_requeued(self):
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        exited = process.pid
+        host = socket.gethostname()
+        alive = self.running_job(host, os.getpid(), 5)
+        remote = self.running_job('another-host', 1234, 5)
+        dead = self.running_job(host, exited, 5)
+        stale = self.running_job('another-host', 1234, 600)
+
+        self.assertEqual(requeue_dead_jobs(), 2)
+        statuses = dict(ReportJob.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[alive.pk], ReportJob.STATUS_RUNNING)
+        self.assertEqual(statuses[remote.pk], ReportJob.STATUS_RUNNING)
+        self.assertEqual(statuses[dead.pk], ReportJob.STATUS_QUEUED)
+        self.assertEqual(statuses[stale.pk], ReportJob.STATUS_QUEUED)
+
+    def rendered_job(self, finished_age, status=ReportJob.STATUS_DONE):
+        job = ReportJob.objects.create(
+            user=self.user, start_date=date(2025, 3, 1), end_date=date(2025, 3, 31), status=status,
+            finished_at=timezone.now() - timedelta(seconds=finished_age),
+        )
+        path = jobs.job_file_path(job.pk)
+        path.write_bytes(b'%PDF report')
+        ReportJob.objects.filter(pk=job.pk).update(file_path=str(path))
+        return job, path
+
+    def age_file(self, path, seconds):
+        modified = time.time() - seconds
+        os.utime(path, (modified, modified))
+
+    def test_active_jobs_per_user_are_limited(self):
+        post = lambda: self.client.post('/data/jobs/', {'year': 2025, 'month': 3}, format='json')
+        self.enterContext(mock.patch.object(views, 'enqueue'))
+        self.assertEqual(post().status_code, 202)
+        self.assertEqual(post().status_code, 202)
+        response = post()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('error', response.json())
+
+        # Finished jobs and the jobs of other users do not count
+        ReportJob.objects.filter(user=self.user).update(status=ReportJob.STATUS_DONE)
+        self.assertEqual(post().status_code, 202)
+        self.assertEqual(self.client_for(self.admin).post('/data/jobs/', {'year': 2025}, format='json').status_code, 202)
+
+    def test_deleting_a_job_deletes_its_file(self):
+        job, path = self.rendered_job(0)
+        with self.captureOnCommitCallbacks(execute=True):
+            job.delete()
+        self.assertFalse(path.exists())
+
+        job, path = self.rendered_job(0)
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).delete()
+        self.assertFalse(path.exists())
+
+    def test_expired_jobs_and_orphaned_files_are_deleted(self):
+        expired, expired_path = self.rendered_job(7200)
+        failed, _ = self.rendered_job(7200, status=ReportJob.STATUS_FAILED)
+        recent, recent_path = self.rendered_job(60)
+        queued = ReportJob.objects.create(user=self.user, start_date=date(2025, 3, 1), end_date=date(2025, 3, 31))
+        queued_path = jobs.job_file_path(queued.pk).with_suffix('.pdf.99.tmp')
+        queued_path.write_bytes(b'%PDF half')
+        self.age_file(queued_path, 7200)
+        orphan, fresh_orphan = (jobs.job_file_path(uuid.uuid4()) for _ in range(2))
+        orphan.write_bytes(b'%PDF report')
+        self.age_file(orphan, 7200)
+        fresh_orphan.write_bytes(b'%PDF report')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(delete_expired_jobs(), 2)
+        self.assertEqual(set(ReportJob.objects.values_list('pk', flat=True)), {recent.pk, queued.pk})
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(path.name for path in (recent_path, queued_path, fresh_orphan)))
+        self.assertFalse(expired_path.exists())
+
+    def test_one_process_resumes_the_jobs(self):
+        ReportJob.objects.create(user=self.user, start_date=date(2025, 3, 1), end_date=date(2025, 3, 31))
+        executor = mock.Mock()
+        self.enterContext(mock.patch.object(jobs, 'get_executor', return_value=executor))
+        self.assertEqual(resume_pending_jobs(), 1)
+        # Another worker started in the meantime
+        with mock.patch.object(jobs.os, 'getpid', return_value=os.getpid() + 1):
+            self.assertEqual(resume_pending_jobs(), 0)
+            self.assertFalse(acquire_lease('resume_report_jobs', 120))
+            with mock.patch.object(jobs.timezone, 'now', return_value=timezone.now() + timedelta(seconds=121)):
+                self.assertTrue(acquire_lease('resume_report_jobs', 120))
+        self.assertEqual(executor.submit.call_count, 1)
+
+
+@override_settings(REPORT_JOBS={'RUN_INLINE': True})
+class AdminExportTests(DailyTrackTestCase):
+
+    def test_export_contains_the_patients_with_records(self):
+        bob = create_patient('bob', 3, self.user_role, self.gender, city='Mysuru')
+        create_patient('carol', 4, self.user_role, self.gender)
+        self.track(date(2025, 3, 3))
+        self.track(date(2025, 3, 4), user=bob)
+        self.track(date(2025, 4, 1), user=bob)
+
+        response = self.client_for(self.admin).get('/data/admin/export/2025/3')
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            names = sorted(archive.namelist())
+            self.assertTrue(archive.read(names[0]).startswith(b'%PDF'))
+        self.assertEqual(names, ['HealthTrack_alice_March_2025.pdf', 'HealthTrack_bob_March_2025.pdf'])
+
+        response = self.client_for(self.admin).get('/data/admin/export/2025/3', {'city': 'Mysuru'})
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertEqual(archive.namelist(), ['HealthTrack_bob_March_2025.pdf'])
+
+    def test_export_is_for_admins(self):
+        self.assertEqual(self.client.get('/data/admin/export/2025/3').status_code, 403)
+        self.assertEqual(self.client_for(self.admin).get('/data/admin/export/2025/13').status_code, 400)
+
+
+class DailyTrackBatchTests(DailyTrackTestCase):
+
+    def entry(self, day, **fields):
+        return {'date': day, 'break_through_bleed': 'No', 'inj_hemilibra': 'Yes', 'physiotherapy': 'No', **fields}
+
+    def test_whole_batch_is_created(self):
+        response = self.client.post('/data/batch', [self.entry('2025-03-01'), self.entry('2025-03-02')], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([result['status'] for result in response.json()], ['created', 'created'])
+        self.assertEqual(DailyTrack.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(MonthlySummary.objects.get(user=self.user, year=2025, month=3).logged_days, 2)
+
+    def test_invalid_and_duplicate_entries_are_reported(self):
+        self.track(date(2025, 3, 1))
+        entries = [
+            self.entry('2025-03-01'),
+            self.entry('2025-03-02'),
+            self.entry('2025-03-02'),
+            self.entry('2025-03-03', break_through_bleed='Maybe'),
+        ]
+        response = self.client.post('/data/batch', entries, format='json')
+        self.assertEqual(response.status_code, 207)
+        results = response.json()
+        self.assertEqual([result['status'] for result in results], ['error', 'created', 'error', 'error'])
+        self.assertEqual(results[0]['errors'], {'non_field_errors': ["A record already exists for this user on the given date."]})
+        self.assertEqual(results[2]['errors'], {'non_field_errors': ["The batch contains more than one entry for this date."]})
+        self.assertEqual(DailyTrack.objects.filter(user=self.user).count(), 2)
+
+    def test_payload_must_be_a_bounded_list(self):
+        self.assertEqual(self.client.post('/data/batch', self.entry('2025-03-01'), format='json').status_code, 400)
+        self.assertEqual(self.client.post('/data/batch', [], format='json').status_code, 400)
+        entries = [self.entry(date.fromordinal(date(2024, 1, 1).toordinal() + offset).isoformat()) for offset in range(367)]
+        self.assertEqual(self.client.post('/data/batch', entries, format='json').status_code, 400)
+        self.assertFalse(DailyTrack.objects.exists())
+
+
+class DailyTrackUniquenessTests(DailyTrackTestCase):
+
+    def test_one_record_per_user_and_date(self):
+        self.track(date(2025, 3, 1))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.track(date(2025, 3, 1))
+        # Another user may log the same day
+        self.track(date(2025, 3, 1), user=self.admin)
+
+        response = self.client.post('/data/', {
+            'date': '2025-03-01', 'break_through_bleed': 'No', 'inj_hemilibra': 'Yes', 'physiotherapy': 'No',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'non_field_errors': ["A record already exists for this user on the given date."]})
+
+    def test_other_integrity_errors_are_not_reported_as_duplicates(self):
+        def serializer():
+            serializer = DailyTrackSerializer(data={
+                'user': self.user.pk, 'date': '2025-03-01', 'break_through_bleed': 'No', 'inj_hemilibra': 'Yes',
+                'physiotherapy': 'No',
+            })
+            self.assertTrue(serializer.is_valid())
+            return serializer
+
+        # A NOT NULL violation
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            serializer().save(date=None)
+
+        self.track(date(2025, 3, 1))
+        with self.assertRaises(ValidationError) as raised:
+            serializer().save()
+        self.assertEqual(raised.exception.detail, {'non_field_errors': ["A record already exists for this user on the given date."]})
+
+    def test_upsert_inserts_then_overwrites_in_one_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            created = DailyTrack.objects.upsert(
+                self.user, date(2025, 3, 1), break_through_bleed='Yes', break_through_bleed_details='Knee',
+                treatment_for_bleed='Factor', inj_hemilibra='Yes', physiotherapy='No',
+            )
+        inserts = [query['sql'] for query in queries if query['sql'].startswith('INSERT INTO "user_daily_track_dailytrack"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertIn('ON CONFLICT', inserts[0])
+
+        updated = DailyTrack.objects.upsert(
+            self.user, date(2025, 3, 1), break_through_bleed='No', inj_hemilibra='No', physiotherapy='Yes'
+        )
+        self.assertEqual(updated.pk, created.pk)
+        record = DailyTrack.objects.get(user=self.user, date=date(2025, 3, 1))
+        self.assertEqual((record.break_through_bleed, record.break_through_bleed_details, record.physiotherapy), ('No', None, 'Yes'))
+
+        summary = MonthlySummary.objects.get(user=self.user, year=2025, month=3)
+        self.assertEqual((summary.logged_days, summary.bleed_days, summary.injection_days, summary.physiotherapy_days), (1, 0, 0, 1))
+
+    def test_put_creates_or_replaces_the_day(self):
+        entry = {'date': '2025-03-01', 'break_through_bleed': 'No', 'inj_hemilibra': 'Yes', 'physiotherapy': 'No'}
+        first = self.client.put('/data/', entry, format='json')
+        self.assertEqual(first.status_code, 200)
+        second = self.client.put('/data/', {**entry, 'inj_hemilibra': 'No'}, format='json')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['id'], first.json()['id'])
+        self.assertEqual(list(DailyTrack.objects.filter(user=self.user).values_list('inj_hemilibra', flat=True)), ['No'])
+
+
+class DailyTrackPaginationTests(DailyTrackTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for offset in range(25):
+            self.track(date(2025, 1, 1) + timedelta(days=offset))
+
+    def test_pages_cover_every_record_once(self):
+        dates = []
+        response = self.client.get('/data/', {'page_size': 10, 'count': 'true'})
+        self.assertEqual(response.json()['count'], 25)
+        while True:
+            payload = response.json()
+            dates += [record['date'] for record in payload['results']]
+            if payload['next'] is None:
+                break
+            response = self.client.get(payload['next'])
+        self.assertEqual(dates, [(date(2025, 1, 1) + timedelta(days=offset)).isoformat() for offset in range(25)])
+
+    def test_pages_are_stable_under_inserts(self):
+        first = self.client.get('/data/', {'page_size': 10}).json()
+        # A record inserted before the cursor does not shift the next page
+        self.track(date(2024, 12, 31))
+        second = self.client.get(first['next']).json()
+        self.assertEqual(second['results'][0]['date'], '2025-01-11')
+
+    def cursor(self, value):
+        return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+    def test_invalid_cursors_are_not_found(self):
+        cursors = ['not-a-cursor', self.cursor(['2025-01-01']), self.cursor(['not-a-date', '1']),
+                   self.cursor(['2025-01-01', 'x']), self.cursor([None, None]), self.cursor({'date': '2025-01-01'})]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/data/', {'cursor': cursor}).status_code, 404)
+        self.assertEqual(self.client.get('/data/', {'cursor': self.cursor(['2025-01-20', '0'])}).status_code, 200)
+
+
+class DailyTrackFilterTests(DailyTrackTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.track(date(2025, 3, 1), injection='No')
+        self.track(date(2025, 3, 2), physiotherapy='Yes')
+        self.track(date(2025, 3, 3), injection='No', physiotherapy='Yes')
+        self.track(date(2025, 4, 1))
+
+    def dates(self, **params):
+        response = self.client.get('/data/', params)
+        self.assertEqual(response.status_code, 200)
+        return [record['date'] for record in response.json()['results']]
+
+    def test_filters(self):
+        self.assertEqual(self.dates(**{'from': '2025-03-02', 'to': '2025-03-31'}), ['2025-03-02', '2025-03-03'])
+        self.assertEqual(self.dates(inj_hemilibra='No'), ['2025-03-01', '2025-03-03'])
+        self.assertEqual(self.dates(inj_hemilibra='No', physiotherapy='Yes'), ['2025-03-03'])
+        self.assertEqual(self.dates(physiotherapy='Yes', page_size=1), ['2025-03-02'])
+
+    def test_invalid_filters(self):
+        for params in ({'from': '01-03-2025'}, {'to': 'today'}, {'break_through_bleed': 'yes'}):
+            with self.subTest(params=params):
+                response = self.client.get('/data/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_filtered_pages_use_the_field_index(self):
+        plan = DailyTrack.objects.filter(user=self.user, physiotherapy='Yes').order_by('date', 'id')[:11].explain()
+        self.assertIn('dailytrack_user_physio_date', plan)
+
+
+class MonthlySummaryTests(DailyTrackTestCase):
+
+    def counters(self, year=2025, month=3):
+        summary = MonthlySummary.objects.filter(user=self.user, year=year, month=month).first()
+        if summary is None:
+            return None
+        return summary.logged_days, summary.bleed_days, summary.injection_days, summary.physiotherapy_days
+
+    def test_writes_adjust_the_counters_in_place(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.track(date(2025, 3, 1), injection='Yes')
+        self.assertTrue(any('"logged_days" = ("user_daily_track_monthlysummary"."logged_days" + 1)' in query['sql']
+                            for query in queries))
+        self.track(date(2025, 3, 2), physiotherapy='Yes')
+        self.assertEqual(self.counters(), (2, 0, 2, 1))
+
+        record = DailyTrack.objects.get(pk=first.pk)
+        record.inj_hemilibra = 'No'
+        record.save()
+        self.assertEqual(self.counters(), (2, 0, 1, 1))
+
+        # Moving a record to another month moves its contribution
+        record.date = date(2025, 4, 1)
+        record.save()
+        self.assertEqual(self.counters(), (1, 0, 1, 1))
+        self.assertEqual(self.counters(month=4), (1, 0, 0, 0))
+
+        DailyTrack.objects.get(pk=first.pk).delete()
+        self.assertIsNone(self.counters(month=4))
+
+    def test_partly_loaded_record_recounts_its_month(self):
+        record = self.track(date(2025, 3, 1))
+        partial = DailyTrack.objects.only('id', 'user', 'date').get(pk=record.pk)
+        partial.physiotherapy = 'Yes'
+        partial.save()
+        self.assertEqual(self.counters(), (1, 0, 1, 1))
+
+    def test_drifted_summary_is_recounted_on_delete(self):
+        first = self.track(date(2025, 3, 1))
+        self.track(date(2025, 3, 2))
+        # E.g. records written with a queryset update, which sends no signals
+        MonthlySummary.objects.filter(user=self.user).update(logged_days=0, injection_days=0)
+
+        DailyTrack.objects.get(pk=first.pk).delete()
+        self.assertEqual(self.counters(), (1, 0, 1, 0))
+
+    def test_rebuild_all_matches_the_incremental_counters(self):
+        self.track(date(2025, 3, 1), bleed='No', physiotherapy='Yes')
+        self.track(date(2025, 3, 9), injection='No')
+        self.track(date(2025, 5, 1), user=self.admin)
+        expected = sorted(MonthlySummary.objects.values_list('user_id', 'year', 'month', 'logged_days', 'injection_days', 'physiotherapy_days'))
+        self.assertEqual(rebuild_all(), 2)
+        self.assertEqual(sorted(MonthlySummary.objects.values_list('user_id', 'year', 'month', 'logged_days', 'injection_days', 'physiotherapy_days')), expected)
+
+    def test_summary_endpoint(self):
+        self.track(date(2025, 3, 1))
+        self.track(date(2025, 4, 1))
+        self.track(date(2026, 1, 1))
+        response = self.client.get('/data/summary/2025')
+        self.assertEqual([(summary['year'], summary['month']) for summary in response.json()], [(2025, 3), (2025, 4)])
+        response = self.client.get('/data/summary/2025/4')
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(response.json()[0]['logged_days'], 1)
+
+
+@skipIf(analytics.np is None, "NumPy is not installed")
+class CohortAnalyticsTests(DailyTrackTestCase):
+
+    def setUp(self):
+        super().setUp()
+        bob = create_patient('bob', 3, self.user_role, self.gender)
+        Profile.objects.filter(user=bob).update(factor='ix')
+        self.track(date(2025, 3, 1))
+        self.track(date(2025, 3, 2), bleed='Yes')
+        self.track(date(2025, 3, 3))
+        self.track(date(2025, 3, 4), injection='No')
+        self.track(date(2025, 4, 1), bleed='Yes')
+        self.track(date(2025, 3, 1), user=bob)
+
+    def test_cohort_statistics(self):
+        stats = analytics.compute_cohort_stats(analytics.load_cohort_arrays())
+        self.assertEqual((stats['patients'], stats['logged_days'], stats['patient_months'], stats['bleed_days']), (2, 6, 3, 2))
+        self.assertEqual(stats['bleeds_per_patient_month'], 0.6667)
+        self.assertEqual(stats['adherence']['mean'], 0.9)
+        groups = {(group['heamophilia_type'], group['factor']): group for group in stats['groups']}
+        self.assertEqual(sorted(groups), [('A', 'ix'), ('A', 'viii')])
+        self.assertEqual(groups['A', 'viii']['bleeds_per_patient_month'], 1.0)
+        self.assertEqual(groups['A', 'viii']['mean_adherence'], 0.8)
+        self.assertEqual(groups['A', 'ix']['bleed_days'], 0)
+
+    def test_admin_endpoint(self):
+        admin = self.client_for(self.admin)
+        response = admin.get('/data/admin/analytics', {'from': '2025-03-01', 'to': '2025-03-31'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['patient_months'], response.json()['bleed_days']), (2, 1))
+
+        self.assertEqual(admin.get('/data/admin/analytics', {'from': '2025-04-01', 'to': '2025-03-01'}).status_code, 400)
+        self.assertEqual(admin.get('/data/admin/analytics', {'from': 'March'}).status_code, 400)
+        self.assertEqual(self.client.get('/data/admin/analytics').status_code, 403)
+
+
+class SeedLoadTests(DailyTrackTestCase):
+
+    def seed(self, *args):
+        return call_command(
+            'seed_load', '--users=3', '--days=40', '--seed=7', '--end=2025-03-15', '--batch-size=10', *args, stdout=StringIO()
+        )
+
+    def seeded(self):
+        users = User.objects.filter(username__startswith='load-').order_by('id')
+        history = DailyTrack.objects.filter(user__in=users).order_by('user_id', 'date')
+        return (
+            list(users.values_list('first_name', 'last_name', 'date_of_birth', 'city', 'profile__factor')),
+            list(history.values_list('date', 'break_through_bleed', 'inj_hemilibra', 'physiotherapy')),
+        )
+
+    def test_seeds_users_profiles_and_history(self):
+        self.seed()
+        users = User.objects.filter(username__startswith='load-')
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(Profile.objects.filter(user__in=users).count(), 3)
+        history = DailyTrack.objects.filter(user__in=users)
+        self.assertTrue(0 < history.count() <= 120)
+        self.assertGreaterEqual(history.earliest('date').date, date(2025, 2, 4))
+        self.assertLessEqual(history.latest('date').date, date(2025, 3, 15))
+
+        user = users.first()
+        self.assertTrue(user.check_password('load-test-password'))
+        self.assertEqual(user.role, self.user_role)
+        # Filled in by the command, bulk_create does not call User.save()
+        self.assertEqual(users.with_age(on=date(2025, 3, 15)).get(pk=user.pk).current_age, user.age)
+
+        # The bulk inserts skip the signals, the derived tables are rebuilt
+        summaries = MonthlySummary.objects.filter(user__in=users)
+        self.assertEqual(sum(summaries.values_list('logged_days', flat=True)), history.count())
+        self.assertIn(user.pk, list(search_user_ids(user.profile.ka_regd_no)[:]))
+
+    def test_same_seed_same_data(self):
+        self.seed()
+        first = self.seeded()
+        self.seed('--clear')
+        self.assertEqual(self.seeded(), first)
+
+    def test_refuses_to_mix_with_earlier_accounts(self):
+        self.seed()
+        with self.assertRaisesMessage(CommandError, "exist already"):
+            self.seed()
+        self.seed('--prefix=other')
+        self.assertEqual(User.objects.filter(username__startswith='other-').count(), 3)
+
+    def test_needs_the_reference_data(self):
+        Role.objects.filter(name='User').update(name='Patient')
+        with self.assertRaisesMessage(CommandError, "Create the 'User' role"):
+            self.seed()
+
+
+class BenchEndpointsTests(DailyTrackTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for day in range(1, 4):
+            self.track(date(2025, 3, day))
+        self.output = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'bench.json')
+        self.enterContext(mock.patch.object(report_cache, '_report_cache', ReportCache(1024 * 1024, 0, None)))
+        # The test runner has set the test environment up already
+        self.enterContext(mock.patch.object(bench_endpoints, 'setup_test_environment'))
+        self.enterContext(mock.patch.object(bench_endpoints, 'teardown_test_environment'))
+
+    def bench(self, *args):
+        output = StringIO()
+        call_command(
+            'bench_endpoints', '--user=alice', '--password=password-123', '--iterations=2', '--warmup=0',
+            f'--output={self.output}', *args, stdout=output,
+        )
+        return output.getvalue()
+
+    def test_measures_every_endpoint_and_rolls_back(self):
+        self.bench()
+        with open(self.output) as output:
+            report = json.load(output)
+        endpoints = report['endpoints']
+        self.assertEqual(len(endpoints), 10)
+        self.assertEqual({name: result['status'] for name, result in endpoints.items() if result['status'] != 200},
+                         {'daily_track_create': 201})
+        self.assertTrue(all(result['queries'] > 0 for name, result in endpoints.items() if name != 'user_get'))
+        self.assertEqual(report['meta']['daily_tracks'], 3)
+        self.assertEqual(DailyTrack.objects.count(), 3)
+        self.assertEqual(User.objects.get(pk=self.user.pk).city, 'Bengaluru')
+
+    def test_compare_with_a_baseline(self):
+        self.bench()
+        with open(self.output) as output:
+            baseline = json.load(output)
+        baseline['endpoints']['daily_track_list']['queries'] -= 1
+        baseline['endpoints']['login']['status'] = 401
+        baseline_path = os.path.join(os.path.dirname(self.output), 'baseline.json')
+        with open(baseline_path, 'w') as output:
+            json.dump(baseline, output)
+
+        with self.assertRaisesMessage(CommandError, "regression(s) against"):
+            self.bench(f'--compare={baseline_path}', '--threshold=1000')
+
+    def test_latency_regressions_need_the_threshold_and_the_noise_floor(self):
+        command = bench_endpoints.Command(stdout=StringIO())
+        before = {'p50_ms': 10.0, 'p95_ms': 20.0, 'peak_kib': 100.0, 'queries': 3, 'status': 200}
+        self.assertEqual(command.compare({'a': before}, {'a': {**before, 'p50_ms': 11.5}}, 0.2), 0)
+        self.assertEqual(command.compare({'a': before}, {'a': {**before, 'p50_ms': 12.5}}, 0.2), 1)
+        # 50% slower but within the 1 ms noise floor
+        self.assertEqual(command.compare({'a': {**before, 'p50_ms': 1.0}}, {'a': {**before, 'p50_ms': 1.5}}, 0.2), 0)
+
+    def test_percentile(self):
+        self.assertEqual(bench_endpoints.percentile([5, 1, 4, 2, 3], 0.5), 3)
+        self.assertEqual(bench_endpoints.percentile(list(range(1, 101)), 0.95), 95)
+        self.assertEqual(bench_endpoints.percentile([7], 0.95), 7)
+
+
+@override_settings(REPORT_JOBS={'RUN_INLINE': True})
+class AsyncViewTests(DailyTrackTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for offset in range(12):
+            self.track(date(2025, 3, 1) + timedelta(days=offset), bleed='Yes' if offset % 4 == 0 else 'No')
+        self.headers = {'Authorization': f"Token {Token.objects.get(user=self.user).key}"}
+        self.enterContext(mock.patch.object(report_cache, '_report_cache', ReportCache(1024 * 1024, 0, None)))
+        self.render = self.enterContext(
+            mock.patch.object(async_views, 'render_monthly_report', wraps=async_views.render_monthly_report)
+        )
+
+    async def test_list_matches_the_sync_view(self):
+        for params in ({}, {'page_size': 5}, {'break_through_bleed': 'Yes', 'count': 'true'}):
+            with self.subTest(**params):
+                response = await self.async_client.get('/data/async/', params, headers=self.headers)
+                self.assertEqual(response.status_code, 200)
+                expected = await sync_to_async(self.client.get)('/data/', params)
+                self.assertEqual(response.json()['results'], expected.json()['results'])
+                self.assertEqual(response.json().get('count'), expected.json().get('count'))
+        self.assertEqual(response.json()['count'], 3)
+
+    async def test_pages(self):
+        dates = []
+        url, params = '/data/async/', {'page_size': 5}
+        while url:
+            payload = (await self.async_client.get(url, params, headers=self.headers)).json()
+            dates += [record['date'] for record in payload['results']]
+            url, params = payload['next'], None
+        self.assertEqual(len(dates), 12)
+        self.assertEqual(dates, sorted(dates))
+
+    async def test_invalid_parameters(self):
+        response = await self.async_client.get('/data/async/', {'cursor': 'not-a-cursor'}, headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get('/data/async/', {'break_through_bleed': 'maybe'}, headers=self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+    async def test_authentication(self):
+        response = await self.async_client.get('/data/async/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        response = await self.async_client.get('/data/async/', headers={'Authorization': 'Token invalid'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_writes(self):
+        record = {'date': '2025-04-01', 'break_through_bleed': 'No', 'inj_hemilibra': 'Yes', 'physiotherapy': 'No'}
+        response = await self.async_client.post('/data/async/', record, content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        response = await self.async_client.patch(
+            '/data/async/', {'date': '2025-04-01', 'inj_hemilibra': 'No'}, content_type='application/json', headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await DailyTrack.objects.filter(user=self.user, date=date(2025, 4, 1)).values_list('inj_hemilibra', flat=True).aget(), 'No')
+
+    async def test_monthly_report(self):
+        response = await self.async_client.get('/data/async/download/2025/3', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="HealthTrack_alice_March_2025.pdf"')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        cached = await self.async_client.get('/data/async/download/2025/3', headers=self.headers)
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(self.render.call_count, 1)
+
+    async def test_monthly_report_errors(self):
+        response = await self.async_client.get('/data/async/download/2025/13', headers=self.headers)
+        self.assertEqual((response.status_code, response.json()), (400, {'error': 'Month must be between 1 and 12.'}))
+        response = await self.async_client.get('/data/async/download/2025/4', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+        self.render.assert_not_called()
@@ -2,9 +2,26 @@
 from django.urls import path
 
 # these are local imports
-from .views import DailyTrackViewCRUDView, DownloadMonthlyReportAPIView
+from .views import DailyTrackViewCRUDView, DailyTrackBatchView, DownloadMonthlyReportAPIView, DownloadReportAPIView
+from .views import ReportJobView, ReportJobDownloadView, AdminExportMonthlyReportsView, MonthlySummaryView
+from .views import AdminAnalyticsView
+from .async_views import AsyncDailyTrackView, AsyncDownloadMonthlyReportView
 
 urlpatterns = [
     path('', DailyTrackViewCRUDView.as_view(), name='daily_track_crud_view'),
-    path('download/<int:year>/<int:month>', DownloadMonthlyReportAPIView.as_view(), name='download_monthly_report')
+    path('batch', DailyTrackBatchView.as_view(), name='daily_track_batch_view'),
+    path('summary/', MonthlySummaryView.as_view(), name='monthly_summary'),
+    path('summary/<int:year>', MonthlySummaryView.as_view(), name='monthly_summary_year'),
+    path('summary/<int:year>/<int:month>', MonthlySummaryView.as_view(), name='monthly_summary_month'),
+    path('download/<int:year>/<int:month>', DownloadMonthlyReportAPIView.as_view(), name='download_monthly_report'),
+    path('download/<int:year>', DownloadReportAPIView.as_view(), name='download_yearly_report'),
+    path('download/range', DownloadReportAPIView.as_view(), name='download_range_report'),
+    path('jobs/', ReportJobView.as_view(), name='report_jobs'),
+    path('jobs/<uuid:job_id>', ReportJobView.as_view(), name='report_job'),
+    path('jobs/<uuid:job_id>/download', ReportJobDownloadView.as_view(), name='report_job_download'),
+    path('admin/export/<int:year>/<int:month>', AdminExportMonthlyReportsView.as_view(), name='admin_export_monthly_reports'),
+    path('admin/analytics', AdminAnalyticsView.as_view(), name='admin_analytics'),
+    # Async variants, for deployments on the ASGI application
+    path('async/', AsyncDailyTrackView.as_view(), name='async_daily_track_view'),
+    path('async/download/<int:year>/<int:month>', AsyncDownloadMonthlyReportView.as_view(), name='async_download_monthly_report'),
 ]
\ No newline at end of file
@@ -1,29 +1,114 @@
 import io
 import calendar
-from datetime import datetime
+import tempfile
+from datetime import date, datetime
 
 # these are rest_framework imports 
 from rest_framework import status
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 
 # these are django imports
-from django.http import FileResponse
-
-# these are reportlab imports
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import FileResponse, StreamingHttpResponse
+from django.db import IntegrityError
+from django.db.models import Count, Max, OuterRef, Subquery
 
 # these are local imports
-from .models import DailyTrack
-from .serializers import DailyTrackSerializer
+from HealthData.pagination import KeysetPagination
+from HealthData.replica import ReplicaReadMixin
+from HealthData.transactions import write_atomic
+from .models import FILTER_FIELDS, DailyTrack, MonthlySummary, ReportJob
+from .serializers import DailyTrackSerializer, DailyTrackEntrySerializer, MonthlySummarySerializer, ReportJobSerializer
+from .jobs import enqueue
+from .summaries import add_contribution, apply_deltas
+from .export import iter_cohort_records, iter_rendered_reports, stream_zip
+from .reports import REPORT_USER_FIELDS, render_monthly_report, report_title, write_report
+from .report_cache import get_report_cache, report_version
+from . import analytics
 from user_profile.models import Profile
 from user_profile.serializers import ProfileSerializer
 from user.models import User
 
+
+def report_period(year=None, month=None, start=None, end=None):
+    """
+    Resolve the first and last date of a report from a year, a year and month, or 'from'/'to' dates.
+
+    Raises ValueError with a message suitable for the client if the period is missing or invalid.
+    """
+    try:
+        if year is not None and month is not None:
+            year, month = int(year), int(month)
+            return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+        if year is not None:
+            return date(int(year), 1, 1), date(int(year), 12, 31)
+        start, end = date.fromisoformat(start or ''), date.fromisoformat(end or '')
+    except (TypeError, ValueError):
+        raise ValueError("Provide a year and month, a year, or 'from' and 'to' dates in YYYY-MM-DD format.")
+    if start > end:
+        raise ValueError("'from' must not be after 'to'.")
+    return start, end
+
+
+def monthly_report_profiles(year, month):
+    """
+    Profiles annotated with the version of the month's records (records_updated_at, records_count),
+    so that a cached monthly report can be served with a single query.
+    """
+    month_records = DailyTrack.objects.filter(
+        user=OuterRef('user'), date__year=year, date__month=month
+    ).order_by().values('user')
+    return Profile.objects.annotate(
+        records_updated_at=Subquery(month_records.annotate(latest=Max('updated_at')).values('latest')),
+        records_count=Subquery(month_records.annotate(total=Count('id')).values('total')),
+    )
+
+
+def monthly_report_version(user, profile):
+    """
+    Version of a monthly report, for a profile loaded with monthly_report_profiles().
+    """
+    return report_version(
+        profile.updated_at, profile.records_updated_at, profile.records_count,
+        *(getattr(user, field) for field in REPORT_USER_FIELDS)
+    )
+
+
+def filter_daily_tracks(queryset, params):
+    """
+    Apply the DailyTrack list filters from the query parameters.
+
+    Supports 'from' and 'to' dates (YYYY-MM-DD, inclusive) and 'Yes'/'No' values for
+    break_through_bleed, inj_hemilibra and physiotherapy. Every combination is served by the
+    (user, date) unique index or one of the (user, <field>, date) indexes.
+
+    Raises ValueError with a message suitable for the client if a parameter is invalid.
+    """
+    try:
+        if params.get('from'):
+            queryset = queryset.filter(date__gte=date.fromisoformat(params['from']))
+        if params.get('to'):
+            queryset = queryset.filter(date__lte=date.fromisoformat(params['to']))
+    except ValueError:
+        raise ValueError("'from' and 'to' must be dates in YYYY-MM-DD format.")
+
+    for field in FILTER_FIELDS:
+        value = params.get(field)
+        if value is None:
+            continue
+        if value not in ('Yes', 'No'):
+            raise ValueError(f"'{field}' must be 'Yes' or 'No'.")
+        queryset = queryset.filter(**{field: value})
+    return queryset
+
+
+class DailyTrackPagination(KeysetPagination):
+    # (user, date) is unique and its index also orders by id, so a user's pages are index range scans
+    ordering = ('date', 'id')
+
 # Create your views here.
 class DailyTrackViewCRUDView(APIView):
 
@@ -33,33 +118,50 @@ class DailyTrackViewCRUDView(APIView):
     Allows the authenticated user to:
     - Get their DailyTrack data via a GET request.
     - Create new DailyTrack records via a POST request.
-    - Update existing DailyTrack data via a PUT request.
-    - Partially update existing DailyTrack data via a PATCH request.
+    - Create or replace the DailyTrack data of a date via a PUT request.
+    - Partially update the DailyTrack data of a date via a PATCH request.
 
     Permissions:
     - Requires the user to be authenticated.
 
     Methods:
-    - GET: Fetch all DailyTrack records for the authenticated user.
+    - GET: Fetch the DailyTrack records of the authenticated user, one page at a time.
     - POST: Create a new DailyTrack record for the authenticated user.
-    - PUT: Fully update an existing DailyTrack record for the authenticated user.
-    - PATCH: Partially update an existing DailyTrack record for the authenticated user.
+    - PUT: Create or fully replace the DailyTrack record for a date (upsert).
+    - PATCH: Partially update the DailyTrack record for a date.
     """
 
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         """
-        Fetch all DailyTrack records for the authenticated user.
+        Fetch the DailyTrack records of the authenticated user, one page at a time.
+
+        Records are ordered by (date, id) and paginated with a keyset cursor, so every page costs
+        the same index range scan.
+
+        Accepts:
+        - 'cursor': The cursor from the previous page's 'next' link.
+        - 'page_size': Number of records per page (default 10, at most 100).
+        - 'count': Set to true to include the total number of records.
+        - 'from', 'to': Only return records between these dates (YYYY-MM-DD, inclusive).
+        - 'break_through_bleed', 'inj_hemilibra', 'physiotherapy': Only return records with this value ('Yes' or 'No').
 
         Returns:
-        - 200 OK with the list of DailyTrack records if successful.
-        - 404 NOT FOUND if no records are found for the user.
+        - 200 OK with 'next', optionally 'count', and the page of DailyTrack records in 'results'.
+        - 400 BAD REQUEST if a filter is invalid.
+        - 404 NOT FOUND if the cursor is invalid.
         """
 
-        daily_tracks = DailyTrack.objects.filter(user=request.user)
+        try:
+            daily_tracks = filter_daily_tracks(DailyTrack.objects.filter(user=request.user), request.GET)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = DailyTrackPagination()
+        daily_tracks = paginator.paginate_queryset(daily_tracks, request, view=self)
         serializer = DailyTrackSerializer(daily_tracks, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
 
     def post(self, request):
 
@@ -83,48 +185,184 @@ class DailyTrackViewCRUDView(APIView):
     def put(self, request):
 
         """
-        Fully update an existing DailyTrack record for the authenticated user.
+        Create or fully replace the authenticated user's DailyTrack record for a date.
+
+        The write is a single INSERT ... ON CONFLICT statement on the (user, date) unique
+        constraint, so concurrent writes for the same day cannot create duplicates.
 
         Accepts:
-        - PUT request with updated DailyTrack data.
+        - PUT request with the complete DailyTrack data, including 'date'.
 
         Returns:
-        - 200 OK with the updated DailyTrack record data if successful.
+        - 200 OK with the created or updated DailyTrack record data if successful.
         - 400 BAD REQUEST if the data is invalid.
         """
-        user = request.user
-        daily_track = DailyTrack.objects.get(user=user)
-        serializer = DailyTrackSerializer(daily_track, data=request.data)
+        serializer = DailyTrackEntrySerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
+            daily_track = DailyTrack.objects.upsert(request.user, **serializer.validated_data)
+            return Response(DailyTrackSerializer(daily_track).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     def patch(self, request):
 
         """
-        Partially update an existing DailyTrack record for the authenticated user.
+        Partially update the authenticated user's DailyTrack record for a date.
 
         Accepts:
-        - PATCH request with partial DailyTrack data.
+        - PATCH request with 'date' and the fields to change.
 
         Returns:
         - 200 OK with the partially updated DailyTrack record data if successful.
         - 400 BAD REQUEST if the data is invalid.
+        - 404 NOT FOUND if there is no record for the date.
         """
         user = request.user
-        daily_track = DailyTrack.objects.get(user=user)
+        record_date = request.data.get('date')
+        try:
+            if not record_date:
+                raise ValidationError("A date is required.")
+            daily_track = DailyTrack.objects.get(user=user, date=record_date)
+        except DailyTrack.DoesNotExist:
+            return Response({"message": f"No record found for {record_date}."}, status=status.HTTP_404_NOT_FOUND)
+        except ValidationError:
+            return Response({"date": ["Provide the date of the record in YYYY-MM-DD format."]}, status=status.HTTP_400_BAD_REQUEST)
         serializer = DailyTrackSerializer(daily_track, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class DailyTrackBatchView(APIView):
+    """
+    APIView to upload several DailyTrack records for the authenticated user at once,
+    e.g. when a mobile client syncs the days it logged while offline.
+
+    Every entry is validated on its own, then the dates of the valid entries are checked against
+    existing records (and each other) with a single query, and the new records are inserted with
+    one bulk insert inside a transaction.
+
+    Permissions:
+    - Requires the user to be authenticated.
+
+    Methods:
+    - POST: Create DailyTrack records from a list of entries.
+    """
+    permission_classes = [IsAuthenticated]
+
+    max_batch_size = 366
+
+    def post(self, request):
+        """
+        Create DailyTrack records for the authenticated user from a list of entries.
+
+        Accepts:
+        - POST request with a JSON list of DailyTrack entries, each with a 'date'.
+
+        Returns:
+        - 201 CREATED if every entry was created.
+        - 207 MULTI-STATUS if only some entries were created.
+        - 400 BAD REQUEST if no entry was created or the payload is not a list.
+        The body lists, for each entry in order, its 'index', its 'status' ("created" or "error")
+        and either the created record ('data') or the validation 'errors'.
+        """
+        entries = request.data
+        if not isinstance(entries, list) or not entries:
+            return Response({"error": "Expected a non-empty list of entries."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(entries) > self.max_batch_size:
+            return Response({"error": f"A batch can contain at most {self.max_batch_size} entries."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(entries)
+        valid = []
+        for index, entry in enumerate(entries):
+            serializer = DailyTrackEntrySerializer(data=entry)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {"index": index, "status": "error", "errors": serializer.errors}
+
+        # One query for every date in the batch that is already logged
+        existing = set(
+            DailyTrack.objects.filter(user=request.user, date__in=[data['date'] for _, data in valid])
+            .values_list('date', flat=True)
+        )
+
+        to_create = []
+        batch_dates = set()
+        for index, data in valid:
+            if data['date'] in existing or data['date'] in batch_dates:
+                message = "A record already exists for this user on the given date." if data['date'] in existing \
+                    else "The batch contains more than one entry for this date."
+                results[index] = {"index": index, "status": "error", "errors": {"non_field_errors": [message]}}
+                continue
+            batch_dates.add(data['date'])
+            to_create.append((index, DailyTrack(user=request.user, **data)))
+
+        try:
+            with write_atomic():
+                created = DailyTrack.objects.bulk_create([record for _, record in to_create])
+                # bulk_create sends no signals, so add the new records to the monthly summaries here
+                deltas = {}
+                for record in created:
+                    add_contribution(deltas, {field: getattr(record, field) for field in DailyTrack.SUMMARY_FIELDS})
+                apply_deltas(request.user.id, deltas)
+        except IntegrityError:
+            # Another request logged one of these dates since the check above; anything else is a bug
+            if not DailyTrack.objects.filter(user=request.user, date__in=batch_dates).exists():
+                raise
+            return Response({"error": "Some of these dates were logged concurrently, please retry."}, status=status.HTTP_409_CONFLICT)
+
+        for (index, _), record in zip(to_create, created):
+            results[index] = {"index": index, "status": "created", "data": DailyTrackSerializer(record).data}
+
+        if len(created) == len(entries):
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(results, status=response_status)
+
+class MonthlySummaryView(APIView):
+    """
+    APIView to fetch the monthly totals of the authenticated user's DailyTrack records.
+
+    The totals (logged days, bleed days, Hemlibra injection days and physiotherapy days) are kept
+    up to date as records are written, so reading them does not scan the DailyTrack rows.
+
+    Permissions:
+    - Requires the user to be authenticated.
+
+    Methods:
+    - GET: Fetch the monthly summaries, optionally for one year or one month.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, year=None, month=None):
+        """
+        Fetch the authenticated user's monthly summaries.
+
+        Accepts:
+        - year: Optional year to limit the summaries to (e.g., 2025).
+        - month: Optional month (1-12) within the year.
+
+        Returns:
+        - 200 OK with the list of monthly summaries in date order.
+        """
+        summaries = MonthlySummary.objects.filter(user=request.user)
+        if year is not None:
+            summaries = summaries.filter(year=year)
+        if month is not None:
+            summaries = summaries.filter(month=month)
+        serializer = MonthlySummarySerializer(summaries.order_by('year', 'month'), many=True)
+        return Response(serializer.data)
+
+
 class DownloadMonthlyReportAPIView(APIView):
     """
     APIView to generate and download a monthly PDF report for the authenticated user's DailyTrack data.
     This view generates a PDF report with the user's health data for a specified month and year.
     The PDF contains the user's personal details, medical profile, and daily health records for the month.
+    Reads go to the primary, so the report includes the records the user just logged (see HealthData/replica.py).
 
     Permissions:
     - Requires the user to be authenticated.
@@ -143,100 +381,281 @@ class DownloadMonthlyReportAPIView(APIView):
 
         Returns:
         - A PDF file containing the health report for the specified month and year.
+        - 400 BAD REQUEST if the month is not between 1 and 12.
         - 404 NOT FOUND if no records exist for the specified month and year.
         - 404 NOT FOUND if the user profile is not found.
+
+        Rendered reports are cached per (user, year, month) and re-rendered only when the
+        month's records, the profile or the user's details change.
         
         """
+        if not 1 <= month <= 12:
+            return Response({"error": "Month must be between 1 and 12."}, status=status.HTTP_400_BAD_REQUEST)
         month_name = calendar.month_name[int(month)]
         user = request.user  # Get logged-in user
 
-        # Fetch the user's profile
         try:
-            profile = Profile.objects.get(user=user)
+            profile = monthly_report_profiles(year, month).get(user=user)
         except Profile.DoesNotExist:
             return Response({"error": "User profile not found."}, status=404)
 
-        # Fetch records for the authenticated user
-        daily_records = DailyTrack.objects.filter(user=user, date__year=year, date__month=month)
-
-        if not daily_records.exists():
+        if not profile.records_count:
             return Response({"message": f"No records found for {month_name} {year}."}, status=404)
 
-        # Create an in-memory buffer
-        buffer = io.BytesIO()
-        pdf = canvas.Canvas(buffer, pagesize=A4)
-        pdf.setTitle(f"HealthTrack Report - {month_name} {year}")
-
-        # Set title
-        pdf.setFont("Helvetica-Bold", 16)
-        pdf.drawString(150, 800, f"HealthTrack Report - {month_name} {year}")
-
-        # Add user profile details
-        pdf.setFont("Helvetica", 11)
-
-        # Left column (Personal & Contact Details) - Left Aligned
-        left_x = 50
-        right_x = 550  # Right-aligned start position
-        y_start = 770
-        line_spacing = 15
-
-        pdf.drawString(left_x, y_start, f"Name: {user.first_name} {user.last_name}")
-        pdf.drawString(left_x, y_start - line_spacing, f"Email: {user.email}")
-        pdf.drawString(left_x, y_start - 2 * line_spacing, f"Phone: {user.phone_number if user.phone_number else 'N/A'}")
-        pdf.drawString(left_x, y_start - 3 * line_spacing, f"Date of Birth: {user.date_of_birth.strftime('%d-%b-%Y') if user.date_of_birth else 'N/A'}")
-
-        # Format Address with City, State, Country
-        address = f"{user.address if user.address else ''}, {user.city if user.city else ''}, {user.state if user.state else ''}, {user.country if user.country else 'N/A'}"
-        address = address.replace(" ,", "").strip(", ")  # Remove empty values
-
-        pdf.drawString(left_x, y_start - 4 * line_spacing, f"Address: {address}")
-        pdf.drawString(left_x, y_start - 5 * line_spacing, f"Zip Code: {user.zip_code if user.zip_code else 'N/A'}")
-
-        # Right column (Medical Details) - Right Aligned
-        pdf.drawRightString(right_x, y_start, f"KA Regd No: {profile.ka_regd_no}")
-        pdf.drawRightString(right_x, y_start - line_spacing, f"Hemophilia Type: {profile.heamophilia_type if profile.heamophilia_type else 'N/A'}")
-        pdf.drawRightString(right_x, y_start - 2 * line_spacing, f"Factor: {profile.factor if profile.factor else 'N/A'}")
-        pdf.drawRightString(right_x, y_start - 3 * line_spacing, f"Inhibitor: {profile.inhibitor if profile.inhibitor else 'N/A'}")
-        pdf.drawRightString(right_x, y_start - 4 * line_spacing, f"Inhibitor %: {profile.inhibitor_percentage if profile.inhibitor_percentage else 'N/A'}")
-        pdf.drawRightString(right_x, y_start - 5 * line_spacing, f"Target Joints: {profile.target_joints if profile.target_joints else 'N/A'}")
-
-        # Adjust starting position for the table
-        table_y_start = y_start - 12 * line_spacing
-
-        # Table headers
-        data = [["Date", "Break Bleed", "Treatment", "Injection", "Physiotherapy"]]
-
-        # Populate table with user data
-        for record in daily_records:
-            data.append([
-                record.date.strftime("%d-%b-%Y"),
-                record.break_through_bleed,
-                record.treatment_for_bleed if record.treatment_for_bleed else "-",
-                record.inj_hemilibra,
-                record.physiotherapy
-            ])
-
-        # Create and style table
-        table = Table(data, colWidths=[100, 100, 100, 100, 100])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-
-        # Draw table
-        table.wrapOn(pdf, 500, 700)
-        table.drawOn(pdf, 50, table_y_start)
-
-        # Finalize PDF
-        pdf.showPage()
-        pdf.save()
-
-        # Move buffer to start
-        buffer.seek(0)
+        version = monthly_report_version(user, profile)
+
+        def render():
+            daily_records = DailyTrack.objects.filter(user=user, date__year=year, date__month=month).order_by('date')
+            summary = MonthlySummary.objects.filter(user=user, year=year, month=month).first()
+            return render_monthly_report(user, profile, daily_records, month_name, year, summary)
+
+        pdf_bytes = get_report_cache().get_or_render((user.id, int(year), int(month)), version, render)
 
         # Return PDF response
-        return FileResponse(buffer, as_attachment=True, filename=f"HealthTrack_{user.username}_{month_name}_{year}.pdf")
+        return FileResponse(io.BytesIO(pdf_bytes), as_attachment=True, filename=f"HealthTrack_{user.username}_{month_name}_{year}.pdf")
+
+
+class DownloadReportAPIView(APIView):
+    """
+    APIView to generate and download a multi-page PDF report for a whole year or a date range.
+
+    The report is laid out page by page from a chunked DailyTrack iterator and written to a
+    spooled temporary file, so memory stays flat however many records the range covers.
+    The finished file is streamed to the client. Reads go to the primary, like the monthly report.
+
+    Permissions:
+    - Requires the user to be authenticated.
+
+    Methods:
+    - GET: Generate and download the PDF report.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, year=None):
+        """
+        Generate and stream a PDF file containing DailyTrack records for the authenticated user.
+
+        Accepts:
+        - year: The year for the report (e.g., 2025), or
+        - 'from' and 'to' query parameters with the first and last date of the range (YYYY-MM-DD).
+
+        Returns:
+        - A PDF file containing the health report for the requested period.
+        - 400 BAD REQUEST if the date range is missing or invalid.
+        - 404 NOT FOUND if no records exist for the requested period.
+        - 404 NOT FOUND if the user profile is not found.
+        """
+        user = request.user
+
+        try:
+            start, end = report_period(year=year, start=request.GET.get('from'), end=request.GET.get('to'))
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        title = report_title(start, end)
+        filename = f"HealthTrack_{user.username}_{year}.pdf" if year is not None \
+            else f"HealthTrack_{user.username}_{start.isoformat()}_{end.isoformat()}.pdf"
+
+        try:
+            profile = Profile.objects.get(user=user)
+        except Profile.DoesNotExist:
+            return Response({"error": "User profile not found."}, status=404)
+
+        daily_records = DailyTrack.objects.filter(user=user, date__range=(start, end)).order_by('date')
+        if not daily_records.exists():
+            return Response({"message": f"No records found between {start.isoformat()} and {end.isoformat()}."}, status=404)
+
+        spool = tempfile.SpooledTemporaryFile(max_size=settings.REPORT_SPOOL_MAX_BYTES)
+        write_report(spool, title, user, profile, daily_records.iterator(chunk_size=500))
+        spool.seek(0)
+
+        # FileResponse streams the file in blocks and closes it once sent
+        return FileResponse(spool, as_attachment=True, filename=filename, content_type='application/pdf')
+
+
+class ReportJobView(APIView):
+    """
+    APIView to render PDF reports asynchronously.
+
+    A submitted report is queued as a ReportJob and rendered in a bounded process pool instead of
+    on the request thread. The client polls the job until it is done and then downloads the file.
+    Jobs are stored in the database, so queued work survives a restart.
+
+    Permissions:
+    - Requires the user to be authenticated.
+
+    Methods:
+    - GET: Fetch the status of one job, or list the user's jobs.
+    - POST: Queue a new report job.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id=None):
+        """
+        Fetch the status of a report job, or all report jobs of the authenticated user.
+
+        Returns:
+        - 200 OK with the job (or list of jobs).
+        - 404 NOT FOUND if the job does not exist.
+        """
+        if job_id is not None:
+            try:
+                job = ReportJob.objects.get(pk=job_id, user=request.user)
+            except ReportJob.DoesNotExist:
+                return Response({"message": f"Report job {job_id} does not exist"}, status=status.HTTP_404_NOT_FOUND)
+            return Response(ReportJobSerializer(job).data)
+
+        jobs = ReportJob.objects.filter(user=request.user).order_by('-created_at')
+        return Response(ReportJobSerializer(jobs, many=True).data)
+
+    def post(self, request):
+        """
+        Queue a report for the authenticated user.
+
+        Accepts:
+        - POST request with 'year' and 'month', only 'year', or 'from' and 'to' dates (YYYY-MM-DD).
+
+        Returns:
+        - 202 ACCEPTED with the queued job.
+        - 400 BAD REQUEST if the period is missing or invalid.
+        - 404 NOT FOUND if the user profile is not found.
+        - 429 TOO MANY REQUESTS if the user already has REPORT_JOBS['MAX_ACTIVE_JOBS_PER_USER'] jobs queued or running.
+        """
+        try:
+            start, end = report_period(
+                year=request.data.get('year'), month=request.data.get('month'),
+                start=request.data.get('from'), end=request.data.get('to')
+            )
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not Profile.objects.filter(user=request.user).exists():
+            return Response({"error": "User profile not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        limit = settings.REPORT_JOBS.get('MAX_ACTIVE_JOBS_PER_USER', 3)
+        # Counted and created under the write lock, so concurrent requests cannot both pass the limit
+        with write_atomic():
+            active = ReportJob.objects.filter(
+                user=request.user, status__in=[ReportJob.STATUS_QUEUED, ReportJob.STATUS_RUNNING]
+            ).count()
+            if active >= limit:
+                return Response(
+                    {"error": f"You already have {active} reports being prepared. Try again once they are done."},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS
+                )
+            job = ReportJob.objects.create(user=request.user, start_date=start, end_date=end)
+            enqueue(job)
+        return Response(ReportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ReportJobDownloadView(APIView):
+    """
+    APIView to download the PDF rendered by a finished report job.
+
+    Permissions:
+    - Requires the user to be authenticated.
+
+    Methods:
+    - GET: Download the rendered report.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        """
+        Return the PDF file of a finished report job.
+
+        Returns:
+        - The rendered PDF file if the job is done.
+        - 404 NOT FOUND if the job does not exist or its file is gone.
+        - 409 CONFLICT if the job is still queued, running or has failed.
+        """
+        try:
+            job = ReportJob.objects.get(pk=job_id, user=request.user)
+        except ReportJob.DoesNotExist:
+            return Response({"message": f"Report job {job_id} does not exist"}, status=status.HTTP_404_NOT_FOUND)
+
+        if job.status != ReportJob.STATUS_DONE:
+            return Response(ReportJobSerializer(job).data, status=status.HTTP_409_CONFLICT)
+
+        try:
+            fileobj = open(job.file_path, 'rb')
+        except (OSError, TypeError):
+            return Response({"message": "The report file is no longer available."}, status=status.HTTP_404_NOT_FOUND)
+
+        filename = f"HealthTrack_{request.user.username}_{job.start_date.isoformat()}_{job.end_date.isoformat()}.pdf"
+        return FileResponse(fileobj, as_attachment=True, filename=filename, content_type='application/pdf')
+
+
+class AdminExportMonthlyReportsView(ReplicaReadMixin, APIView):
+    """
+    Admin view to download the monthly reports of a cohort of patients as one ZIP archive.
+
+    Users, profiles and DailyTrack records are loaded in batches (two queries per batch), the PDFs
+    are rendered in parallel in the report worker pool and each one is streamed into the archive as
+    soon as it is ready. Patients without records for the month are skipped. Reads go to the read
+    replica when one is configured.
+
+    Accepts:
+    - GET request with the year and month, and optional filters:
+      'username' (comma-separated), 'city', 'state', 'gender' and 'is_active' (defaults to true).
+
+    Returns:
+    - 200 OK with a streamed ZIP archive of PDF reports.
+    - 400 BAD REQUEST if the month is invalid.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, year, month):
+        if not 1 <= month <= 12:
+            return Response({"error": "Month must be between 1 and 12."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # IN rather than is_active=<bool>, which SQLite cannot serve from user_is_active_idx (see filter_users)
+        users = User.objects.filter(is_active__in=[request.GET.get('is_active', 'true').lower() != 'false'])
+        if request.GET.get('username'):
+            users = users.filter(username__in=[name.strip() for name in request.GET['username'].split(',')])
+        if request.GET.get('city'):
+            users = users.filter(city=request.GET['city'])
+        if request.GET.get('state'):
+            users = users.filter(state=request.GET['state'])
+        if request.GET.get('gender'):
+            users = users.filter(gender_id=request.GET['gender'])
+
+        # Streamed after the view returns, so bound to the database chosen now
+        users = users.using(users.db)
+        reports = iter_rendered_reports(iter_cohort_records(users, year, month), year, month)
+        response = StreamingHttpResponse(stream_zip(reports), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="HealthTrack_reports_{calendar.month_name[month]}_{year}.zip"'
+        return response
+
+
+class AdminAnalyticsView(ReplicaReadMixin, APIView):
+    """
+    Admin view to fetch cohort-level adherence and bleed-rate statistics across all patients.
+
+    The DailyTrack columns are loaded in chunks into NumPy arrays and every grouping is computed
+    in vectorized passes, so the cost grows with the number of rows, not with Python-level loops.
+    Reads go to the read replica when one is configured.
+
+    Accepts:
+    - GET request with optional 'from' and 'to' dates (YYYY-MM-DD, inclusive).
+
+    Returns:
+    - 200 OK with the overall adherence distribution and bleeds per patient-month, and the same
+      statistics per heamophilia type and factor.
+    - 400 BAD REQUEST if a date is invalid.
+    - 501 NOT IMPLEMENTED if NumPy is not installed.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        if analytics.np is None:
+            return Response({"error": "Analytics require NumPy to be installed."}, status=status.HTTP_501_NOT_IMPLEMENTED)
+        try:
+            start = date.fromisoformat(request.GET['from']) if request.GET.get('from') else None
+            end = date.fromisoformat(request.GET['to']) if request.GET.get('to') else None
+        except ValueError:
+            return Response({"error": "'from' and 'to' must be dates in YYYY-MM-DD format."}, status=status.HTTP_400_BAD_REQUEST)
+        if start and end and start > end:
+            return Response({"error": "'from' must not be after 'to'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        stats = analytics.compute_cohort_stats(analytics.load_cohort_arrays(start, end))
+        return Response({'from': start, 'to': end, **stats})
@@ -4,6 +4,7 @@ from rest_framework import serializers
 # these are local imports
 from .models import Profile
 from tables.models import Heamophilia
+from tables.lookups import get_lookup_cache
 
 class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
@@ -21,12 +22,11 @@ class ProfileSerializer(serializers.ModelSerializer):
 
     def validate_heamophilia_type(self, value):
         if value is not None:
-            try:
-                heamophilia = Heamophilia.objects.get(name=value)
-                return value  # Returning the value itself after successful validation
-            except Heamophilia.DoesNotExist:
+            # Checked against the cached names instead of querying Heamophilia on every profile write
+            names = get_lookup_cache().names(Heamophilia)
+            if value not in names.values():
                 raise serializers.ValidationError(
-                    f"Invalid heamophilia type. Valid heamophilia types are: {', '.join(Heamophilia.objects.values_list('name', flat=True))}."
+                    f"Invalid heamophilia type. Valid heamophilia types are: {', '.join(names[key] for key in sorted(names))}."
                 )
         return value
 
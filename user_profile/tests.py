@@ -1,3 +1,31 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+# these are local imports
+from tables import lookups
+from tables.lookups import LookupCache
+from tables.models import Heamophilia
+from user.tests import UserTestCase
+
+
+class ProfileHeamophiliaTypeTests(UserTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.cache = LookupCache(check_interval_seconds=3600)
+        patcher = mock.patch.object(lookups, '_lookup_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_types_are_checked_against_the_cached_names(self):
+        Heamophilia.objects.create(name='B')
+        self.cache.names(Heamophilia)
+        response = self.client.patch('/profile/', {'heamophilia_type': 'C'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['heamophilia_type'], ['Invalid heamophilia type. Valid heamophilia types are: A, B.'])
+        self.assertEqual(self.client.patch('/profile/', {'heamophilia_type': 'B'}, format='json').status_code, 200)
+
+    def test_new_types_are_accepted_once_committed(self):
+        self.cache.names(Heamophilia)
+        with self.captureOnCommitCallbacks(execute=True):
+            Heamophilia.objects.create(name='C')
+        self.assertEqual(self.client.patch('/profile/', {'heamophilia_type': 'C'}, format='json').status_code, 200)